@@ -1,44 +1,412 @@
-from flask import Flask, jsonify, request, g
+from flask import Flask, jsonify, request, g, has_request_context
 from flask_cors import CORS
 from flask import current_app
+from flask.json.provider import DefaultJSONProvider
 import logging
 import requests
 import psycopg2
+import psycopg2.extras
 import os
 from urllib.parse import urlparse
 from dotenv import load_dotenv
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
+from pool_conexiones import PoolConexiones
+from replicas import EnrutadorLecturas
+from perfilador_planes import PerfiladorPlanes
+from cache_respuestas import BackendMemoria, BackendRedis, CacheRespuestas
+from compresion import Compresor
+from estadisticas_materializadas import ESTADISTICAS, RefrescadorEstadisticas, sql_materializada
+from indice_busqueda import IndiceNombres, SincronizadorIndices
+from indice_facetas import FACETAS, IndiceFacetas
+from presencia import RastreadorPresencia
+from bloqueos import BackendBloqueosMemoria, BackendBloqueosTabla, BloqueoOcupado, GestorBloqueos
+from cursores import ORDENES_CURSOR, CursorInvalido, codificar_cursor, decodificar_cursor
+from respuestas_streaming import FORMATOS, acepta_gzip, lotes_de_consulta, respuesta_streaming
+import metricas
+import serializacion
+import json
+import threading
+import time
 
 
 # -------------------------------
 # Configuración inicial
 # -------------------------------
 load_dotenv()
+# Logs en JSON (una línea por evento) salvo LOG_FORMATO=texto
+metricas.configurar_logging(os.getenv("LOG_NIVEL", "INFO"), os.getenv("LOG_FORMATO", "json"))
+log = logging.getLogger("backend")
+METRICAS = os.getenv("METRICAS", "1") != "0"
 db_url = os.getenv("DB_URL")
 api_key = os.getenv("RAWG_API_KEY")
 result = urlparse(db_url)
 
 
 
-# Función para obtener una conexión nueva por petición
-def get_conn():
+# Waitress atiende con este número de hilos; el pool se dimensiona igual por defecto
+WAITRESS_THREADS = int(os.getenv("WAITRESS_THREADS", 8))
+
+pool = PoolConexiones(
+    maxconn=int(os.getenv("DB_POOL_MAX", WAITRESS_THREADS)),
+    timeout=float(os.getenv("DB_POOL_TIMEOUT", 10)),
+    max_vida=float(os.getenv("DB_POOL_MAX_VIDA", 1800)),
+    verificar_tras=float(os.getenv("DB_POOL_VERIFICAR_TRAS", 30)),
+    dbname=result.path[1:],
+    user=result.username,
+    password=result.password,
+    host=result.hostname,
+    port=result.port,
+    # Cada consulta se mide y se etiqueta con su función SQL (ver metricas.py)
+    **({"cursor_factory": metricas.CursorMedido} if METRICAS else {}),
+)
+if METRICAS:
+    pool.al_prestar = metricas.observar_conexion
+
+
+# Presta una conexión del pool identificada con el usuario simulado de la petición.
+# Uso: `with get_conn() as conn:` -> commit al salir, rollback si hay error y siempre se devuelve.
+# Con réplicas (DB_REPLICA_URLS) las peticiones GET/HEAD leen de una réplica; el resto, y las
+# lecturas que alimentan una escritura (primario=True), van al primario.
+def get_conn(primario=False):
     usuario_simulado = getattr(g, "usuario_simulado", "anonimo")
+    if enrutador is None or primario or not has_request_context() or request.method not in ("GET", "HEAD"):
+        return pool.conexion(application_name=usuario_simulado)
+    return enrutador.conexion(application_name=usuario_simulado, usuario=usuario_de_peticion())
 
-    return psycopg2.connect(
-        dbname=result.path[1:],
-        user=result.username,
-        password=result.password,
-        host=result.hostname,
-        port=result.port,
-        options=f"-c application_name='{usuario_simulado}'"
+
+def usuario_de_peticion():
+    # Header de los formularios, o ?usuario= en los GET (sin header no hay preflight CORS)
+    return request.headers.get("X-Usuario-Simulado-Id") or request.args.get("usuario")
+
+# -------------------------------
+# Planes de ejecución: solo bajo demanda o por muestreo
+# -------------------------------
+perfilador = PerfiladorPlanes(
+    muestreo_n=int(os.getenv("EXPLAIN_MUESTREO_N", 0)),     # 1 de cada N peticiones (0 = apagado)
+    umbral_ms=float(os.getenv("EXPLAIN_UMBRAL_MS", 0)),     # consultas más lentas que esto (0 = apagado)
+    capacidad=int(os.getenv("EXPLAIN_BUFFER", 100)),
+)
+
+
+def plan_solicitado():
+    valores = ("1", "true", "si", "sí")
+    return (request.args.get("explain", "").lower() in valores
+            or request.headers.get("X-Explain", "").lower() in valores)
+
+
+def consultar_con_plan(cur, sql, params=None):
+    # Devuelve (filas, plan); el plan es [] salvo que la petición lo pida
+    filas, plan = perfilador.ejecutar(cur, sql, params, ruta=request.path, solicitado=plan_solicitado())
+    return filas, plan or []
+
+# -------------------------------
+# Paginación por cursor (keyset)
+# -------------------------------
+def pagina_por_cursor(genero, plataforma, orden_defecto):
+    # Devuelve (filas, next_cursor) usando listar_juegos_cursor (sql/008_paginacion_cursor.sql)
+    orden = request.args.get("orden", orden_defecto)
+    if orden not in ORDENES_CURSOR:
+        raise CursorInvalido(f"Orden no soportado: {orden}")
+    limit = min(100, max(1, int(request.args.get("limit", 12))))
+    valor, ultimo_id = decodificar_cursor(request.args.get("cursor"), orden)
+
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.callproc("listar_juegos_cursor", (orden, genero, plataforma, valor, ultimo_id, limit))
+        filas = cur.fetchall()
+
+    siguiente = codificar_cursor(orden, filas[-1]) if len(filas) == limit else None
+    return filas, siguiente
+
+# -------------------------------
+# Estado compartido entre workers (servidor_prefork.py)
+# -------------------------------
+# Con varios procesos, las invalidaciones de cache, conteos y facetas, la presencia y /metrics se
+# coordinan a través de este directorio; el lanzador lo crea y lo pasa a cada worker. El refresco
+# de estadísticas y el barrido de bloqueos los hace solo el worker líder.
+ESTADO_COMPARTIDO_DIR = os.getenv("ESTADO_COMPARTIDO_DIR")
+generaciones_compartidas = None
+metricas_compartidas = None
+lider = None
+if ESTADO_COMPARTIDO_DIR:
+    import compartido  # solo POSIX (fcntl)
+
+    os.makedirs(ESTADO_COMPARTIDO_DIR, exist_ok=True)
+    generaciones_compartidas = compartido.GeneracionesCompartidas(
+        os.path.join(ESTADO_COMPARTIDO_DIR, "generaciones"))
+    lider = compartido.Liderazgo(os.path.join(ESTADO_COMPARTIDO_DIR, "lider.lock"))
+    if METRICAS:
+        metricas_compartidas = compartido.MetricasCompartidas(
+            os.path.join(ESTADO_COMPARTIDO_DIR, "metricas"), metricas.registro,
+            intervalo=float(os.getenv("METRICAS_VOLCADO_SEG", 5)))
+        metricas_compartidas.iniciar()
+
+# -------------------------------
+# Réplicas de lectura (replicas.py)
+# -------------------------------
+# DB_REPLICA_URLS: URLs separadas por coma, con el mismo formato que DB_URL; vacío = todo al primario
+_replica_urls = [u.strip() for u in os.getenv("DB_REPLICA_URLS", "").split(",") if u.strip()]
+enrutador = None
+if _replica_urls:
+    enrutador = EnrutadorLecturas(
+        pool, _replica_urls,
+        estrategia=os.getenv("DB_REPLICA_ESTRATEGIA", "round_robin"),
+        verificar_cada=float(os.getenv("DB_REPLICA_VERIFICAR_SEG", 5)),
+        max_retraso=float(os.getenv("DB_REPLICA_MAX_RETRASO_SEG", 5)),
+        ventana_propias=float(os.getenv("DB_REPLICA_VENTANA_PROPIAS_SEG", 5)),
+        generaciones=generaciones_compartidas,
+        maxconn=int(os.getenv("DB_REPLICA_POOL_MAX", pool.maxconn)),
+        timeout=pool.timeout,
+        max_vida=pool.max_vida,
+        verificar_tras=pool.verificar_tras,
+        connect_timeout=int(os.getenv("DB_REPLICA_TIMEOUT_CONEXION_SEG", 3)),
+        **({"cursor_factory": metricas.CursorMedido} if METRICAS else {}),
     )
+    if METRICAS:
+        enrutador.al_prestar(metricas.observar_conexion)
+    enrutador.iniciar()
+
+# -------------------------------
+# Conteos en cache (evita recontar el catálogo en cada página)
+# -------------------------------
+CONTEO_TTL = float(os.getenv("CONTEO_TTL", 60))
+_conteos = {}
+_conteos_lock = threading.Lock()
+
+
+def contar_juegos_cache(genero=None, plataforma=None):
+    # La generación compartida descarta los conteos que otro worker invalidó
+    generacion = generaciones_compartidas.generacion("conteos") if generaciones_compartidas else 0
+    clave = (genero, plataforma, generacion)
+    ahora = time.monotonic()
+    with _conteos_lock:
+        guardado = _conteos.get(clave)
+    if guardado and ahora - guardado[1] < CONTEO_TTL:
+        return guardado[0]
+
+    with get_conn() as conn, conn.cursor() as cur:
+        if genero is None and plataforma is None:
+            cur.callproc("contar_juegos")
+        else:
+            cur.execute("SELECT contar_juegos_func_optimizado(%s, %s);", (genero, plataforma))
+        total = cur.fetchone()[0]
+
+    with _conteos_lock:
+        _conteos[clave] = (total, ahora)
+    return total
+
+
+def invalidar_conteos():
+    with _conteos_lock:
+        _conteos.clear()
+    if generaciones_compartidas is not None:
+        generaciones_compartidas.invalidar("conteos")
+
+# -------------------------------
+# Compresión gzip/brotli de las respuestas (compresion.py)
+# -------------------------------
+compresor = None
+if os.getenv("COMPRESION", "1") != "0":
+    compresor = Compresor(
+        minimo=int(os.getenv("COMPRESION_MIN_BYTES", 1024)),
+        nivel_gzip=int(os.getenv("COMPRESION_NIVEL_GZIP", 6)),
+        nivel_brotli=int(os.getenv("COMPRESION_NIVEL_BROTLI", 5)),
+    )
+
+# -------------------------------
+# Cache de respuestas de catálogo y estadísticas
+# -------------------------------
+# Géneros y plataformas casi no cambian: el navegador los reutiliza este tiempo sin preguntar
+MAX_AGE_CATALOGO = int(os.getenv("HTTP_MAX_AGE_CATALOGO", 60))
+_cache_redis_url = os.getenv("CACHE_REDIS_URL")  # p. ej. redis://localhost:6379/0; vacío = en memoria
+cache = CacheRespuestas(
+    BackendRedis(_cache_redis_url) if _cache_redis_url else BackendMemoria(
+        max_entradas=int(os.getenv("CACHE_MAX_ENTRADAS", 1000)),
+        max_bytes=int(float(os.getenv("CACHE_MAX_MB", 64)) * 1024 ** 2),
+        generaciones=generaciones_compartidas,
+    ),
+    ttl=float(os.getenv("CACHE_TTL", 300)),
+    activa=os.getenv("CACHE_RESPUESTAS", "1") != "0",
+    compresor=compresor,
+    max_age=int(os.getenv("HTTP_MAX_AGE", 0)),
+)
+
+
+# -------------------------------
+# Estadísticas materializadas (sql/012_estadisticas_materializadas.sql)
+# -------------------------------
+ESTADISTICAS_MATERIALIZADAS = os.getenv("ESTADISTICAS_MATERIALIZADAS", "0") == "1"
+refrescador = None
+if ESTADISTICAS_MATERIALIZADAS:
+    refrescador = RefrescadorEstadisticas(
+        pool,
+        intervalo=float(os.getenv("ESTADISTICAS_REFRESCO_SEG", 300)),
+        espera_minima=float(os.getenv("ESTADISTICAS_REFRESCO_MIN_SEG", 5)),
+        # Recién refrescadas, las respuestas cacheadas con la versión anterior ya no sirven
+        al_refrescar=lambda: cache.invalidar("estadisticas"),
+        generaciones=generaciones_compartidas,
+        lider=lider,
+    )
+    refrescador.iniciar()
+
+
+def consultar_estadistica(cur, nombre):
+    # Devuelve (filas, actualizado_en, plan); ?vivo=1 fuerza el cálculo en vivo (comparar o medir)
+    consulta_vivo, vista, orden = ESTADISTICAS[nombre]
+    if refrescador is None or request.args.get("vivo") == "1":
+        filas, plan = consultar_con_plan(cur, consulta_vivo)
+        return filas, datetime.now(timezone.utc).isoformat(), plan
+
+    filas, plan = consultar_con_plan(cur, sql_materializada(vista, orden), (vista,))
+    actualizado_en = filas[0][0].isoformat() if filas else None
+    return [fila[1:] for fila in filas if fila[1] is not None], actualizado_en, plan
+
+
+# -------------------------------
+# Índices en memoria para el autocompletado
+# -------------------------------
+indices_busqueda = {
+    "desarrolladores": IndiceNombres("desarrolladores"),
+    "etiquetas": IndiceNombres("etiquetas"),
+}
+sincronizador_indices = None
+if os.getenv("INDICE_BUSQUEDA", "1") != "0":
+    # Carga inicial en segundo plano; luego trae solo los nombres nuevos (p. ej. los que agrega el ETL)
+    sincronizador_indices = SincronizadorIndices(
+        pool, indices_busqueda, intervalo=float(os.getenv("INDICE_BUSQUEDA_SYNC_SEG", 30)))
+    sincronizador_indices.iniciar()
+
+
+COLUMNAS_CATALOGO = ("id", "nombre")
+COLUMNAS_JUEGO = ("id", "nombre", "fecha", "rating")
+COLUMNAS_USUARIO = ("id", "nombre", "correo")
+
+
+def filas_json(columnas, filas):
+    # Las filas del cursor van tal cual a la respuesta (ver serializacion.py); con
+    # ?formato=columnas salen como {"columns": [...], "rows": [[...], ...]}
+    return serializacion.Filas(columnas, filas, columnar=request.args.get("formato") == "columnas")
+
+
+def autocompletar(dimension, funcion):
+    q = request.args.get("q", "").lower()
+    limit = min(100, max(1, int(request.args.get("limit", 20))))
+    indice = indices_busqueda[dimension]
+    if indice.listo:
+        resultados = indice.buscar(q, limit)
+    else:
+        # Arranque en frío: mientras se carga el índice responde la búsqueda en PostgreSQL
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.callproc(funcion, (q,))
+            resultados = cur.fetchmany(limit)
+    return jsonify(filas_json(COLUMNAS_CATALOGO, resultados))
+
+
+# -------------------------------
+# Bloqueos de edición (sql/013_bloqueos.sql)
+# -------------------------------
+# tabla: compartidos por todos los procesos; memoria: solo para pruebas o un único proceso
+BLOQUEOS_BACKEND = os.getenv("BLOQUEOS_BACKEND", "tabla")
+bloqueos = GestorBloqueos(
+    BackendBloqueosMemoria() if BLOQUEOS_BACKEND == "memoria" else BackendBloqueosTabla(pool),
+    ttl=int(os.getenv("BLOQUEOS_TTL_SEG", 300)),
+    barrido=float(os.getenv("BLOQUEOS_BARRIDO_SEG", 60)),
+    # La tabla es una sola para todos los workers; la memoria es de cada proceso
+    lider=lider if BLOQUEOS_BACKEND != "memoria" else None,
+)
+bloqueos.iniciar()
+
+
+# -------------------------------
+# Presencia de usuarios en memoria (pings agrupados en lotes)
+# -------------------------------
+presencia = None
+if os.getenv("PRESENCIA", "1") != "0":
+    presencia = RastreadorPresencia(
+        pool,
+        intervalo=float(os.getenv("PRESENCIA_VOLCADO_SEG", 5)),
+        retencion=float(os.getenv("PRESENCIA_RETENCION_SEG", 300)),
+        # Con varios procesos (p. ej. varios workers) todos deben apuntar al mismo archivo
+        archivo=os.getenv("PRESENCIA_ARCHIVO") or (
+            os.path.join(ESTADO_COMPARTIDO_DIR, "presencia.sqlite3") if ESTADO_COMPARTIDO_DIR else None),
+    )
+    presencia.iniciar()
+
+USUARIOS_TTL = float(os.getenv("USUARIOS_TTL_SEG", 60))
+_usuarios = {"por_id": {}, "cargado_en": 0.0}
+_usuarios_lock = threading.Lock()
+
+
+def usuarios_por_id(ids_necesarios=()):
+    # Directorio id -> (id, nombre, correo); se recarga al vencer o si aparece un id desconocido
+    with _usuarios_lock:
+        por_id, cargado_en = _usuarios["por_id"], _usuarios["cargado_en"]
+    faltan = any(i not in por_id for i in ids_necesarios)
+    if faltan or time.monotonic() - cargado_en > USUARIOS_TTL:
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.callproc("obtener_usuarios_simulados")
+            por_id = {row[0]: row for row in cur.fetchall()}
+        with _usuarios_lock:
+            _usuarios["por_id"], _usuarios["cargado_en"] = por_id, time.monotonic()
+    return por_id
+
+
+# -------------------------------
+# Índice de facetas en memoria (filtros combinados con conteos)
+# -------------------------------
+indice_facetas = None
+if os.getenv("FACETAS", "1") != "0":
+    indice_facetas = IndiceFacetas(
+        pool,
+        intervalo=float(os.getenv("FACETAS_SYNC_SEG", 30)),
+        reconstruir_cada=float(os.getenv("FACETAS_RECONSTRUIR_SEG", 3600)),
+        generaciones=generaciones_compartidas,
+    )
+    indice_facetas.iniciar()
+
+
+def invalidar_cache_juegos():
+    cache.invalidar("catalogo", "estadisticas")
+    invalidar_conteos()
+
+
+def invalidar_datos_juegos(ids=None):
+    # Toda escritura sobre juegos deja obsoletos listados, conteos y estadísticas
+    invalidar_cache_juegos()
+    if refrescador is not None:
+        refrescador.marcar_sucio()
+    if indice_facetas is not None and ids:
+        indice_facetas.marcar(ids)
+    if enrutador is not None:
+        # Quien escribió lee del primario un rato; y como otra petición pudo llenar la cache desde
+        # una réplica atrasada, se vuelve a invalidar cuando pasa el retraso máximo tolerado
+        usuario = usuario_de_peticion() if has_request_context() else None
+        if usuario:
+            enrutador.marcar_escritura(usuario)
+        enrutador.diferir(invalidar_cache_juegos)
 
 # -------------------------------
 # Crear la aplicación Flask
 # -------------------------------
+class ProveedorJSON(DefaultJSONProvider):
+    # jsonify con serializacion.py: fechas en ISO 8601, orjson si está instalado y Filas sin un
+    # dict por fila
+    def dumps(self, obj, **kwargs):
+        return serializacion.codificar(obj).decode("utf-8")
+
+    def response(self, *args, **kwargs):
+        cuerpo = serializacion.codificar(self._prepare_response_obj(args, kwargs)) + b"\n"
+        return self._app.response_class(cuerpo, mimetype=self.mimetype)
+
+
 app = Flask(__name__)
+app.json = ProveedorJSON(app)
 CORS(app)
 app.locked_conns = {}
+if METRICAS:
+    metricas.instrumentar(app, umbral_lentas_ms=float(os.getenv("LENTAS_UMBRAL_MS", 500)))
+# Registrada después: corre antes que la medición, que así cuenta los bytes comprimidos
+if compresor is not None:
+    compresor.instalar(app)
 
 # -------------------------------
 # Rutas del API
@@ -49,48 +417,52 @@ def asignar_usuario_simulado():
     from flask import g, request
     if request.is_json:
         data = request.get_json(silent=True)
-        g.usuario_simulado = data.get("usuario_simulado", "anonimo") if data else "anonimo"
+        g.usuario_simulado = data.get("usuario_simulado", "anonimo") if isinstance(data, dict) else "anonimo"
     else:
         g.usuario_simulado = "anonimo"
 
 
 
 @app.route("/api/generos", methods=["GET"])
+@cache.cachear("catalogo", max_age=MAX_AGE_CATALOGO)
 def listar_generos():
     with get_conn() as conn:
         with conn.cursor() as cur:
             cur.callproc("obtener_generos")
             generos = cur.fetchall()    
-    return jsonify([{"id": g[0], "nombre": g[1]} for g in generos])
+    return jsonify(filas_json(COLUMNAS_CATALOGO, generos))
 
 @app.route("/api/plataformas", methods=["GET"])
+@cache.cachear("catalogo", max_age=MAX_AGE_CATALOGO)
 def listar_plataformas():
     with get_conn() as conn:
         with conn.cursor() as cur:
             cur.callproc("obtener_plataformas")
             plataformas = cur.fetchall()
-    return jsonify([{"id": p[0], "nombre": p[1]} for p in plataformas])
+    return jsonify(filas_json(COLUMNAS_CATALOGO, plataformas))
 
 @app.route("/api/desarrolladores", methods=["GET"])
 def listar_desarrolladores():
-    q = request.args.get("q", "").lower()
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.callproc("buscar_desarrolladores", (q,))
-            resultados = cur.fetchall()
-    return jsonify([{"id": r[0], "nombre": r[1]} for r in resultados])
+    return autocompletar("desarrolladores", "buscar_desarrolladores")
 
 @app.route("/api/etiquetas", methods=["GET"])
 def listar_etiquetas():
-    q = request.args.get("q", "").lower()
-    with get_conn() as conn:
-        with conn.cursor() as cur:
-            cur.callproc("buscar_etiquetas", (q,))
-            resultados = cur.fetchall()
-    return jsonify([{"id": r[0], "nombre": r[1]} for r in resultados])
+    return autocompletar("etiquetas", "buscar_etiquetas")
 
 @app.route("/api/juegos", methods=["GET"])
 def listar_juegos():
+    # Modo cursor: ?cursor=<next_cursor anterior> (vacío en la primera página) y ?orden=nombre|rating
+    if "cursor" in request.args:
+        try:
+            juegos, siguiente = pagina_por_cursor(None, None, "nombre")
+        except CursorInvalido as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({
+            "juegos": filas_json(COLUMNAS_JUEGO, juegos),
+            "total": contar_juegos_cache(),
+            "next_cursor": siguiente
+        })
+
     page = int(request.args.get("page", 1))
     limit = int(request.args.get("limit", 12))
     offset = (page - 1) * limit
@@ -100,20 +472,9 @@ def listar_juegos():
             cur.callproc("listar_juegos_paginado", (limit, offset))
             juegos = cur.fetchall()
 
-            cur.callproc("contar_juegos")
-            total_juegos = cur.fetchone()[0]
-
     resultado = {
-        "juegos": [
-            {
-                "id": row[0],
-                "nombre": row[1],
-                "fecha": row[2],
-                "rating": row[3]
-            }
-            for row in juegos
-        ],
-        "total": total_juegos
+        "juegos": filas_json(COLUMNAS_JUEGO, juegos),
+        "total": contar_juegos_cache()
     }
     return jsonify(resultado)
 
@@ -122,60 +483,116 @@ def listar_juegos():
 def filtrar_juegos():
     genero = request.args.get("genero")
     plataforma = request.args.get("plataforma")
-    page = max(1, int(request.args.get("page", 1)))
-    limit = int(request.args.get("limit", 12))
-    offset = (page - 1) * limit
 
     # Convertir "" en None para compatibilidad con SQL
     genero = None if genero == "" else genero
     plataforma = None if plataforma == "" else plataforma
 
+    if "cursor" in request.args:
+        try:
+            juegos, siguiente = pagina_por_cursor(genero, plataforma, "rating")
+            return jsonify({
+                "juegos": filas_json(COLUMNAS_JUEGO, juegos),
+                "total": contar_juegos_cache(genero, plataforma),
+                "next_cursor": siguiente
+            })
+        except CursorInvalido as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception:
+            log.exception("Error en filtrar_juegos")
+            return jsonify({"error": "No se pudieron cargar los juegos"}), 500
+
+    page = max(1, int(request.args.get("page", 1)))
+    limit = int(request.args.get("limit", 12))
+    offset = (page - 1) * limit
+
     try:
 
         with get_conn() as conn:
             with conn.cursor() as cur:
+                # EXPLAIN ANALYZE solo con ?explain=1 (o por muestreo del perfilador)
                 query = """SELECT * FROM filtrar_juegos_func(%s, %s, %s, %s);"""
-                cur.execute(query, (genero, plataforma, limit, offset))
-                juegos = cur.fetchall()
-                
-                 # Obtener EXPLAIN ANALYZE para el conteo
-                cur.execute("EXPLAIN ANALYZE SELECT * FROM filtrar_juegos_func(%s, %s, %s, %s);", (genero, plataforma, limit, offset))
-                plan = [row[0] for row in cur.fetchall()]
-
-                count_query = "SELECT contar_juegos_func_optimizado(%s, %s);"
-                cur.execute(count_query, (genero, plataforma))
-                total = cur.fetchone()[0]
+                juegos, plan = consultar_con_plan(cur, query, (genero, plataforma, limit, offset))
 
         resultado = {
-            "juegos": [
-                {
-                    "id": row[0],
-                    "nombre": row[1],
-                    "fecha": row[2].isoformat() if row[2] else None,
-                    "rating": row[3]
-                } for row in juegos
-            ],
-            "total": total,
+            "juegos": filas_json(COLUMNAS_JUEGO, juegos),
+            "total": contar_juegos_cache(genero, plataforma),
             "plan": plan
         }
 
         return jsonify(resultado)
 
-    except Exception as e:
-        print("Error en filtrar_juegos:", e)
+    except Exception:
+        log.exception("Error en filtrar_juegos")
         return jsonify({"error": "No se pudieron cargar los juegos"}), 500
 
+def parametro_lista(nombre):
+    # Acepta ?generos=Action,RPG y también ?generos=Action&generos=RPG
+    return [v.strip() for valor in request.args.getlist(nombre) for v in valor.split(",") if v.strip()]
+
+
+def parametro_fecha(nombre):
+    valor = request.args.get(nombre)
+    return datetime.strptime(valor, "%Y-%m-%d").date() if valor else None
+
+
+def parametro_numero(nombre):
+    valor = request.args.get(nombre)
+    return float(valor) if valor else None
+
+
+@app.route("/api/juegos/facetas", methods=["GET"])
+def filtrar_juegos_facetas():
+    # Varios valores por faceta (OR, o AND con <faceta>_modo=and), facetas combinadas con AND,
+    # rangos de rating y fecha, una página y los conteos por faceta en una sola respuesta
+    if indice_facetas is None:
+        return jsonify({"error": "Índice de facetas desactivado (FACETAS=0)"}), 404
+    if not indice_facetas.listo:
+        return jsonify({"error": "Índice de facetas cargando"}), 503, {"Retry-After": "5"}
+
+    try:
+        facetas = {}
+        for faceta in FACETAS:
+            modo = request.args.get(f"{faceta}_modo", "or")
+            if modo not in ("or", "and"):
+                return jsonify({"error": f"{faceta}_modo debe ser 'or' o 'and'"}), 400
+            facetas[faceta] = (indice_facetas.resolver(faceta, parametro_lista(faceta)), modo)
+        rating = (parametro_numero("rating_min"), parametro_numero("rating_max"))
+        fecha = (parametro_fecha("fecha_desde"), parametro_fecha("fecha_hasta"))
+        page = max(1, int(request.args.get("page", 1)))
+        limit = min(100, max(1, int(request.args.get("limit", 12))))
+    except ValueError as e:
+        return jsonify({"error": f"Parámetro inválido: {e}"}), 400
+
+    ids, total, conteos = indice_facetas.buscar(
+        facetas, rating, fecha, offset=(page - 1) * limit, limit=limit,
+        con_conteos=request.args.get("conteos") != "0")
+
+    juegos = {}
+    if ids:
+        try:
+            with get_conn() as conn, conn.cursor() as cur:
+                cur.execute("""
+                    SELECT id, nombre, fecha_lanzamiento, rating FROM juegos WHERE id = ANY(%s);
+                """, (ids,))
+                juegos = {row[0]: row for row in cur.fetchall()}
+        except Exception:
+            log.exception("Error en filtrar_juegos_facetas")
+            return jsonify({"error": "No se pudieron cargar los juegos"}), 500
+
+    return jsonify({
+        "juegos": filas_json(COLUMNAS_JUEGO, [juegos[i] for i in ids if i in juegos]),
+        "total": total,
+        "facetas": conteos
+    })
+
 @app.route("/api/usuarios", methods=["GET"])
 def obtener_usuarios_simulados():
     with get_conn() as conn:
         with conn.cursor() as cur:
             cur.callproc("obtener_usuarios_simulados")
             usuarios = cur.fetchall()    
-    resultado = [
-        {"id": row[0], "nombre": row[1], "correo": row[2]}
-        for row in usuarios
-    ]
-    return jsonify(resultado)
+    return jsonify(filas_json(COLUMNAS_USUARIO, usuarios))
 
 @app.route("/api/juegos/<int:juego_id>/bloquear", methods=["POST"])
 def bloquear_juego(juego_id):
@@ -185,54 +602,43 @@ def bloquear_juego(juego_id):
         return jsonify({"error": "Falta header de usuario"}), 400
 
     try:
-        with get_conn() as conn:
-            with conn.cursor() as cur:
-                ahora = datetime.now(timezone.utc)
-                expiracion = ahora + timedelta(minutes=5)  # duración del lock
-
-                # Intenta bloquear si no está bloqueado o si el lock expiró
-                cur.execute("""
-                    UPDATE juegos
-                    SET bloqueado_por = %s,
-                        bloqueo_expira = %s
-                    WHERE id = %s AND (
-                        bloqueado_por IS NULL OR
-                        bloqueo_expira < %s OR
-                        bloqueado_por = %s
-                    )
-                    RETURNING id;
-                """, (usuario_id, expiracion, juego_id, ahora, usuario_id))
-
-                if cur.fetchone() is None:
-                    # Bloqueado por otro usuario
-                    cur.execute("""
-                        SELECT bloqueado_por, bloqueo_expira FROM juegos WHERE id = %s;
-                    """, (juego_id,))
-                    row = cur.fetchone()
-                    return jsonify({
-                        "error": "Juego actualmente en edición por otro usuario",
-                        "bloqueado_por": row[0],
-                        "bloqueo_expira": row[1].isoformat()
-                    }), 409
-
-                # Obtener datos del juego bloqueado
-                cur.callproc("obtener_juego_por_id", (juego_id,))
-                juego = cur.fetchone()
-
-                return jsonify({
-                    "id": juego[0],
-                    "nombre": juego[1],
-                    "fecha": juego[2],
-                    "rating": juego[3],
-                    "bloqueado_por": usuario_id,
-                    "bloqueo_expira": expiracion.isoformat(),
-                    "mensaje": "Juego bloqueado correctamente"
-                })
+        concesion = bloqueos.adquirir(juego_id, usuario_id)
+    except BloqueoOcupado as e:
+        return jsonify({
+            "error": "Juego actualmente en edición por otro usuario",
+            "bloqueado_por": e.usuario,
+            "bloqueo_expira": e.expira.isoformat()
+        }), 409
+    except Exception as e:
+        log.exception("Error al bloquear juego", extra={"juego_id": juego_id})
+        return jsonify({"error": str(e)}), 500
 
+    try:
+        # Obtener datos del juego bloqueado
+        with get_conn() as conn, conn.cursor() as cur:
+            cur.callproc("obtener_juego_por_id", (juego_id,))
+            juego = cur.fetchone()
     except Exception as e:
-        print("Error al bloquear juego:", e)
+        log.exception("Error al bloquear juego", extra={"juego_id": juego_id})
+        bloqueos.liberar(usuario_id, concesiones=[concesion["concesion"]])
         return jsonify({"error": str(e)}), 500
 
+    if juego is None:
+        bloqueos.liberar(usuario_id, concesiones=[concesion["concesion"]])
+        return jsonify({"error": "Juego no encontrado"}), 404
+
+    return jsonify({
+        "id": juego[0],
+        "nombre": juego[1],
+        "fecha": juego[2],
+        "rating": juego[3],
+        "bloqueado_por": concesion["usuario"],
+        "bloqueo_expira": concesion["expira"].isoformat(),
+        "concesion": concesion["concesion"],
+        "ttl": bloqueos.ttl,
+        "mensaje": "Juego bloqueado correctamente"
+    })
+
 @app.route("/api/juegos/<int:juego_id>/liberar", methods=["POST"])
 def liberar_juego(juego_id):
     usuario_id = request.headers.get("X-Usuario-Simulado-Id")
@@ -241,39 +647,93 @@ def liberar_juego(juego_id):
         return jsonify({"error": "Falta header de usuario"}), 400
 
     try:
-        with get_conn() as conn:
-            with conn.cursor() as cur:
-                # Solo el que lo bloqueó puede liberarlo
-                cur.execute("""
-                    UPDATE juegos
-                    SET bloqueado_por = NULL,
-                        bloqueo_expira = NULL
-                    WHERE id = %s AND bloqueado_por = %s;
-                """, (juego_id, usuario_id))
-                print("Intentando liberar el juego", juego_id, "por usuario", usuario_id, "-> bloqueado_por:", cur.fetchone())
+        # Solo el que lo bloqueó puede liberarlo
+        if not bloqueos.liberar(usuario_id, juegos=[juego_id]):
+            return jsonify({"error": "No tienes permisos para liberar este juego"}), 403
+        return jsonify({"mensaje": "Juego liberado correctamente"})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def concesion_json(concesion):
+    return {**concesion, "expira": concesion["expira"].isoformat()}
+
 
-                if cur.rowcount == 0:
-                    return jsonify({"error": "No tienes permisos para liberar este juego"}), 403
+def lista_del_cuerpo(data, clave):
+    valores = data.get(clave) or []
+    return valores if isinstance(valores, list) else [valores]
 
-                return jsonify({"mensaje": "Juego liberado correctamente"})
 
+@app.route("/api/bloqueos/renovar", methods=["POST"])
+def renovar_bloqueos():
+    # Heartbeat del editor: {"concesiones": [...]} (o "concesion"); devuelve las que siguen vigentes
+    usuario_id = request.headers.get("X-Usuario-Simulado-Id")
+    data = request.get_json(silent=True) or {}
+    concesiones = lista_del_cuerpo(data, "concesiones") + lista_del_cuerpo(data, "concesion")
+    if not usuario_id or not concesiones:
+        return jsonify({"error": "Faltan el header de usuario o las concesiones"}), 400
+
+    try:
+        renovadas = bloqueos.renovar(concesiones, usuario_id)
     except Exception as e:
+        log.exception("Error al renovar bloqueos")
         return jsonify({"error": str(e)}), 500
+
+    vigentes = {c["concesion"] for c in renovadas}
+    resultado = {
+        "renovadas": [concesion_json(c) for c in renovadas],
+        "perdidas": [c for c in concesiones if str(c).replace("-", "") not in vigentes],
+    }
+    # 410: ninguna sigue vigente (venció o la tomó otro usuario) y el editor debe volver a bloquear
+    return jsonify(resultado), 200 if renovadas else 410
+
+@app.route("/api/bloqueos/liberar", methods=["POST"])
+def liberar_bloqueos():
+    # Liberación en lote: {"juegos": [ids]} y/o {"concesiones": [ids]}
+    usuario_id = request.headers.get("X-Usuario-Simulado-Id")
+    data = request.get_json(silent=True) or {}
+    if not usuario_id:
+        return jsonify({"error": "Falta header de usuario"}), 400
+
+    try:
+        liberados = bloqueos.liberar(usuario_id, juegos=lista_del_cuerpo(data, "juegos"),
+                                     concesiones=lista_del_cuerpo(data, "concesiones"))
+    except ValueError:
+        return jsonify({"error": "Los ids de juego deben ser enteros"}), 400
+    except Exception as e:
+        log.exception("Error al liberar bloqueos")
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"liberados": liberados})
+
+@app.route("/api/bloqueos", methods=["GET"])
+def listar_bloqueos():
+    # Bloqueos vigentes de ?usuario= (por defecto, el del header)
+    usuario_id = request.args.get("usuario") or request.headers.get("X-Usuario-Simulado-Id")
+    if not usuario_id:
+        return jsonify({"error": "Falta el usuario"}), 400
+    return jsonify([concesion_json(c) for c in bloqueos.de_usuario(usuario_id)])
+
+@app.route("/api/bloqueos/metricas", methods=["GET"])
+def metricas_bloqueos():
+    return jsonify(bloqueos.metricas())
     
 # ---------- heartbeat ----------
 @app.route("/api/usuarios/activos", methods=["GET"])
 def usuarios_activos():
     ventana = int(request.args.get("ventana", 15))  # segundos
 
+    if presencia is not None and ventana <= presencia.retencion:
+        ids = presencia.activos(ventana)
+        directorio = usuarios_por_id(ids)
+        rows = [directorio[i] for i in ids if i in directorio]
+        return jsonify(filas_json(COLUMNAS_USUARIO, rows))
+
     with get_conn() as conn, conn.cursor() as cur:
         cur.callproc("obtener_usuarios_activos", (ventana,))
         rows = cur.fetchall()
 
-    activos = [
-        {"id": row[0], "nombre": row[1], "correo": row[2]}
-        for row in rows
-    ]
-    return jsonify(activos)
+    return jsonify(filas_json(COLUMNAS_USUARIO, rows))
 
 @app.route("/api/usuarios/ping", methods=["POST"])
 def ping_usuario():
@@ -281,6 +741,14 @@ def ping_usuario():
     if not usuario_id:
         return jsonify({"error": "Falta el ID del usuario simulado"}), 400
 
+    if presencia is not None:
+        # Solo memoria: el hilo de presencia lo escribe en PostgreSQL en el próximo volcado
+        try:
+            presencia.ping(int(usuario_id))
+        except ValueError:
+            return jsonify({"error": "ID de usuario simulado inválido"}), 400
+        return jsonify({"status": "ok"})
+
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute("SELECT actualizar_ping(%s)", (usuario_id,))
         conn.commit()
@@ -290,19 +758,18 @@ def ping_usuario():
 @app.route("/api/juegos/<int:juego_id>", methods=["GET"])
 def obtener_juego_por_id(juego_id):
     try:
-        with get_conn() as conn, conn.cursor() as cur:
-            cur.callproc("obtener_juego_por_id", (juego_id,))
+        # Primario: la versión que se lee aquí vuelve en el If-Match del PUT
+        with get_conn(primario=True) as conn, conn.cursor() as cur:
+            # Lee también la versión (sql/014) para el ETag de la concurrencia optimista
+            cur.execute("""
+                SELECT id, nombre, fecha_lanzamiento, rating, version FROM juegos WHERE id = %s;
+            """, (juego_id,))
             juego = cur.fetchone()
 
             if not juego:
                 return jsonify({"error": "Juego no encontrado"}), 404
 
-            return jsonify({
-                "id": juego[0],
-                "nombre": juego[1],
-                "fecha_lanzamiento": juego[2].isoformat() if juego[2] else None,
-                "rating": juego[3]
-            })
+            return respuesta_con_version(juego_version_json(juego), juego[4])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -321,52 +788,158 @@ def buscar_usuario_por_correo():
 
 
 
+# -------------------------------
+# Inserción de juegos (un round trip por lote con insertar_juegos_lote)
+# -------------------------------
+LOTE_INSERCION = int(os.getenv("LOTE_INSERCION", 200))
+
+
+def normalizar_juego_nuevo(data):
+    # Devuelve (juego, error) con el formato que espera insertar_juegos_lote
+    if not isinstance(data, dict):
+        return None, "Cada juego debe ser un objeto JSON"
+    if not data.get("nombre"):
+        return None, "Faltan campos obligatorios"
+    juego = {
+        "nombre": data["nombre"],
+        "fecha": data.get("fecha") or None,
+        "rating": data.get("rating") or None,
+    }
+    for campo in ("generos", "plataformas", "desarrolladores", "etiquetas"):
+        valores = data.get(campo) or []
+        if not isinstance(valores, list):
+            return None, f"'{campo}' debe ser una lista de ids"
+        juego[campo] = valores
+    return juego, None
+
+
+def insertar_juegos_sql(cur, juegos):
+    cur.execute("SELECT ord, id FROM insertar_juegos_lote(%s::jsonb);", (psycopg2.extras.Json(juegos),))
+    ids = dict(cur.fetchall())
+    return [ids[i + 1] for i in range(len(juegos))]
+
+
 @app.route("/api/juegos/insertar", methods=["POST"])
 def insertar_juego():
     try:
         
         data = request.get_json(force=True)
-
-        nombre = data.get("nombre")
-        fecha = data.get("fecha") or None
-        rating = data.get("rating") or None
-        generos = data.get("generos", [])
-        plataformas = data.get("plataformas", [])
-        desarrolladores = data.get("desarrolladores", [])
-        etiquetas = data.get("etiquetas", [])
         usuario_simulado_id = request.headers.get("X-Usuario-Simulado-Id")
 
-        if not nombre or not usuario_simulado_id:
+        juego, error = normalizar_juego_nuevo(data)
+        if error or not usuario_simulado_id:
             return jsonify({"error": "Faltan campos obligatorios"}), 400
 
         from flask import g
         g.usuario_simulado = usuario_simulado_id
-        print("Usuario simulado ID:", g.usuario_simulado)
+        log.debug("Insertar juego", extra={"usuario": g.usuario_simulado})
 
+        # get_conn() aplica application_name = usuario simulado al prestar la conexión
         with get_conn() as conn, conn.cursor() as cur:
-            cur.execute("SET application_name = %s;", (str(usuario_simulado_id),))
+            # Insertar juego y relaciones en una sola llamada
+            juego_id = insertar_juegos_sql(cur, [juego])[0]
 
+        invalidar_datos_juegos([juego_id])
+        return jsonify({"mensaje": "Juego insertado correctamente", "id": juego_id})
 
-            # Insertar juego y relaciones
-            cur.execute("SELECT insertar_juego(%s, %s, %s);", (nombre, fecha, rating))
-            juego_id = cur.fetchone()[0]
+    except Exception as e:
+        log.exception("Error al insertar juego")
+        return jsonify({"error": str(e)}), 500
 
-            for id_genero in generos:
-                cur.execute("SELECT insertar_juego_genero(%s, %s);", (juego_id, id_genero))
-            for id_plataforma in plataformas:
-                cur.execute("SELECT insertar_juego_plataforma(%s, %s);", (juego_id, id_plataforma))
-            for id_desarrollador in desarrolladores:
-                cur.execute("SELECT insertar_juego_desarrollador(%s, %s);", (juego_id, id_desarrollador))
-            for id_etiqueta in etiquetas:
-                cur.execute("SELECT insertar_juego_etiqueta(%s, %s);", (juego_id, id_etiqueta))
 
-            conn.commit()
+@app.route("/api/juegos/insertar/lote", methods=["POST"])
+def insertar_juegos_lote():
+    # Acepta una lista JSON o NDJSON (un juego por línea); devuelve un resultado por juego
+    usuario_simulado_id = request.headers.get("X-Usuario-Simulado-Id")
+    if not usuario_simulado_id:
+        return jsonify({"error": "Falta header de usuario"}), 400
 
-        return jsonify({"mensaje": "Juego insertado correctamente", "id": juego_id})
+    try:
+        if request.mimetype == "application/x-ndjson":
+            datos = [json.loads(linea) for linea in request.get_data(as_text=True).splitlines() if linea.strip()]
+        else:
+            datos = request.get_json(force=True)
+    except ValueError as e:
+        return jsonify({"error": f"JSON inválido: {e}"}), 400
+    if not isinstance(datos, list):
+        return jsonify({"error": "Se esperaba una lista de juegos"}), 400
 
+    g.usuario_simulado = usuario_simulado_id
+    resultados = [None] * len(datos)
+    validos = []
+    for i, data in enumerate(datos):
+        juego, error = normalizar_juego_nuevo(data)
+        if error:
+            resultados[i] = {"indice": i, "ok": False, "error": error}
+        else:
+            validos.append((i, juego))
+
+    try:
+        with get_conn() as conn, conn.cursor() as cur:
+            for inicio in range(0, len(validos), LOTE_INSERCION):
+                lote = validos[inicio:inicio + LOTE_INSERCION]
+                try:
+                    ids = insertar_juegos_sql(cur, [juego for _, juego in lote])
+                    for (i, _), juego_id in zip(lote, ids):
+                        resultados[i] = {"indice": i, "ok": True, "id": juego_id}
+                except psycopg2.Error:
+                    # El lote falló: se reintenta juego a juego para aislar los que dan error
+                    conn.rollback()
+                    for i, juego in lote:
+                        cur.execute("SAVEPOINT juego;")
+                        try:
+                            juego_id = insertar_juegos_sql(cur, [juego])[0]
+                            cur.execute("RELEASE SAVEPOINT juego;")
+                            resultados[i] = {"indice": i, "ok": True, "id": juego_id}
+                        except psycopg2.Error as e:
+                            cur.execute("ROLLBACK TO SAVEPOINT juego;")
+                            resultados[i] = {"indice": i, "ok": False, "error": str(e).strip().splitlines()[0]}
+                conn.commit()
     except Exception as e:
-        print("Error al insertar juego:", e)
-        return jsonify({"error": str(e)}), 500
+        log.exception("Error al insertar lote de juegos")
+        return jsonify({"error": str(e), "resultados": [r for r in resultados if r]}), 500
+    finally:
+        if validos:
+            invalidar_datos_juegos([r["id"] for r in resultados if r and r["ok"]])
+
+    insertados = sum(1 for r in resultados if r["ok"])
+    return jsonify({
+        "insertados": insertados,
+        "fallidos": len(resultados) - insertados,
+        "resultados": resultados
+    })
+
+# -------------------------------
+# Concurrencia optimista (sql/014_version_juegos.sql)
+# -------------------------------
+# GET /api/juegos/<id> devuelve la versión del juego como ETag. Un PUT con If-Match solo se aplica
+# si la versión sigue siendo esa (compare-and-swap en una sola llamada, que escribe a través de
+# actualizar_juego y bloquea la fila solo durante ese UPDATE); si otro la cambió responde 412 con la fila actual, que trae la versión para reintentar sin otro GET.
+# Sin If-Match el PUT sigue siendo "gana el último" (pensado para usarse junto con /bloquear).
+EXIGIR_IF_MATCH = os.getenv("EXIGIR_IF_MATCH", "0") == "1"
+
+
+def juego_version_json(fila):
+    return {
+        "id": fila[0],
+        "nombre": fila[1],
+        "fecha_lanzamiento": fila[2].isoformat() if fila[2] else None,
+        "rating": fila[3],
+        "version": fila[4],
+    }
+
+
+def respuesta_con_version(cuerpo, version, estado=200):
+    respuesta = jsonify(cuerpo)
+    respuesta.status_code = estado
+    respuesta.set_etag(str(version))
+    return respuesta
+
+
+def versiones_if_match():
+    # Versiones aceptadas según If-Match; solo cuentan las etiquetas fuertes (RFC 9110)
+    return [int(e) for e in request.if_match.as_set() if e.isdigit()]
+
 
 @app.route("/api/juegos/<int:juego_id>", methods=["PUT"])
 def actualizar_juego_endpoint(juego_id):
@@ -380,71 +953,114 @@ def actualizar_juego_endpoint(juego_id):
     if not all([nombre, fecha_lanzamiento, rating is not None, usuario_simulado_id]):
         return jsonify({"error": "Faltan datos"}), 400
 
+    # If-Match: * equivale a no enviarlo (solo exige que el juego exista)
+    optimista = bool(request.if_match) and not request.if_match.star_tag
+    if EXIGIR_IF_MATCH and not optimista:
+        return jsonify({"error": "Falta el header If-Match con la versión del juego"}), 428
+
     from flask import g
     g.usuario_simulado = usuario_simulado_id
-    print("Usuario simulado:", g.usuario_simulado)
+    log.debug("Actualizar juego", extra={"usuario": g.usuario_simulado, "juego_id": juego_id})
 
     try:
-        conn = get_conn()
-        conn.autocommit = False
+        # La conexión prestada ya lleva application_name = usuario simulado
+        with get_conn() as conn, conn.cursor() as cur:
+            if optimista:
+                cur.execute("""
+                    SELECT * FROM actualizar_juego_si_version(%s, %s, %s, %s, %s::bigint[]);
+                """, (juego_id, nombre, fecha_lanzamiento, rating, versiones_if_match()))
+                fila = cur.fetchone()
+            else:
+                # Llamar a la función SQL que actualiza el juego
+                cur.execute("""
+                    SELECT actualizar_juego(%s, %s, %s, %s);
+                """, (juego_id, nombre, fecha_lanzamiento, rating))
 
-        with conn.cursor() as cur:
-            # Establecer el aplicación_name para identificar al usuario simulado
-            cur.execute("SET application_name = %s;", (str(usuario_simulado_id),))
-            
-            # Llamar a la función SQL que actualiza el juego
-            cur.execute("""
-                SELECT actualizar_juego(%s, %s, %s, %s);
-            """, (juego_id, nombre, fecha_lanzamiento, rating))
+        if not optimista:
+            invalidar_datos_juegos([juego_id])
+            return jsonify({"mensaje": "Juego actualizado con éxito"})
 
-        conn.commit()
-        return jsonify({"mensaje": "Juego actualizado con éxito"})
+        if fila is None:
+            return jsonify({"error": "Juego no encontrado"}), 404
+        actualizado, juego = fila[0], fila[1:]
+        if not actualizado:
+            return respuesta_con_version({
+                "error": "El juego fue modificado por otro usuario",
+                "actual": juego_version_json(juego),
+            }, juego[4], 412)
+
+        invalidar_datos_juegos([juego_id])
+        return respuesta_con_version({"mensaje": "Juego actualizado con éxito", **juego_version_json(juego)}, juego[4])
 
     except Exception as e:
-        print("Error al actualizar juego:", e)
+        log.exception("Error al actualizar juego", extra={"juego_id": juego_id})
         return jsonify({"error": str(e)}), 500
 
-    finally:
-        conn.close()
-
 @app.route("/api/juegos/<int:juego_id>/actualizar/concurrente", methods=["PUT"])
 def actualizar_juego_concurrencia(juego_id):
     # Reutiliza la lógica existente del endpoint principal
     return actualizar_juego_endpoint(juego_id)
 
 
+# Campos que se pueden pedir con ?campos= en los listados en streaming -> columna de juegos
+CAMPOS_JUEGO = {"id": "id", "nombre": "nombre", "fecha": "fecha_lanzamiento", "rating": "rating"}
+LOTE_STREAMING = int(os.getenv("LOTE_STREAMING", 2000))
+STREAMING_GZIP = os.getenv("STREAMING_GZIP", "1") != "0"
+
+
+def formato_streaming():
+    # ?stream=ndjson|json, o el header Accept: application/x-ndjson
+    formato = request.args.get("stream")
+    if formato is None and "application/x-ndjson" in request.headers.get("Accept", ""):
+        formato = "ndjson"
+    return formato
+
+
 @app.route("/api/juegos/todos", methods=["GET"])
+# El streaming no se cachea, y como puede elegirse con Accept, el JSON cacheado lleva Vary: Accept
+@cache.cachear("catalogo", omitir=lambda: formato_streaming() is not None, vary=("Accept",))
 def obtener_todos_juegos():
+    formato = formato_streaming()
+    if formato is not None:
+        if formato not in FORMATOS:
+            return jsonify({"error": f"stream debe ser uno de: {', '.join(FORMATOS)}"}), 400
+        campos = [c.strip() for c in request.args.get("campos", "id,nombre").split(",") if c.strip()]
+        desconocidos = [c for c in campos if c not in CAMPOS_JUEGO]
+        if desconocidos or not campos:
+            return jsonify({"error": f"Campos válidos: {', '.join(CAMPOS_JUEGO)}"}), 400
+
+        # Orden por id: lo sirve el índice de la clave primaria sin ordenar todo el catálogo antes
+        sql = f"SELECT {', '.join(CAMPOS_JUEGO[c] for c in campos)} FROM juegos ORDER BY id;"
+        lotes = lotes_de_consulta(get_conn(), sql, lote=LOTE_STREAMING, nombre="todos_juegos")
+        respuesta = respuesta_streaming(lotes, campos, formato,
+                                        gzip=STREAMING_GZIP and acepta_gzip(request) and request.args.get("gzip") != "0")
+        respuesta.vary.add("Accept")
+        return respuesta
+
     with get_conn() as conn, conn.cursor() as cur:
         cur.callproc("obtener_todos_juegos")
         juegos = cur.fetchall()
 
-    return jsonify([{"id": j[0], "nombre": j[1]} for j in juegos])
+    return jsonify(filas_json(COLUMNAS_CATALOGO, juegos))
 
 @app.route("/api/estadisticas/generos", methods=["GET"])
+@cache.cachear("estadisticas")
 def estadisticas_por_genero():
     with get_conn() as conn, conn.cursor() as cur:
-        # EXPLAIN ANALYZE
-        cur.execute("EXPLAIN ANALYZE SELECT * FROM estadisticas_juegos_por_genero();")
-        plan = [row[0] for row in cur.fetchall()]
-
-        # Llamar función real
-        cur.execute("SELECT * FROM estadisticas_juegos_por_genero();")
-        datos = cur.fetchall()
+        # Vista materializada si está activa; si no, la función real (EXPLAIN ANALYZE solo con ?explain=1)
+        datos, actualizado_en, plan = consultar_estadistica(cur, "generos")
 
     return jsonify({
         "datos": [{"genero": g, "total": t} for g, t in datos],
+        "actualizado_en": actualizado_en,
         "plan": plan
     })
     
 @app.route("/api/estadisticas/top3-genero-funcion", methods=["GET"])
+@cache.cachear("estadisticas")
 def top3_por_genero_funcion():
     with get_conn() as conn, conn.cursor() as cur:
-        cur.execute("EXPLAIN ANALYZE SELECT * FROM top3_juegos_por_genero();")
-        plan = [row[0] for row in cur.fetchall()]
-
-        cur.execute("SELECT * FROM top3_juegos_por_genero();")
-        resultados = cur.fetchall()
+        resultados, actualizado_en, plan = consultar_estadistica(cur, "top3")
 
     # Armar JSON para frontend
     return jsonify({
@@ -456,22 +1072,16 @@ def top3_por_genero_funcion():
                 "genero": row[3]
             } for row in resultados
         ],
+        "actualizado_en": actualizado_en,
         "plan": plan
     })
     
 @app.route("/api/estadisticas/top3-genero-funcion-opt", methods=["GET"])
+@cache.cachear("estadisticas")
 def top3_por_genero_funcion_opt():
     with get_conn() as conn, conn.cursor() as cur:
-        # Obtener plan EXPLAIN ANALYZE para la función optimizada
-        cur.execute("""
-            EXPLAIN ANALYZE
-            SELECT * FROM top3_juegos_por_genero_optimizado();
-        """)
-        plan = cur.fetchall()
-
-        # Ejecutar la función optimizada
-        cur.execute("SELECT * FROM top3_juegos_por_genero_optimizado();")
-        resultados = cur.fetchall()
+        # Función optimizada o su vista materializada (EXPLAIN ANALYZE solo con ?explain=1)
+        resultados, actualizado_en, plan = consultar_estadistica(cur, "top3_opt")
 
     # Armar JSON para frontend
     return jsonify({
@@ -483,8 +1093,96 @@ def top3_por_genero_funcion_opt():
                 "genero": row[3]
             } for row in resultados
         ],
-        "plan": [line[0] for line in plan]
+        "actualizado_en": actualizado_en,
+        "plan": plan
+    })
+@app.route("/api/pool/metricas", methods=["GET"])
+def metricas_pool():
+    return jsonify(pool.metricas())
+
+@app.route("/api/cache/metricas", methods=["GET"])
+def metricas_cache():
+    return jsonify(cache.metricas())
+
+@app.route("/api/replicas/metricas", methods=["GET"])
+def metricas_replicas():
+    if enrutador is None:
+        return jsonify({"activas": False})
+    return jsonify({"activas": True, **enrutador.metricas()})
+
+@app.route("/api/compresion/metricas", methods=["GET"])
+def metricas_compresion():
+    if compresor is None:
+        return jsonify({"activa": False})
+    return jsonify({"activa": True, **compresor.metricas()})
+
+@app.route("/api/estadisticas/frescura", methods=["GET", "POST"])
+def frescura_estadisticas():
+    if refrescador is None:
+        return jsonify({"materializadas": False})
+    if request.method == "POST":
+        # Refresco inmediato (p. ej. después de una carga del ETL)
+        refrescador.refrescar()
+    return jsonify({"materializadas": True, **refrescador.metricas()})
+
+@app.route("/api/busqueda/metricas", methods=["GET"])
+def metricas_busqueda():
+    return jsonify({
+        "sincronizaciones": sincronizador_indices.sincronizaciones if sincronizador_indices else 0,
+        "indices": [indice.memoria() for indice in indices_busqueda.values()],
     })
+
+@app.route("/api/presencia/metricas", methods=["GET"])
+def metricas_presencia():
+    if presencia is None:
+        return jsonify({"activa": False})
+    return jsonify({"activa": True, **presencia.metricas()})
+
+@app.route("/api/facetas/metricas", methods=["GET"])
+def metricas_facetas():
+    if indice_facetas is None:
+        return jsonify({"listo": False, "activo": False})
+    return jsonify(indice_facetas.metricas())
+
+# Estado de los componentes, leído en cada scrape de /metrics
+metricas.registro.medidor("backend_pool_conexiones", "Conexiones del pool por estado",
+                          lambda: {k: v for k, v in pool.metricas().items() if k in ("abiertas", "en_uso", "libres")},
+                          etiqueta="estado")
+metricas.registro.medidor("backend_pool_timeouts_total", "Préstamos del pool que agotaron la espera",
+                          lambda: pool.timeouts, tipo="counter")
+metricas.registro.medidor("backend_cache_total", "Consultas a la cache de respuestas",
+                          lambda: {"acierto": cache.aciertos, "fallo": cache.fallos}, etiqueta="resultado",
+                          tipo="counter")
+if enrutador is not None:
+    metricas.registro.medidor("backend_lecturas_total", "Préstamos de lectura por destino",
+                              lambda: enrutador.metricas()["lecturas"], etiqueta="destino", tipo="counter")
+    metricas.registro.medidor("backend_replica_sana", "1 si la réplica recibe lecturas",
+                              lambda: {r.nombre: int(r.sana) for r in enrutador.replicas}, etiqueta="replica")
+    metricas.registro.medidor("backend_replica_retraso_segundos", "Retraso de la réplica según la última verificación",
+                              lambda: {r.nombre: r.retraso for r in enrutador.replicas if r.retraso is not None},
+                              etiqueta="replica")
+metricas.registro.medidor("backend_bloqueos_conflictos_total", "Intentos de bloqueo rechazados (409)",
+                          lambda: bloqueos.conflictos, tipo="counter")
+
+
+@app.route("/metrics", methods=["GET"])
+def metricas_prometheus():
+    # Con varios workers, la suma de todos (cada uno según su último volcado)
+    texto = metricas_compartidas.exponer() if metricas_compartidas else metricas.registro.exponer()
+    return current_app.response_class(texto, mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/diagnostico/planes", methods=["GET", "DELETE"])
+def planes_capturados():
+    if request.method == "DELETE":
+        perfilador.limpiar()
+        return jsonify({"mensaje": "Planes eliminados"})
+    return jsonify({
+        "muestreo_n": perfilador.muestreo_n,
+        "umbral_ms": perfilador.umbral_ms,
+        "capturados": perfilador.capturados,
+        "planes": perfilador.planes()
+    })
+
 # -------------------------------
 # Iniciar el servidor
 # -------------------------------
@@ -492,12 +1190,12 @@ if __name__ == "__main__":
     # Para concurrencia en Windows, usar waitress
     try:
         from waitress import serve
-        print("Iniciando servidor con Waitress en el puerto 5000...")
+        log.info("Iniciando servidor con Waitress en el puerto 5000")
         serve(app,
           host="0.0.0.0",
           port=5000,
-          threads=8,          # más workers
+          threads=WAITRESS_THREADS,  # mismo tamaño que el pool de conexiones
           backlog=128)        # cola de espera más grande
     except ImportError:
-        print("Waitress no está instalado. Ejecutando con Flask (solo para desarrollo)")
+        log.warning("Waitress no está instalado. Ejecutando con Flask (solo para desarrollo)")
         app.run(debug=True, port=5000)
@@ -0,0 +1,513 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import asyncpg
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+import metricas
+import serializacion
+from bloqueos import BackendBloqueosMemoria, BackendBloqueosTablaAsync, BloqueoOcupado, GestorBloqueosAsync
+from cursores import ORDENES_CURSOR, CursorInvalido, codificar_cursor, decodificar_cursor
+from estadisticas_materializadas import ESTADISTICAS, RefrescadorEstadisticas, sql_materializada
+from pool_conexiones import PoolConexiones
+from presencia import RastreadorPresencia
+
+# -------------------------------
+# Modo asíncrono (ASGI): Starlette + asyncpg
+# -------------------------------
+# Alternativa a app.py para las rutas de lectura, heartbeat y bloqueos. Con Waitress cada petición
+# ocupa uno de WAITRESS_THREADS hilos mientras espera a PostgreSQL, así que unos pocos filtrados o
+# estadísticas lentas dejan en cola a todos los pings. Aquí una petición que espera a la base no
+# ocupa nada: miles de pings y renovaciones se multiplexan en un solo event loop por worker.
+# - Mismas rutas, parámetros y JSON que app.py (fechas ISO 8601 vía serializacion.py, cursores
+#   intercambiables); sin cache de respuestas, facetas, autocompletado, EXPLAIN ni escrituras de juegos.
+# - Los hilos de fondo (volcado de presencia, refresco de estadísticas) usan un PoolConexiones
+#   síncrono pequeño: no bloquean el event loop.
+# Uso: uvicorn app_async:app --port 5001 --workers 2   (o python app_async.py)
+
+load_dotenv()
+metricas.configurar_logging(os.getenv("LOG_NIVEL", "INFO"), os.getenv("LOG_FORMATO", "json"))
+log = logging.getLogger("backend_async")
+db_url = os.getenv("DB_URL")
+
+ASYNC_POOL_MIN = int(os.getenv("ASYNC_POOL_MIN", 2))
+ASYNC_POOL_MAX = int(os.getenv("ASYNC_POOL_MAX", 20))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+CONTEO_TTL = float(os.getenv("CONTEO_TTL", 60))
+USUARIOS_TTL = float(os.getenv("USUARIOS_TTL_SEG", 60))
+ESTADISTICAS_MATERIALIZADAS = os.getenv("ESTADISTICAS_MATERIALIZADAS", "0") == "1"
+
+# Se crean en el lifespan, dentro del event loop del worker
+pool = None
+bloqueos = None
+presencia = None
+refrescador = None
+
+
+def pool_fondo():
+    # Conexiones síncronas para los hilos de fondo
+    resultado = urlparse(db_url)
+    return PoolConexiones(
+        maxconn=2,
+        timeout=DB_POOL_TIMEOUT,
+        dbname=resultado.path[1:],
+        user=resultado.username,
+        password=resultado.password,
+        host=resultado.hostname,
+        port=resultado.port,
+    )
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    global pool, bloqueos, presencia, refrescador
+    pool = await asyncpg.create_pool(
+        db_url,
+        min_size=ASYNC_POOL_MIN,
+        max_size=ASYNC_POOL_MAX,
+        max_inactive_connection_lifetime=float(os.getenv("DB_POOL_MAX_VIDA", 1800)),
+        server_settings={"application_name": "backend_async"},
+    )
+    fondo = pool_fondo()
+
+    backend = BackendBloqueosMemoria() if os.getenv("BLOQUEOS_BACKEND", "tabla") == "memoria" \
+        else BackendBloqueosTablaAsync(pool)
+    bloqueos = GestorBloqueosAsync(
+        backend,
+        ttl=int(os.getenv("BLOQUEOS_TTL_SEG", 300)),
+        barrido=float(os.getenv("BLOQUEOS_BARRIDO_SEG", 60)),
+    )
+    bloqueos.iniciar()
+
+    if os.getenv("PRESENCIA", "1") != "0":
+        presencia = RastreadorPresencia(
+            fondo,
+            intervalo=float(os.getenv("PRESENCIA_VOLCADO_SEG", 5)),
+            retencion=float(os.getenv("PRESENCIA_RETENCION_SEG", 300)),
+            archivo=os.getenv("PRESENCIA_ARCHIVO") or None,
+        )
+        presencia.iniciar()
+
+    if ESTADISTICAS_MATERIALIZADAS:
+        refrescador = RefrescadorEstadisticas(
+            fondo,
+            intervalo=float(os.getenv("ESTADISTICAS_REFRESCO_SEG", 300)),
+            espera_minima=float(os.getenv("ESTADISTICAS_REFRESCO_MIN_SEG", 5)),
+        )
+        refrescador.iniciar()
+
+    log.info("Modo ASGI listo", extra={"pool_min": ASYNC_POOL_MIN, "pool_max": ASYNC_POOL_MAX})
+    try:
+        yield
+    finally:
+        bloqueos.detener()
+        if presencia is not None:
+            presencia.detener()
+        if refrescador is not None:
+            refrescador.detener()
+        await pool.close()
+        fondo.cerrar()
+
+
+# -------------------------------
+# Respuestas y consultas
+# -------------------------------
+class RespuestaJSON(JSONResponse):
+    # El mismo JSON que jsonify en app.py (serializacion.py)
+    def render(self, contenido):
+        return serializacion.codificar(contenido) + b"\n"
+
+
+async def consultar(sql, *args):
+    # Espera una conexión a lo sumo DB_POOL_TIMEOUT segundos (como PoolConexiones)
+    async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+        return await conn.fetch(sql, *args)
+
+
+async def consultar_valor(sql, *args):
+    async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+        return await conn.fetchval(sql, *args)
+
+
+def usuario_de(request):
+    return request.headers.get("X-Usuario-Simulado-Id")
+
+
+COLUMNAS_CATALOGO = ("id", "nombre")
+COLUMNAS_JUEGO = ("id", "nombre", "fecha", "rating")
+COLUMNAS_USUARIO = ("id", "nombre", "correo")
+
+
+def filas_json(request, columnas, filas):
+    # Como filas_json de app.py: ?formato=columnas devuelve {"columns": [...], "rows": [[...], ...]}
+    return serializacion.Filas(columnas, filas, columnar=request.query_params.get("formato") == "columnas")
+
+
+# -------------------------------
+# Conteos y directorio de usuarios en cache (por worker)
+# -------------------------------
+_conteos = {}
+_usuarios = {"por_id": {}, "cargado_en": 0.0}
+
+
+async def contar_juegos_cache(genero=None, plataforma=None):
+    clave = (genero, plataforma)
+    ahora = time.monotonic()
+    guardado = _conteos.get(clave)
+    if guardado and ahora - guardado[1] < CONTEO_TTL:
+        return guardado[0]
+    if genero is None and plataforma is None:
+        total = await consultar_valor("SELECT contar_juegos();")
+    else:
+        total = await consultar_valor("SELECT contar_juegos_func_optimizado($1, $2);", genero, plataforma)
+    _conteos[clave] = (total, ahora)
+    return total
+
+
+async def usuarios_por_id(ids_necesarios=()):
+    por_id = _usuarios["por_id"]
+    if any(i not in por_id for i in ids_necesarios) or time.monotonic() - _usuarios["cargado_en"] > USUARIOS_TTL:
+        por_id = {row[0]: row for row in await consultar("SELECT * FROM obtener_usuarios_simulados();")}
+        _usuarios["por_id"], _usuarios["cargado_en"] = por_id, time.monotonic()
+    return por_id
+
+
+# -------------------------------
+# Catálogo y listados
+# -------------------------------
+async def listar_generos(request):
+    generos = await consultar("SELECT * FROM obtener_generos();")
+    return RespuestaJSON(filas_json(request, COLUMNAS_CATALOGO, generos))
+
+
+async def listar_plataformas(request):
+    plataformas = await consultar("SELECT * FROM obtener_plataformas();")
+    return RespuestaJSON(filas_json(request, COLUMNAS_CATALOGO, plataformas))
+
+
+async def pagina_por_cursor(request, genero, plataforma, orden_defecto):
+    orden = request.query_params.get("orden", orden_defecto)
+    if orden not in ORDENES_CURSOR:
+        raise CursorInvalido(f"Orden no soportado: {orden}")
+    limit = min(100, max(1, int(request.query_params.get("limit", 12))))
+    valor, ultimo_id = decodificar_cursor(request.query_params.get("cursor"), orden)
+    filas = await consultar("SELECT * FROM listar_juegos_cursor($1, $2, $3, $4, $5, $6);",
+                            orden, genero, plataforma, valor, ultimo_id, limit)
+    siguiente = codificar_cursor(orden, filas[-1]) if len(filas) == limit else None
+    return filas, siguiente
+
+
+async def listar_juegos(request):
+    if "cursor" in request.query_params:
+        try:
+            juegos, siguiente = await pagina_por_cursor(request, None, None, "nombre")
+        except CursorInvalido as e:
+            return RespuestaJSON({"error": str(e)}, 400)
+        return RespuestaJSON({"juegos": filas_json(request, COLUMNAS_JUEGO, juegos),
+                              "total": await contar_juegos_cache(), "next_cursor": siguiente})
+
+    page = int(request.query_params.get("page", 1))
+    limit = int(request.query_params.get("limit", 12))
+    juegos = await consultar("SELECT * FROM listar_juegos_paginado($1, $2);", limit, (page - 1) * limit)
+    return RespuestaJSON({"juegos": filas_json(request, COLUMNAS_JUEGO, juegos), "total": await contar_juegos_cache()})
+
+
+async def filtrar_juegos(request):
+    genero = request.query_params.get("genero") or None
+    plataforma = request.query_params.get("plataforma") or None
+
+    if "cursor" in request.query_params:
+        try:
+            juegos, siguiente = await pagina_por_cursor(request, genero, plataforma, "rating")
+        except CursorInvalido as e:
+            return RespuestaJSON({"error": str(e)}, 400)
+        return RespuestaJSON({"juegos": filas_json(request, COLUMNAS_JUEGO, juegos),
+                              "total": await contar_juegos_cache(genero, plataforma), "next_cursor": siguiente})
+
+    page = max(1, int(request.query_params.get("page", 1)))
+    limit = int(request.query_params.get("limit", 12))
+    juegos = await consultar("SELECT * FROM filtrar_juegos_func($1, $2, $3, $4);",
+                             genero, plataforma, limit, (page - 1) * limit)
+    # Sin EXPLAIN en este modo: "plan" se mantiene para que el frontend no cambie
+    return RespuestaJSON({"juegos": filas_json(request, COLUMNAS_JUEGO, juegos),
+                          "total": await contar_juegos_cache(genero, plataforma), "plan": []})
+
+
+# -------------------------------
+# Heartbeat y usuarios activos
+# -------------------------------
+async def ping_usuario(request):
+    usuario_id = usuario_de(request)
+    if not usuario_id:
+        return RespuestaJSON({"error": "Falta el ID del usuario simulado"}, 400)
+    try:
+        usuario_id = int(usuario_id)
+    except ValueError:
+        return RespuestaJSON({"error": "ID de usuario simulado inválido"}, 400)
+
+    if presencia is not None:
+        # Solo memoria: el hilo de presencia lo escribe en PostgreSQL en el próximo volcado
+        presencia.ping(usuario_id)
+    else:
+        await consultar_valor("SELECT actualizar_ping($1);", usuario_id)
+    return RespuestaJSON({"status": "ok"})
+
+
+async def usuarios_activos(request):
+    ventana = int(request.query_params.get("ventana", 15))
+    if presencia is not None and ventana <= presencia.retencion:
+        ids = presencia.activos(ventana)
+        directorio = await usuarios_por_id(ids)
+        rows = [directorio[i] for i in ids if i in directorio]
+    else:
+        rows = await consultar("SELECT * FROM obtener_usuarios_activos($1);", ventana)
+    return RespuestaJSON(filas_json(request, COLUMNAS_USUARIO, rows))
+
+
+# -------------------------------
+# Bloqueos de edición (sql/013_bloqueos.sql)
+# -------------------------------
+def concesion_json(concesion):
+    return {**concesion, "expira": concesion["expira"].isoformat()}
+
+
+def lista_del_cuerpo(data, clave):
+    valores = data.get(clave) or []
+    return valores if isinstance(valores, list) else [valores]
+
+
+async def cuerpo_json(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def bloquear_juego(request):
+    juego_id = request.path_params["juego_id"]
+    usuario_id = usuario_de(request)
+    if not usuario_id:
+        return RespuestaJSON({"error": "Falta header de usuario"}, 400)
+
+    try:
+        concesion = await bloqueos.adquirir(juego_id, usuario_id)
+    except BloqueoOcupado as e:
+        return RespuestaJSON({
+            "error": "Juego actualmente en edición por otro usuario",
+            "bloqueado_por": e.usuario,
+            "bloqueo_expira": e.expira.isoformat()
+        }, 409)
+
+    try:
+        filas = await consultar("SELECT * FROM obtener_juego_por_id($1);", juego_id)
+    except Exception:
+        await bloqueos.liberar(usuario_id, concesiones=[concesion["concesion"]])
+        raise
+    if not filas:
+        await bloqueos.liberar(usuario_id, concesiones=[concesion["concesion"]])
+        return RespuestaJSON({"error": "Juego no encontrado"}, 404)
+
+    return RespuestaJSON({
+        **dict(zip(COLUMNAS_JUEGO, filas[0])),
+        "bloqueado_por": concesion["usuario"],
+        "bloqueo_expira": concesion["expira"].isoformat(),
+        "concesion": concesion["concesion"],
+        "ttl": bloqueos.ttl,
+        "mensaje": "Juego bloqueado correctamente"
+    })
+
+
+async def liberar_juego(request):
+    usuario_id = usuario_de(request)
+    if not usuario_id:
+        return RespuestaJSON({"error": "Falta header de usuario"}, 400)
+    # Solo el que lo bloqueó puede liberarlo
+    if not await bloqueos.liberar(usuario_id, juegos=[request.path_params["juego_id"]]):
+        return RespuestaJSON({"error": "No tienes permisos para liberar este juego"}, 403)
+    return RespuestaJSON({"mensaje": "Juego liberado correctamente"})
+
+
+async def renovar_bloqueos(request):
+    usuario_id = usuario_de(request)
+    data = await cuerpo_json(request)
+    concesiones = lista_del_cuerpo(data, "concesiones") + lista_del_cuerpo(data, "concesion")
+    if not usuario_id or not concesiones:
+        return RespuestaJSON({"error": "Faltan el header de usuario o las concesiones"}, 400)
+
+    renovadas = await bloqueos.renovar(concesiones, usuario_id)
+    vigentes = {c["concesion"] for c in renovadas}
+    resultado = {
+        "renovadas": [concesion_json(c) for c in renovadas],
+        "perdidas": [c for c in concesiones if str(c).replace("-", "") not in vigentes],
+    }
+    # 410: ninguna sigue vigente y el editor debe volver a bloquear
+    return RespuestaJSON(resultado, 200 if renovadas else 410)
+
+
+async def liberar_bloqueos(request):
+    usuario_id = usuario_de(request)
+    data = await cuerpo_json(request)
+    if not usuario_id:
+        return RespuestaJSON({"error": "Falta header de usuario"}, 400)
+    try:
+        liberados = await bloqueos.liberar(usuario_id, juegos=lista_del_cuerpo(data, "juegos"),
+                                           concesiones=lista_del_cuerpo(data, "concesiones"))
+    except ValueError:
+        return RespuestaJSON({"error": "Los ids de juego deben ser enteros"}, 400)
+    return RespuestaJSON({"liberados": liberados})
+
+
+async def listar_bloqueos(request):
+    usuario_id = request.query_params.get("usuario") or usuario_de(request)
+    if not usuario_id:
+        return RespuestaJSON({"error": "Falta el usuario"}, 400)
+    return RespuestaJSON([concesion_json(c) for c in await bloqueos.de_usuario(usuario_id)])
+
+
+async def metricas_bloqueos(request):
+    return RespuestaJSON(bloqueos.metricas())
+
+
+# -------------------------------
+# Estadísticas (vistas materializadas si ESTADISTICAS_MATERIALIZADAS=1)
+# -------------------------------
+SQL_MATERIALIZADA = {
+    nombre: sql_materializada(vista, orden).replace("%s", "$1") for nombre, (_, vista, orden) in ESTADISTICAS.items()
+}
+
+
+async def consultar_estadistica(request, nombre):
+    consulta_vivo, vista, _ = ESTADISTICAS[nombre]
+    if refrescador is None or request.query_params.get("vivo") == "1":
+        return await consultar(consulta_vivo), datetime.now(timezone.utc).isoformat()
+    filas = await consultar(SQL_MATERIALIZADA[nombre], vista)
+    actualizado_en = filas[0][0].isoformat() if filas else None
+    return [fila[1:] for fila in filas if fila[1] is not None], actualizado_en
+
+
+async def estadisticas_por_genero(request):
+    datos, actualizado_en = await consultar_estadistica(request, "generos")
+    return RespuestaJSON({"datos": [{"genero": g, "total": t} for g, t in datos],
+                          "actualizado_en": actualizado_en, "plan": []})
+
+
+async def top3_por_genero_funcion(request):
+    resultados, actualizado_en = await consultar_estadistica(request, "top3")
+    return RespuestaJSON({
+        "resultados": [{"id": row[0], "nombre": row[1], "rating": row[2], "genero": row[3]} for row in resultados],
+        "actualizado_en": actualizado_en,
+        "plan": []
+    })
+
+
+async def top3_por_genero_funcion_opt(request):
+    resultados, actualizado_en = await consultar_estadistica(request, "top3_opt")
+    return RespuestaJSON({
+        "resultados": [
+            {"id": row[0], "nombre": row[1], "rating": float(row[2]) if row[2] is not None else None, "genero": row[3]}
+            for row in resultados
+        ],
+        "actualizado_en": actualizado_en,
+        "plan": []
+    })
+
+
+# -------------------------------
+# Métricas
+# -------------------------------
+async def metricas_pool(request):
+    tamano, libres = pool.get_size(), pool.get_idle_size()
+    return RespuestaJSON({"max": pool.get_max_size(), "abiertas": tamano, "en_uso": tamano - libres,
+                          "libres": libres})
+
+
+async def metricas_prometheus(request):
+    return Response(metricas.registro.exponer(), media_type="text/plain; version=0.0.4")
+
+
+metricas.registro.medidor("backend_pool_conexiones", "Conexiones del pool por estado",
+                          lambda: {"abiertas": pool.get_size(), "libres": pool.get_idle_size()} if pool else {},
+                          etiqueta="estado")
+
+
+class MedirPeticiones:
+    # Middleware ASGI mínimo: la misma serie backend_peticion_segundos que app.py, por plantilla de ruta
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        inicio = time.perf_counter()
+        estado = [500]
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            ruta = getattr(scope.get("route"), "path", "sin_ruta")
+            metricas.peticion_segundos.observar(time.perf_counter() - inicio, ruta, scope["method"], estado[0])
+
+
+async def base_saturada(request, exc):
+    # Ninguna conexión libre en DB_POOL_TIMEOUT segundos
+    return RespuestaJSON({"error": "Base de datos saturada, reintenta"}, 503)
+
+
+async def error_interno(request, exc):
+    # Starlette vuelve a lanzar la excepción después, y uvicorn la registra con su traceback
+    return RespuestaJSON({"error": str(exc)}, 500)
+
+
+app = Starlette(
+    routes=[
+        Route("/api/generos", listar_generos),
+        Route("/api/plataformas", listar_plataformas),
+        Route("/api/juegos", listar_juegos),
+        Route("/api/juegos/filtrar", filtrar_juegos),
+        Route("/api/juegos/{juego_id:int}/bloquear", bloquear_juego, methods=["POST"]),
+        Route("/api/juegos/{juego_id:int}/liberar", liberar_juego, methods=["POST"]),
+        Route("/api/bloqueos/renovar", renovar_bloqueos, methods=["POST"]),
+        Route("/api/bloqueos/liberar", liberar_bloqueos, methods=["POST"]),
+        Route("/api/bloqueos", listar_bloqueos),
+        Route("/api/bloqueos/metricas", metricas_bloqueos),
+        Route("/api/usuarios/ping", ping_usuario, methods=["POST"]),
+        Route("/api/usuarios/activos", usuarios_activos),
+        Route("/api/estadisticas/generos", estadisticas_por_genero),
+        Route("/api/estadisticas/top3-genero-funcion", top3_por_genero_funcion),
+        Route("/api/estadisticas/top3-genero-funcion-opt", top3_por_genero_funcion_opt),
+        Route("/api/pool/metricas", metricas_pool),
+        Route("/metrics", metricas_prometheus),
+    ],
+    middleware=[
+        Middleware(MedirPeticiones),
+        Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
+                   expose_headers=["ETag"]),
+    ],
+    exception_handlers={asyncio.TimeoutError: base_saturada, Exception: error_interno},
+    lifespan=ciclo_de_vida,
+)
+
+# -------------------------------
+# Iniciar el servidor
+# -------------------------------
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("app_async:app", host="0.0.0.0", port=int(os.getenv("ASGI_PUERTO", 5001)),
+                workers=int(os.getenv("ASGI_WORKERS", 1)), access_log=False)
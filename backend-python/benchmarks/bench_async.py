@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from carga import git, levantar_servidor, resumir
+
+# -------------------------------
+# Waitress (app.py) vs ASGI (app_async.py) con heartbeats y consultas lentas
+# -------------------------------
+# Levanta cada backend en un proceso aparte contra la misma base y le aplica la misma carga:
+# - `--latidos` clientes casi ociosos, cada uno con su conexión keep-alive: un ping cada
+#   `--intervalo` segundos; los primeros `--editores` además tienen un juego bloqueado y renuevan
+#   la concesión en cada latido (el editor de EditarJuegoConcurrencia.jsx).
+# - `--lentas` clientes en bucle cerrado sobre una ruta cara (por defecto las estadísticas en vivo).
+# Con Waitress los hilos quedan ocupados esperando a PostgreSQL y los pings hacen cola detrás; en
+# modo ASGI la espera no ocupa el event loop. Reporta p50/p95/p99 de ping y renovación y el
+# throughput de las lentas. El pool de la base tiene el mismo tamaño en los dos (--conexiones).
+# Los clientes son corrutinas (un solo hilo), así que miles de conexiones no cuestan hilos aquí.
+# Requiere starlette, uvicorn y asyncpg, además de sql/013. Conviene una base grande (las
+# estadísticas en vivo sobre 1M de juegos tardan segundos).
+# Uso: BENCH_DB_URL=postgresql://... python benchmarks/bench_async.py --latidos 1000 --lentas 16 --json asgi.json
+
+SERVIDORES = ["waitress", "asgi"]
+
+
+class ClienteAsync:
+    # HTTP/1.1 mínimo sobre una conexión keep-alive (Content-Length o chunked)
+    def __init__(self, host, puerto):
+        self.host = host
+        self.puerto = puerto
+        self.lector = self.escritor = None
+
+    async def pedir(self, metodo, ruta, cuerpo=None, headers=None):
+        datos = json.dumps(cuerpo).encode() if cuerpo is not None else b""
+        cabecera = f"{metodo} {ruta} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(datos)}\r\n"
+        if cuerpo is not None:
+            cabecera += "Content-Type: application/json\r\n"
+        for clave, valor in (headers or {}).items():
+            cabecera += f"{clave}: {valor}\r\n"
+        inicio = time.perf_counter()
+        try:
+            if self.escritor is None:
+                self.lector, self.escritor = await asyncio.open_connection(self.host, self.puerto)
+            self.escritor.write(cabecera.encode() + b"\r\n" + datos)
+            estado, respuesta = await self._leer()
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            self.cerrar()
+            estado, respuesta = 0, None
+        return estado, respuesta, (time.perf_counter() - inicio) * 1000
+
+    async def _leer(self):
+        estado = int((await self.lector.readuntil(b"\r\n")).split()[1])
+        headers = {}
+        while (linea := await self.lector.readuntil(b"\r\n")) != b"\r\n":
+            clave, _, valor = linea.decode("latin-1").partition(":")
+            headers[clave.strip().lower()] = valor.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            cuerpo = b""
+            while (tamano := int((await self.lector.readuntil(b"\r\n")).strip(), 16)) > 0:
+                cuerpo += (await self.lector.readexactly(tamano + 2))[:-2]
+            await self.lector.readuntil(b"\r\n")
+        else:
+            cuerpo = await self.lector.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection") == "close":
+            self.cerrar()
+        try:
+            return estado, json.loads(cuerpo) if cuerpo else None
+        except ValueError:
+            return estado, None
+
+    def cerrar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+        self.lector = self.escritor = None
+
+
+def levantar_asgi(puerto, conexiones, workers, db_url):
+    entorno = {**os.environ, "DB_URL": db_url, "ASYNC_POOL_MAX": str(conexiones), "LOG_NIVEL": "WARNING"}
+    log = tempfile.NamedTemporaryFile(prefix="bench_async_servidor_", suffix=".log", delete=False)
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app_async:app", "--host", "127.0.0.1", "--port", str(puerto),
+         "--workers", str(workers), "--no-access-log", "--log-level", "warning", "--backlog", "4096"],
+        env=entorno, stdout=log, stderr=log, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return proceso, log.name
+
+
+async def esperar_listo(host, puerto, proceso, log, limite=120):
+    cliente = ClienteAsync(host, puerto)
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if proceso.poll() is not None:
+            with open(log, encoding="utf-8", errors="replace") as f:
+                sys.exit(f"El servidor terminó al arrancar:\n{f.read()[-3000:]}")
+        estado, _, _ = await cliente.pedir("GET", "/api/generos")
+        if estado == 200:
+            cliente.cerrar()
+            return
+        await asyncio.sleep(0.5)
+    sys.exit("El servidor no quedó listo a tiempo")
+
+
+async def medir(host, puerto, args):
+    registro = {"ping": [], "renovar": [], "lenta": []}
+    rnd = random.Random(args.semilla)
+    inicio_medicion = time.monotonic() + args.calentamiento
+    fin = inicio_medicion + args.segundos
+
+    def anotar(tipo, estado, ms):
+        if time.monotonic() >= inicio_medicion:
+            registro[tipo].append((ms, estado))
+
+    # Los editores bloquean un juego distinto cada uno antes de empezar
+    preparacion = ClienteAsync(host, puerto)
+    _, pagina, _ = await preparacion.pedir("GET", f"/api/juegos?limit={args.editores}")
+    juegos = [j["id"] for j in (pagina or {}).get("juegos", [])]
+    concesiones = {}
+    for i, juego_id in enumerate(juegos):
+        estado, datos, _ = await preparacion.pedir("POST", f"/api/juegos/{juego_id}/bloquear",
+                                                   headers={"X-Usuario-Simulado-Id": i + 1})
+        if estado == 200:
+            concesiones[i + 1] = datos["concesion"]
+
+    async def latido(usuario, desfase):
+        cliente = ClienteAsync(host, puerto)
+        headers = {"X-Usuario-Simulado-Id": usuario}
+        await asyncio.sleep(desfase)
+        while time.monotonic() < fin:
+            siguiente = time.monotonic() + args.intervalo
+            estado, _, ms = await cliente.pedir("POST", "/api/usuarios/ping", headers=headers)
+            anotar("ping", estado, ms)
+            if usuario in concesiones:
+                estado, _, ms = await cliente.pedir("POST", "/api/bloqueos/renovar", headers=headers,
+                                                    cuerpo={"concesiones": [concesiones[usuario]]})
+                anotar("renovar", estado, ms)
+            await asyncio.sleep(max(0.0, siguiente - time.monotonic()))
+        cliente.cerrar()
+
+    async def lenta():
+        cliente = ClienteAsync(host, puerto)
+        while time.monotonic() < fin:
+            estado, _, ms = await cliente.pedir("GET", args.ruta_lenta)
+            anotar("lenta", estado, ms)
+            if estado == 0:
+                await asyncio.sleep(0.1)
+        cliente.cerrar()
+
+    tareas = [latido(u, rnd.uniform(0, args.intervalo)) for u in range(1, args.latidos + 1)]
+    tareas += [lenta() for _ in range(args.lentas)]
+    await asyncio.gather(*tareas)
+
+    for usuario, concesion in concesiones.items():
+        await preparacion.pedir("POST", "/api/bloqueos/liberar", cuerpo={"concesiones": [concesion]},
+                                headers={"X-Usuario-Simulado-Id": usuario})
+    preparacion.cerrar()
+    return {tipo: resumir(valores, args.segundos) for tipo, valores in registro.items()}
+
+
+def ejecutar(servidor, args, db_url):
+    if servidor == "waitress":
+        proceso, log = levantar_servidor(args.puerto, args.conexiones, db_url)
+    else:
+        proceso, log = levantar_asgi(args.puerto, args.conexiones, args.workers, db_url)
+    try:
+        asyncio.run(esperar_listo("127.0.0.1", args.puerto, proceso, log))
+        return asyncio.run(medir("127.0.0.1", args.puerto, args))
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Heartbeats y bloqueos con consultas lentas: Waitress vs ASGI")
+    parser.add_argument("--latidos", type=int, default=1000, help="clientes casi ociosos (ping periódico)")
+    parser.add_argument("--editores", type=int, default=100, help="de ellos, cuántos renuevan un bloqueo")
+    parser.add_argument("--intervalo", type=float, default=5, help="segundos entre latidos de un cliente")
+    parser.add_argument("--lentas", type=int, default=16, help="clientes en bucle sobre la ruta lenta")
+    parser.add_argument("--ruta-lenta", default="/api/estadisticas/generos?vivo=1")
+    parser.add_argument("--segundos", type=float, default=30)
+    parser.add_argument("--calentamiento", type=float, default=5)
+    parser.add_argument("--conexiones", type=int, default=8,
+                        help="hilos de Waitress y tamaño de ambos pools de conexiones")
+    parser.add_argument("--workers", type=int, default=1, help="procesos de uvicorn")
+    parser.add_argument("--servidores", nargs="+", choices=SERVIDORES, default=SERVIDORES)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--puerto", type=int, default=5056)
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    args = parser.parse_args()
+
+    db_url = os.environ["BENCH_DB_URL"]
+    # Lo que app_async.py no tiene se apaga también en app.py: la ruta lenta no debe salir de la cache
+    os.environ.update({"CACHE_RESPUESTAS": "0", "INDICE_BUSQUEDA": "0", "FACETAS": "0"})
+    resultados = {}
+    for servidor in args.servidores:
+        resultados[servidor] = ejecutar(servidor, args, db_url)
+        for tipo, r in resultados[servidor].items():
+            print(f"{servidor:9s} {tipo:8s} {r['por_seg']:8.1f} req/s | p50 {r['p50_ms']} ms"
+                  f" p95 {r['p95_ms']} ms p99 {r['p99_ms']} ms max {r['max_ms']} ms | errores {r['errores']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "fecha": datetime.now(timezone.utc).isoformat(),
+                "commit": git("rev-parse", "--short", "HEAD"),
+                "parametros": {k: v for k, v in vars(args).items() if k != "json"},
+                "resultados": resultados,
+            }, f, indent=2)
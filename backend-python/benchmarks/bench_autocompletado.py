@@ -0,0 +1,71 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indice_busqueda import IndiceNombres
+from sembrar_datos import conectar
+
+# -------------------------------
+# Autocompletado: índice en memoria vs buscar_desarrolladores / buscar_etiquetas
+# -------------------------------
+# Uso: BENCH_DB_URL=postgresql://... python benchmarks/bench_autocompletado.py --consultas 2000
+
+
+def percentiles(tiempos):
+    tiempos = sorted(tiempos)
+    return {
+        "p50_us": round(statistics.median(tiempos), 1),
+        "p95_us": round(tiempos[int(len(tiempos) * 0.95)], 1),
+        "p99_us": round(tiempos[int(len(tiempos) * 0.99)], 1),
+    }
+
+
+def consultas_tecleadas(nombres, total, rnd):
+    # Prefijos y fragmentos de nombres reales, como los que manda el autocompletado letra a letra
+    consultas = []
+    while len(consultas) < total:
+        nombre = rnd.choice(nombres).lower()
+        inicio = rnd.choice([0, 0, rnd.randrange(len(nombre))])
+        consultas.append(nombre[inicio:inicio + rnd.randint(1, 8)])
+    return consultas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia del autocompletado en memoria vs PostgreSQL")
+    parser.add_argument("--consultas", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    conn = conectar()
+    rnd = random.Random(0)
+    with conn.cursor() as cur:
+        for tabla, funcion in (("desarrolladores", "buscar_desarrolladores"), ("etiquetas", "buscar_etiquetas")):
+            indice = IndiceNombres(tabla)
+            inicio = time.perf_counter()
+            cur.execute(f"SELECT id, nombre FROM {tabla};")
+            filas = cur.fetchall()
+            indice.cargar(filas)
+            carga = time.perf_counter() - inicio
+
+            consultas = consultas_tecleadas([f[1] for f in filas if f[1]], args.consultas, rnd)
+            tiempos_indice, tiempos_bd = [], []
+            for q in consultas:
+                t0 = time.perf_counter()
+                indice.buscar(q, args.limit)
+                tiempos_indice.append((time.perf_counter() - t0) * 1e6)
+                t0 = time.perf_counter()
+                cur.callproc(funcion, (q,))
+                cur.fetchmany(args.limit)
+                tiempos_bd.append((time.perf_counter() - t0) * 1e6)
+
+            memoria = indice.memoria()
+            print(f"{tabla}: {len(indice)} nombres, carga {carga:.2f}s, {memoria['megabytes']} MB, "
+                  f"{memoria['aciertos_memo']} aciertos de memo")
+            print(f"  índice     {percentiles(tiempos_indice)}")
+            print(f"  PostgreSQL {percentiles(tiempos_bd)}")
+    conn.close()
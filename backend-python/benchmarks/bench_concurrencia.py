@@ -0,0 +1,176 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sembrar_datos import conectar
+
+# -------------------------------
+# Edición concurrente: bloqueo pesimista vs concurrencia optimista
+# -------------------------------
+# Varios hilos editan los mismos pocos juegos a través de la app (test client de Flask). Cada
+# edición lee el nombre "bench-<n>" y escribe "bench-<n+1>", así al final se sabe cuántas
+# ediciones se perdieron (exitosas - suma de los n finales):
+# - bloqueo: POST /bloquear (lee el juego) -> PUT -> POST /liberar; un 409 se reintenta más tarde.
+# - optimista: GET (ETag) -> PUT con If-Match; un 412 trae la fila actual y se reintenta con ella.
+# - sin_control: GET -> PUT sin If-Match (el "gana el último" de antes, para ver las pérdidas).
+# Requiere sql/013 y sql/014. Modifica los juegos usados y restaura nombre y fecha al final.
+# Uso: BENCH_DB_URL=postgresql://... python benchmarks/bench_concurrencia.py --hilos 16 --juegos 4
+
+MODOS = ["bloqueo", "optimista", "sin_control"]
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return round(valores[min(len(valores) - 1, int(len(valores) * p))], 2) if valores else None
+
+
+def siguiente(juego):
+    # /bloquear trae la fecha como "fecha" y GET /api/juegos/<id> como "fecha_lanzamiento" (ISO 8601)
+    n = int(juego["nombre"].rsplit("-", 1)[1])
+    fecha = juego.get("fecha_lanzamiento") or juego.get("fecha") or "2000-01-01"
+    return {"nombre": f"bench-{n + 1}", "fecha_lanzamiento": fecha, "rating": juego["rating"]}
+
+
+def editar_con_bloqueo(cliente, juego_id, headers, edicion_ms, contador):
+    while True:
+        contador["peticiones"] += 1
+        r = cliente.post(f"/api/juegos/{juego_id}/bloquear", headers=headers)
+        if r.status_code == 409:
+            contador["conflictos"] += 1
+            time.sleep(random.uniform(0, edicion_ms / 1000))
+            continue
+        if r.status_code != 200:
+            return False
+        juego = r.get_json()
+        time.sleep(edicion_ms / 1000)
+        contador["peticiones"] += 2
+        ok = cliente.put(f"/api/juegos/{juego_id}", headers=headers, json=siguiente(juego)).status_code == 200
+        cliente.post(f"/api/juegos/{juego_id}/liberar", headers=headers)
+        return ok
+
+
+def editar_optimista(cliente, juego_id, headers, edicion_ms, contador, if_match=True):
+    contador["peticiones"] += 1
+    r = cliente.get(f"/api/juegos/{juego_id}")
+    juego, etag = r.get_json(), r.headers["ETag"]
+    while True:
+        time.sleep(edicion_ms / 1000)
+        contador["peticiones"] += 1
+        r = cliente.put(f"/api/juegos/{juego_id}", json=siguiente(juego),
+                        headers={**headers, "If-Match": etag} if if_match else headers)
+        if r.status_code != 412:
+            return r.status_code == 200
+        # La respuesta trae la fila actual: se vuelve a aplicar la edición sin otro GET
+        contador["conflictos"] += 1
+        juego, etag = r.get_json()["actual"], r.headers["ETag"]
+
+
+def ejecutar(app, modo, ids, hilos, segundos, edicion_ms):
+    contadores = []
+    latencias = []
+    errores = []
+    fin = time.monotonic() + segundos
+
+    def trabajador(i):
+        cliente = app.app.test_client()
+        contador = {"peticiones": 0, "conflictos": 0}
+        contadores.append(contador)
+        headers = {"X-Usuario-Simulado-Id": str(i + 1)}
+        while time.monotonic() < fin:
+            juego_id = random.choice(ids)
+            inicio = time.perf_counter()
+            if modo == "bloqueo":
+                ok = editar_con_bloqueo(cliente, juego_id, headers, edicion_ms, contador)
+            else:
+                ok = editar_optimista(cliente, juego_id, headers, edicion_ms, contador, modo == "optimista")
+            if ok:
+                latencias.append((time.perf_counter() - inicio) * 1000)
+            else:
+                errores.append(juego_id)
+
+    trabajadores = [threading.Thread(target=trabajador, args=(i,)) for i in range(hilos)]
+    inicio = time.perf_counter()
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    duracion = time.perf_counter() - inicio
+    contador = {k: sum(c[k] for c in contadores) for k in ("peticiones", "conflictos")}
+    return {
+        "modo": modo,
+        "ediciones_por_seg": round(len(latencias) / duracion, 1),
+        "conflictos_por_edicion": round(contador["conflictos"] / max(len(latencias), 1), 3),
+        "peticiones_por_edicion": round(contador["peticiones"] / max(len(latencias), 1), 2),
+        "p50_ms": percentil(latencias, 0.5),
+        "p95_ms": percentil(latencias, 0.95),
+        "p99_ms": percentil(latencias, 0.99),
+        "ediciones": len(latencias),
+        "errores": len(errores),
+    }
+
+
+def preparar(conn, juegos):
+    with conn.cursor() as cur:
+        cur.execute("SELECT id, nombre, fecha_lanzamiento FROM juegos ORDER BY id LIMIT %s;", (juegos,))
+        originales = cur.fetchall()
+        cur.execute("UPDATE juegos SET nombre = 'bench-0' WHERE id = ANY(%s);", ([f[0] for f in originales],))
+    conn.commit()
+    return originales
+
+
+def perdidas(conn, ids, ediciones):
+    with conn.cursor() as cur:
+        cur.execute("SELECT nombre FROM juegos WHERE id = ANY(%s);", (ids,))
+        return ediciones - sum(int(n.rsplit("-", 1)[1]) for (n,) in cur.fetchall())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput y conflictos: bloqueo vs concurrencia optimista")
+    parser.add_argument("--hilos", type=int, default=16)
+    parser.add_argument("--juegos", type=int, default=4, help="juegos disputados (menos = más contención)")
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--edicion-ms", type=float, default=5, help="tiempo entre leer y guardar")
+    parser.add_argument("--modos", nargs="+", choices=MODOS, default=MODOS)
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    args = parser.parse_args()
+
+    conn = conectar()
+    os.environ.update({"DB_URL": os.environ["BENCH_DB_URL"], "DB_POOL_MAX": str(args.hilos + 4),
+                       "CACHE_RESPUESTAS": "0", "INDICE_BUSQUEDA": "0", "FACETAS": "0",
+                       "ESTADISTICAS_MATERIALIZADAS": "0", "BLOQUEOS_BACKEND": "tabla"})
+    import app
+
+    resultados = []
+    originales = preparar(conn, args.juegos)
+    ids = [f[0] for f in originales]
+    try:
+        for modo in args.modos:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE juegos SET nombre = 'bench-0' WHERE id = ANY(%s);", (ids,))
+            conn.commit()
+            resultado = ejecutar(app, modo, ids, args.hilos, args.segundos, args.edicion_ms)
+            resultado["ediciones_perdidas"] = perdidas(conn, ids, resultado["ediciones"])
+            resultados.append(resultado)
+            print(f"{modo:12s} {resultado['ediciones_por_seg']:8.1f} ediciones/s"
+                  f" | conflictos/edición {resultado['conflictos_por_edicion']:6.3f}"
+                  f" | peticiones/edición {resultado['peticiones_por_edicion']:5.2f}"
+                  f" | p50 {resultado['p50_ms']} ms p95 {resultado['p95_ms']} ms p99 {resultado['p99_ms']} ms"
+                  f" | perdidas {resultado['ediciones_perdidas']}")
+    finally:
+        with conn.cursor() as cur:
+            for juego_id, nombre, fecha in originales:
+                cur.execute("UPDATE juegos SET nombre = %s, fecha_lanzamiento = %s WHERE id = %s;",
+                            (nombre, fecha, juego_id))
+        conn.commit()
+        conn.close()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"hilos": args.hilos, "juegos": args.juegos, "edicion_ms": args.edicion_ms,
+                       "resultados": resultados}, f, indent=2)
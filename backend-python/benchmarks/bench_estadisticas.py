@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from estadisticas_materializadas import ESTADISTICAS, sql_materializada
+from sembrar_datos import conectar, sembrar
+
+# -------------------------------
+# Estadísticas: función en vivo vs vista materializada
+# -------------------------------
+# Siembra la base de pruebas hasta cada escala (10k, 100k, 1M juegos), refresca las vistas y
+# mide la misma consulta que ejecuta app.py en cada modo.
+# Uso: BENCH_DB_URL=postgresql://... python benchmarks/bench_estadisticas.py --escalas 10000 100000
+
+
+def medir(cur, sql, params, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        "p50_ms": round(statistics.median(tiempos), 3),
+        "p95_ms": round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 3),
+        "max_ms": round(tiempos[-1], 3),
+    }
+
+
+def ejecutar(escalas, repeticiones):
+    conn = conectar()
+    resultados = []
+    for escala in escalas:
+        print(f"Escala {escala} juegos")
+        sembrar(conn, escala)
+        with conn.cursor() as cur:
+            inicio = time.perf_counter()
+            cur.execute("SELECT refrescar_estadisticas();")
+            conn.commit()
+            refresco_ms = round((time.perf_counter() - inicio) * 1000, 1)
+            print(f"  refresco de las vistas: {refresco_ms} ms")
+
+            for nombre, (consulta_vivo, vista, orden) in ESTADISTICAS.items():
+                vivo = medir(cur, consulta_vivo, None, repeticiones)
+                materializada = medir(cur, sql_materializada(vista, orden), (vista,), repeticiones)
+                conn.rollback()
+                aceleracion = vivo["p50_ms"] / materializada["p50_ms"] if materializada["p50_ms"] else 0.0
+                print(f"  {nombre:9s} vivo p50 {vivo['p50_ms']:9.3f} ms p95 {vivo['p95_ms']:9.3f} ms | "
+                      f"materializada p50 {materializada['p50_ms']:7.3f} ms p95 {materializada['p95_ms']:7.3f} ms"
+                      f" | x{aceleracion:.1f}")
+                resultados.append({
+                    "juegos": escala,
+                    "estadistica": nombre,
+                    "refresco_ms": refresco_ms,
+                    "vivo": vivo,
+                    "materializada": materializada,
+                })
+    conn.close()
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia de estadísticas en vivo vs materializadas")
+    parser.add_argument("--escalas", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    args = parser.parse_args()
+
+    resultados = ejecutar(sorted(args.escalas), args.repeticiones)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
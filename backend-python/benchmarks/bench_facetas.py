@@ -0,0 +1,128 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indice_facetas import FACETAS, IndiceFacetas
+from pool_conexiones import PoolConexiones
+from sembrar_datos import conectar, sembrar
+
+# -------------------------------
+# Facetas: índice de bitmaps en memoria vs SQL sobre las tablas intermedias
+# -------------------------------
+# Consultas aleatorias con varias facetas, rangos de rating/fecha, una página y conteos por faceta.
+# "frío" = combinación de filtros nueva (calcula conteos); "memo" = misma combinación, otra página.
+# Uso: BENCH_DB_URL=postgresql://... python benchmarks/bench_facetas.py --juegos 1000000
+
+
+def percentiles(tiempos):
+    tiempos = sorted(tiempos)
+    return {
+        "p50_ms": round(statistics.median(tiempos), 3),
+        "p95_ms": round(tiempos[int(len(tiempos) * 0.95)], 3),
+        "p99_ms": round(tiempos[int(len(tiempos) * 0.99)], 3),
+    }
+
+
+def consulta_aleatoria(estado, rnd):
+    destacados = {f: estado.destacados[f] or [0] for f in FACETAS}
+    otros = {f: list(estado.valores[f]) or [0] for f in FACETAS}
+    facetas = {}
+    for faceta in FACETAS:
+        cantidad = rnd.choice([0, 0, 1, 2]) if faceta in ("generos", "plataformas") else rnd.choice([0, 0, 0, 1])
+        origen = destacados[faceta] if rnd.random() < 0.5 else otros[faceta]
+        facetas[faceta] = (rnd.sample(origen, min(cantidad, len(origen))), rnd.choice(["or", "or", "and"]))
+    rating = (rnd.choice([None, None, 2.5, 4.0]), rnd.choice([None, None, 4.5]))
+    fecha = (rnd.choice([None, None, date(2010, 1, 1)]), rnd.choice([None, None, date(2020, 12, 31)]))
+    return facetas, rating, fecha
+
+
+def sql_equivalente(facetas, rating, fecha, limit, offset):
+    # Lo que haría la base sin el índice: una página y un conteo por valor de cada faceta
+    condiciones, params = [], []
+    for faceta, (valores, modo) in facetas.items():
+        tabla, columna = FACETAS[faceta]
+        grupos = [valores] if modo == "or" else [[v] for v in valores]
+        for grupo in grupos if valores else []:
+            condiciones.append(f"EXISTS (SELECT 1 FROM {tabla} r WHERE r.id_juego = j.id AND r.{columna} = ANY(%s))")
+            params.append(grupo)
+    for columna, (minimo, maximo) in (("rating", rating), ("fecha_lanzamiento", fecha)):
+        if minimo is not None:
+            condiciones.append(f"j.{columna} >= %s")
+            params.append(minimo)
+        if maximo is not None:
+            condiciones.append(f"j.{columna} <= %s")
+            params.append(maximo)
+    where = " AND ".join(condiciones) or "true"
+    consultas = [(f"""
+        SELECT j.id FROM juegos j WHERE {where}
+        ORDER BY COALESCE(j.rating, -1) DESC, j.id DESC LIMIT {limit} OFFSET {offset};
+    """, params)]
+    for tabla, columna in FACETAS.values():
+        consultas.append((f"""
+            SELECT r.{columna}, count(*) FROM juegos j JOIN {tabla} r ON r.id_juego = j.id
+            WHERE {where} GROUP BY 1 ORDER BY 2 DESC LIMIT 20;
+        """, params))
+    return consultas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latencia del filtrado por facetas en memoria vs SQL")
+    parser.add_argument("--juegos", type=int, default=1000000, help="siembra la base hasta este total")
+    parser.add_argument("--consultas", type=int, default=300)
+    parser.add_argument("--consultas-sql", type=int, default=20, help="las de SQL tardan segundos a 1M juegos")
+    parser.add_argument("--limit", type=int, default=24)
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    args = parser.parse_args()
+
+    conn = conectar()
+    sembrar(conn, args.juegos)
+
+    pool = PoolConexiones(maxconn=2, dsn=os.getenv("BENCH_DB_URL"))
+    indice = IndiceFacetas(pool)
+    indice.reconstruir()
+    metricas = indice.metricas()
+    print(f"Índice: {metricas['juegos']} juegos, {metricas['megabytes']} MB, "
+          f"reconstrucción {metricas['segundos_reconstruccion']}s")
+
+    rnd = random.Random(0)
+    consultas = [consulta_aleatoria(indice.estado, rnd) for _ in range(args.consultas)]
+    tiempos_frio, tiempos_memo, tiempos_sql = [], [], []
+    for facetas, rating, fecha in consultas:
+        inicio = time.perf_counter()
+        indice.buscar(facetas, rating, fecha, offset=0, limit=args.limit)
+        tiempos_frio.append((time.perf_counter() - inicio) * 1000)
+        inicio = time.perf_counter()
+        indice.buscar(facetas, rating, fecha, offset=args.limit * rnd.randint(1, 50), limit=args.limit)
+        tiempos_memo.append((time.perf_counter() - inicio) * 1000)
+
+    with conn.cursor() as cur:
+        for facetas, rating, fecha in consultas[:args.consultas_sql]:
+            inicio = time.perf_counter()
+            for sql, params in sql_equivalente(facetas, rating, fecha, args.limit, 0):
+                cur.execute(sql, params)
+                cur.fetchall()
+            tiempos_sql.append((time.perf_counter() - inicio) * 1000)
+    conn.close()
+    pool.cerrar()
+
+    resultados = {
+        "juegos": metricas["juegos"],
+        "megabytes": metricas["megabytes"],
+        "reconstruccion_s": metricas["segundos_reconstruccion"],
+        "indice_frio": percentiles(tiempos_frio),
+        "indice_memo": percentiles(tiempos_memo),
+        "sql": percentiles(tiempos_sql),
+    }
+    print(f"  índice (frío)  {resultados['indice_frio']}")
+    print(f"  índice (memo)  {resultados['indice_memo']}")
+    print(f"  SQL            {resultados['sql']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serializacion
+from serializacion import Filas
+
+# -------------------------------
+# Serialización de listados: dict por fila + json (como antes) vs serializacion.py
+# -------------------------------
+# Codifica las mismas filas (id, nombre, fecha, rating) de cada forma y reporta el mejor tiempo de
+# --repeticiones, las filas por segundo y el tamaño de la respuesta. Sin BENCH_DB_URL usa filas
+# sintéticas; con --desde-bd lee `--filas` juegos reales.
+# Uso: python benchmarks/bench_serializacion.py --filas 10000
+#      BENCH_DB_URL=postgresql://... python benchmarks/bench_serializacion.py --desde-bd
+
+COLUMNAS = ("id", "nombre", "fecha", "rating")
+SUFIJOS = ["Ñandú", "Saga", 'Edición "GOTY"', "Remastered"]
+
+
+def filas_sinteticas(total, rnd):
+    inicio = date(1985, 1, 1)
+    return [
+        (i, f"Juego {i} {rnd.choice(SUFIJOS)}",
+         inicio + timedelta(days=rnd.randrange(14000)) if rnd.random() > 0.05 else None,
+         Decimal(f"{rnd.uniform(0, 5):.2f}") if rnd.random() > 0.1 else None)
+        for i in range(1, total + 1)
+    ]
+
+
+def filas_de_bd(total):
+    from sembrar_datos import conectar
+    conn = conectar()
+    with conn.cursor() as cur:
+        cur.execute("SELECT id, nombre, fecha_lanzamiento, rating FROM juegos ORDER BY id LIMIT %s;", (total,))
+        filas = cur.fetchall()
+    conn.close()
+    return filas
+
+
+_anterior = json.JSONEncoder(default=str, sort_keys=True, separators=(",", ":"))
+
+
+def como_antes(filas):
+    # Lo que hacían las rutas: un dict por fila y jsonify (biblioteca estándar, claves ordenadas)
+    return _anterior.encode([{"id": f[0], "nombre": f[1], "fecha": f[2], "rating": f[3]} for f in filas]).encode()
+
+
+def medir(funcion, filas, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        cuerpo = funcion(filas)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, len(cuerpo)
+
+
+def variantes(orjson):
+    # (nombre, motor de serializacion.py, función); sin orjson solo se mide la biblioteca estándar
+    lista = [("dict por fila + json", None, como_antes)]
+    for motor in (None, orjson) if orjson is not None else (None,):
+        nombre = "orjson" if motor is not None else "json"
+        lista.append((f"Filas objetos ({nombre})", motor, lambda filas: Filas(COLUMNAS, filas).codificar()))
+        lista.append((f"Filas columnas ({nombre})", motor,
+                      lambda filas: Filas(COLUMNAS, filas, columnar=True).codificar()))
+    return lista
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempo de serialización de un listado de juegos")
+    parser.add_argument("--filas", type=int, default=10000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--desde-bd", action="store_true", help="usar juegos de BENCH_DB_URL")
+    args = parser.parse_args()
+
+    filas = filas_de_bd(args.filas) if args.desde_bd else filas_sinteticas(args.filas, random.Random(0))
+    print(f"{len(filas)} filas; orjson {'instalado' if serializacion.orjson is not None else 'no instalado'}")
+    base = None
+    orjson = serializacion.orjson
+    try:
+        for nombre, motor, funcion in variantes(orjson):
+            serializacion.orjson = motor
+            segundos, tamano = medir(funcion, filas, args.repeticiones)
+            base = base or segundos
+            print(f"  {nombre:26s} {segundos * 1000:8.2f} ms  {len(filas) / segundos / 1e6:6.2f} M filas/s"
+                  f"  x{base / segundos:5.1f}  {tamano / 1024:8.1f} KiB")
+    finally:
+        serializacion.orjson = orjson
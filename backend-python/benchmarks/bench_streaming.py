@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sembrar_datos import conectar, contar_juegos, sembrar
+
+# -------------------------------
+# Memoria de /api/juegos/todos: respuesta completa vs streaming
+# -------------------------------
+# Cada medición corre en un proceso aparte y reporta su pico de memoria residente (ru_maxrss,
+# Linux/macOS) por encima de lo que ocupa la app recién importada. El streaming debería quedar
+# plano al crecer el catálogo; la respuesta completa crece con él.
+# Uso: BENCH_DB_URL=postgresql://... python benchmarks/bench_streaming.py --escalas 10000 100000 1000000
+
+MODOS = {
+    "completo": ("/api/juegos/todos", {}),
+    "ndjson": ("/api/juegos/todos?stream=ndjson", {}),
+    "json": ("/api/juegos/todos?stream=json", {}),
+    "ndjson_campos_gzip": ("/api/juegos/todos?stream=ndjson&campos=id,nombre,fecha,rating",
+                           {"Accept-Encoding": "gzip"}),
+}
+
+
+def rss_actual_mb():
+    # Memoria residente ahora (Linux); ru_maxrss solo da el pico
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except OSError:
+        return 0.0
+
+
+def pico_mb():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 ** 2 if sys.platform == "darwin" else pico / 1024
+
+
+def medir_hijo(modo):
+    # Importa la app contra la base de pruebas, sin cache ni índices en memoria que ensucien la medición
+    os.environ.update({"DB_URL": os.environ["BENCH_DB_URL"], "CACHE_RESPUESTAS": "0",
+                       "INDICE_BUSQUEDA": "0", "FACETAS": "0", "ESTADISTICAS_MATERIALIZADAS": "0"})
+    import app
+
+    ruta, headers = MODOS[modo]
+    cliente = app.app.test_client()
+    base = rss_actual_mb()
+    inicio = time.perf_counter()
+    respuesta = cliente.get(ruta, headers=headers, buffered=False)
+    primer_byte = None
+    total_bytes = 0
+    for trozo in respuesta.response:
+        if primer_byte is None:
+            primer_byte = time.perf_counter() - inicio
+        total_bytes += len(trozo)
+    respuesta.close()
+    return {
+        "modo": modo,
+        "pico_mb": round(pico_mb() - base, 1),
+        "primer_byte_ms": round((primer_byte or 0) * 1000, 1),
+        "total_ms": round((time.perf_counter() - inicio) * 1000, 1),
+        "megabytes_enviados": round(total_bytes / 1024 ** 2, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pico de memoria de /api/juegos/todos con y sin streaming")
+    parser.add_argument("--escalas", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--modos", nargs="+", choices=list(MODOS), default=list(MODOS))
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    parser.add_argument("--hijo", choices=list(MODOS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        print(json.dumps(medir_hijo(args.hijo)))
+        sys.exit(0)
+
+    conn = conectar()
+    resultados = []
+    for escala in sorted(args.escalas):
+        sembrar(conn, escala)
+        with conn.cursor() as cur:
+            juegos = contar_juegos(cur)
+        print(f"{juegos} juegos")
+        for modo in args.modos:
+            salida = subprocess.run([sys.executable, os.path.abspath(__file__), "--hijo", modo],
+                                    capture_output=True, text=True, check=True)
+            resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+            resultado["juegos"] = juegos
+            resultados.append(resultado)
+            print(f"  {modo:18s} pico +{resultado['pico_mb']:7.1f} MB | primer byte {resultado['primer_byte_ms']:8.1f} ms"
+                  f" | total {resultado['total_ms']:8.1f} ms | {resultado['megabytes_enviados']} MB enviados")
+    conn.close()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
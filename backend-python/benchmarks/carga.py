@@ -0,0 +1,410 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sembrar_datos import conectar, sembrar, sembrar_usuarios
+
+# -------------------------------
+# Prueba de carga reproducible de la API
+# -------------------------------
+# Siembra la base de pruebas (juegos y usuarios simulados), levanta la app con Waitress en un
+# proceso aparte y la somete a una mezcla de tráfico con concurrencia fija: cada hilo elige un
+# escenario según su peso, lo ejecuta (una o varias peticiones) y vuelve a empezar. Al final
+# reporta por ruta y por escenario p50/p95/p99 y throughput en un JSON comparable entre commits.
+# Requiere las migraciones de sql/ (008–014). Las ediciones reescriben los mismos valores leídos.
+# Uso: BENCH_DB_URL=postgresql://... python benchmarks/carga.py --juegos 100000 --concurrencia 16 --json base.json
+#      python benchmarks/carga.py --comparar base.json nuevo.json
+
+MEZCLA = {
+    "listado": 20,
+    "filtro": 15,
+    "facetas": 10,
+    "autocompletado": 15,
+    "detalle": 15,
+    "ping": 10,
+    "activos": 5,
+    "estadisticas": 3,
+    "edicion_bloqueo": 4,
+    "edicion_optimista": 3,
+}
+# Variables del backend que cambian el comportamiento medido; se guardan con el resultado
+ENTORNO = ["WAITRESS_THREADS", "DB_POOL_MAX", "CACHE_RESPUESTAS", "INDICE_BUSQUEDA", "FACETAS",
+           "ESTADISTICAS_MATERIALIZADAS", "PRESENCIA", "BLOQUEOS_BACKEND", "METRICAS", "STREAMING_GZIP"]
+
+
+class Cliente:
+    # Una conexión keep-alive por hilo; cada petición se anota con su ruta (plantilla) y latencia
+    def __init__(self, host, puerto, registro):
+        self.host = host
+        self.puerto = puerto
+        self.registro = registro
+        self.conexion = None
+
+    def pedir(self, metodo, url, ruta, cuerpo=None, headers=None):
+        headers = dict(headers or {})
+        datos = None
+        if cuerpo is not None:
+            datos = json.dumps(cuerpo).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        inicio = time.perf_counter()
+        try:
+            if self.conexion is None:
+                self.conexion = http.client.HTTPConnection(self.host, self.puerto, timeout=60)
+            self.conexion.request(metodo, url, body=datos, headers=headers)
+            respuesta = self.conexion.getresponse()
+            contenido = respuesta.read()
+            estado = respuesta.status
+        except (OSError, http.client.HTTPException):
+            self.conexion = None
+            self.registro.anotar(f"{metodo} {ruta}", (time.perf_counter() - inicio) * 1000, 0)
+            return 0, None, {}
+        self.registro.anotar(f"{metodo} {ruta}", (time.perf_counter() - inicio) * 1000, estado)
+        try:
+            cuerpo = json.loads(contenido) if contenido else None
+        except ValueError:
+            cuerpo = None
+        return estado, cuerpo, respuesta.headers
+
+
+class Registro:
+    def __init__(self):
+        self.activo = False           # False durante el calentamiento
+        self._muestras = {}           # nombre -> [(latencia_ms, estado)]
+        self._lock = threading.Lock()
+
+    def anotar(self, nombre, latencia_ms, estado):
+        if self.activo:
+            with self._lock:
+                self._muestras.setdefault(nombre, []).append((latencia_ms, estado))
+
+    def todas(self):
+        with self._lock:
+            return [m for valores in self._muestras.values() for m in valores]
+
+    def resumen(self, duracion):
+        with self._lock:
+            muestras = dict(self._muestras)
+        return {nombre: resumir(valores, duracion) for nombre, valores in sorted(muestras.items())}
+
+
+def percentil(ordenadas, p):
+    return round(ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))], 2) if ordenadas else None
+
+
+def resumir(valores, duracion):
+    latencias = sorted(v[0] for v in valores)
+    estados = {}
+    for _, estado in valores:
+        estados[str(estado)] = estados.get(str(estado), 0) + 1
+    return {
+        "peticiones": len(valores),
+        "por_seg": round(len(valores) / duracion, 2),
+        # 0 = error de conexión; 409/412 son conflictos esperados, no errores
+        "errores": sum(1 for _, estado in valores if estado == 0 or estado >= 500),
+        "estados": estados,
+        "p50_ms": percentil(latencias, 0.50),
+        "p95_ms": percentil(latencias, 0.95),
+        "p99_ms": percentil(latencias, 0.99),
+        "max_ms": round(latencias[-1], 2) if latencias else None,
+        "media_ms": round(sum(latencias) / len(latencias), 2) if latencias else None,
+    }
+
+
+# ---------- escenarios ----------
+# Cada uno recibe (cliente, rnd, ctx, usuario) y devuelve el estado final (0 o >= 500 = error)
+
+def listado(cliente, rnd, ctx, usuario):
+    if rnd.random() < 0.3:
+        return cliente.pedir("GET", "/api/juegos?cursor=&orden=rating", "/api/juegos?cursor")[0]
+    return cliente.pedir("GET", f"/api/juegos?page={rnd.randint(1, 50)}&limit=12", "/api/juegos")[0]
+
+
+def filtro(cliente, rnd, ctx, usuario):
+    genero = quote(rnd.choice(ctx["generos"]))
+    plataforma = quote(rnd.choice(ctx["plataformas"]))
+    return cliente.pedir("GET", f"/api/juegos/filtrar?genero={genero}&plataforma={plataforma}"
+                                f"&page={rnd.randint(1, 5)}&limit=12", "/api/juegos/filtrar")[0]
+
+
+def facetas(cliente, rnd, ctx, usuario):
+    generos = ",".join(quote(g) for g in rnd.sample(ctx["generos"], rnd.randint(1, 2)))
+    url = (f"/api/juegos/facetas?generos={generos}&plataformas={quote(rnd.choice(ctx['plataformas']))}"
+           f"&rating_min={rnd.choice([0, 2, 3, 4])}&page={rnd.randint(1, 3)}")
+    return cliente.pedir("GET", url, "/api/juegos/facetas")[0]
+
+
+def autocompletado(cliente, rnd, ctx, usuario):
+    if rnd.random() < 0.5:
+        return cliente.pedir("GET", f"/api/etiquetas?q=tag-{rnd.randint(1, 299)}", "/api/etiquetas")[0]
+    return cliente.pedir("GET", f"/api/desarrolladores?q=estudio%20{rnd.randint(1, 199)}", "/api/desarrolladores")[0]
+
+
+def detalle(cliente, rnd, ctx, usuario):
+    return cliente.pedir("GET", f"/api/juegos/{rnd.randint(*ctx['ids'])}", "/api/juegos/<id>")[0]
+
+
+def ping(cliente, rnd, ctx, usuario):
+    return cliente.pedir("POST", "/api/usuarios/ping", "/api/usuarios/ping",
+                         headers={"X-Usuario-Simulado-Id": usuario})[0]
+
+
+def activos(cliente, rnd, ctx, usuario):
+    return cliente.pedir("GET", "/api/usuarios/activos", "/api/usuarios/activos")[0]
+
+
+def estadisticas(cliente, rnd, ctx, usuario):
+    return cliente.pedir("GET", "/api/estadisticas/generos", "/api/estadisticas/generos")[0]
+
+
+def edicion_bloqueo(cliente, rnd, ctx, usuario):
+    # Ciclo de la pantalla de edición: bloquear -> guardar -> liberar
+    juego_id = rnd.randint(*ctx["ids"])
+    headers = {"X-Usuario-Simulado-Id": usuario}
+    estado, juego, _ = cliente.pedir("POST", f"/api/juegos/{juego_id}/bloquear", "/api/juegos/<id>/bloquear",
+                                     headers=headers)
+    if estado != 200:
+        return estado
+    estado, _, _ = cliente.pedir("PUT", f"/api/juegos/{juego_id}", "/api/juegos/<id>", headers=headers, cuerpo={
+        "nombre": juego["nombre"], "fecha_lanzamiento": juego["fecha"] or "2000-01-01", "rating": juego["rating"]})
+    cliente.pedir("POST", f"/api/juegos/{juego_id}/liberar", "/api/juegos/<id>/liberar", headers=headers)
+    return estado
+
+
+def edicion_optimista(cliente, rnd, ctx, usuario):
+    # GET con ETag -> PUT con If-Match (sql/014)
+    juego_id = rnd.randint(*ctx["ids"])
+    estado, juego, headers = cliente.pedir("GET", f"/api/juegos/{juego_id}", "/api/juegos/<id>")
+    if estado != 200:
+        return estado
+    return cliente.pedir("PUT", f"/api/juegos/{juego_id}", "/api/juegos/<id> If-Match", cuerpo={
+        "nombre": juego["nombre"], "fecha_lanzamiento": juego["fecha_lanzamiento"] or "2000-01-01",
+        "rating": juego["rating"]}, headers={"X-Usuario-Simulado-Id": usuario, "If-Match": headers.get("ETag", "*")})[0]
+
+
+ESCENARIOS = {
+    "listado": listado,
+    "filtro": filtro,
+    "facetas": facetas,
+    "autocompletado": autocompletado,
+    "detalle": detalle,
+    "ping": ping,
+    "activos": activos,
+    "estadisticas": estadisticas,
+    "edicion_bloqueo": edicion_bloqueo,
+    "edicion_optimista": edicion_optimista,
+}
+
+
+# ---------- servidor ----------
+
+def levantar_servidor(puerto, hilos, db_url):
+    entorno = {**os.environ, "DB_URL": db_url, "WAITRESS_THREADS": str(hilos), "LOG_NIVEL": "WARNING"}
+    log = tempfile.NamedTemporaryFile(prefix="carga_servidor_", suffix=".log", delete=False)
+    codigo = ("import app\nfrom waitress import serve\n"
+              f"serve(app.app, host='127.0.0.1', port={puerto}, threads={hilos}, backlog=1024)")
+    proceso = subprocess.Popen([sys.executable, "-c", codigo], env=entorno, stdout=log, stderr=log,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return proceso, log.name
+
+
+def esperar_listo(host, puerto, proceso, log, limite=300):
+    # Espera a que responda y a que terminen de cargar los índices en memoria que estén activos
+    cliente = Cliente(host, puerto, Registro())
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if proceso is not None and proceso.poll() is not None:
+            with open(log, encoding="utf-8", errors="replace") as f:
+                sys.exit(f"El servidor terminó al arrancar:\n{f.read()[-3000:]}")
+        estado, facetas_estado, _ = cliente.pedir("GET", "/api/facetas/metricas", "")
+        _, busqueda, _ = cliente.pedir("GET", "/api/busqueda/metricas", "")
+        if estado == 200:
+            facetas_listas = facetas_estado.get("listo") or facetas_estado.get("activo") is False
+            busqueda_lista = all(i["listo"] for i in (busqueda or {}).get("indices", []))
+            if facetas_listas and busqueda_lista:
+                return
+        time.sleep(0.5)
+    sys.exit("El servidor no quedó listo a tiempo")
+
+
+def git(*argumentos):
+    try:
+        return subprocess.run(["git", *argumentos], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+# ---------- carga ----------
+
+def ejecutar(host, puerto, ctx, mezcla, concurrencia, segundos, calentamiento, semilla, pausa_ms):
+    registro = Registro()
+    por_escenario = Registro()
+    nombres = list(mezcla)
+    pesos = [mezcla[n] for n in nombres]
+    detener = threading.Event()
+
+    def trabajador(i):
+        rnd = random.Random(semilla * 1000 + i)
+        cliente = Cliente(host, puerto, registro)
+        usuario = str(ctx["usuarios"][i % len(ctx["usuarios"])])
+        while not detener.is_set():
+            escenario = rnd.choices(nombres, pesos)[0]
+            inicio = time.perf_counter()
+            estado = ESCENARIOS[escenario](cliente, rnd, ctx, usuario)
+            por_escenario.anotar(escenario, (time.perf_counter() - inicio) * 1000, estado)
+            if pausa_ms:
+                time.sleep(rnd.uniform(0, 2 * pausa_ms) / 1000)
+
+    hilos = [threading.Thread(target=trabajador, args=(i,), daemon=True) for i in range(concurrencia)]
+    for hilo in hilos:
+        hilo.start()
+    time.sleep(calentamiento)
+    registro.activo = por_escenario.activo = True
+    inicio = time.perf_counter()
+    time.sleep(segundos)
+    registro.activo = por_escenario.activo = False
+    duracion = time.perf_counter() - inicio
+    detener.set()
+    for hilo in hilos:
+        hilo.join(timeout=60)
+
+    rutas = registro.resumen(duracion)
+    total = resumir(registro.todas(), duracion)
+    return {"total": total, "rutas": rutas, "escenarios": por_escenario.resumen(duracion),
+            "segundos_medidos": round(duracion, 2)}
+
+
+def leer_mezcla(texto):
+    mezcla = dict(MEZCLA)
+    if texto:
+        mezcla = {}
+        for parte in texto.split(","):
+            nombre, _, peso = parte.partition("=")
+            if nombre not in ESCENARIOS:
+                sys.exit(f"Escenario desconocido: {nombre} (válidos: {', '.join(ESCENARIOS)})")
+            mezcla[nombre] = float(peso or 1)
+    return {n: p for n, p in mezcla.items() if p > 0}
+
+
+def comparar(base, nuevo):
+    with open(base, encoding="utf-8") as f:
+        a = json.load(f)
+    with open(nuevo, encoding="utf-8") as f:
+        b = json.load(f)
+    print(f"base  {a['meta'].get('commit')}  {a['meta']['fecha']}")
+    print(f"nuevo {b['meta'].get('commit')}  {b['meta']['fecha']}")
+    for clave in ("juegos", "concurrencia", "mezcla"):
+        if a["meta"].get(clave) != b["meta"].get(clave):
+            print(f"  ⚠️ {clave} distinto: {a['meta'].get(clave)} vs {b['meta'].get(clave)}")
+
+    def delta(x, y):
+        return f"{(y - x) / x * 100:+6.1f}%" if x and y is not None else "   n/a"
+
+    print(f"{'ruta':42s} " + " ".join(f"{c:>25s}" for c in ("req/s", "p50 ms", "p95 ms", "p99 ms")))
+    filas = [("TOTAL", a["total"], b["total"])] + [
+        (r, a["rutas"].get(r), b["rutas"].get(r)) for r in sorted(set(a["rutas"]) | set(b["rutas"]))]
+    for ruta, x, y in filas:
+        if not x or not y:
+            print(f"{ruta:42s} solo en {'nuevo' if y else 'base'}")
+            continue
+        columnas = [f"{x[c]:8.2f}→{y[c]:8.2f} {delta(x[c], y[c])}" for c in ("por_seg", "p50_ms", "p95_ms", "p99_ms")]
+        print(f"{ruta:42s} " + " ".join(f"{c:>25s}" for c in columnas))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API con una mezcla de tráfico")
+    parser.add_argument("--juegos", type=int, default=10000, help="juegos a sembrar (10000 a 1000000)")
+    parser.add_argument("--usuarios", type=int, default=50, help="usuarios simulados a sembrar")
+    parser.add_argument("--concurrencia", type=int, default=16, help="clientes simultáneos")
+    parser.add_argument("--segundos", type=float, default=30, help="duración de la medición")
+    parser.add_argument("--calentamiento", type=float, default=5, help="segundos de carga previa sin medir")
+    parser.add_argument("--pausa-ms", type=float, default=0, help="pausa media entre escenarios de un cliente")
+    parser.add_argument("--mezcla", help="pesos, p. ej. listado=5,filtro=3,ping=2 (por defecto la mezcla completa)")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--hilos-servidor", type=int, default=int(os.getenv("WAITRESS_THREADS", 8)))
+    parser.add_argument("--puerto", type=int, default=5055)
+    parser.add_argument("--url", help="usar un backend ya levantado (contra la misma BENCH_DB_URL)")
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"), help="compara dos resultados JSON")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        sys.exit(0)
+
+    mezcla = leer_mezcla(args.mezcla)
+    conn = conectar()
+    sembrar(conn, args.juegos)
+    sembrar_usuarios(conn, args.usuarios)
+    with conn.cursor() as cur:
+        cur.execute("SELECT min(id), max(id), count(*) FROM juegos;")
+        minimo, maximo, juegos = cur.fetchone()
+        cur.execute("SELECT id FROM usuarios_simulados ORDER BY id;")
+        usuarios = [f[0] for f in cur.fetchall()]
+    conn.close()
+
+    proceso = log = None
+    if args.url:
+        destino = urlparse(args.url)
+        host, puerto = destino.hostname, destino.port or 80
+    else:
+        host, puerto = "127.0.0.1", args.puerto
+        proceso, log = levantar_servidor(puerto, args.hilos_servidor, os.environ["BENCH_DB_URL"])
+    try:
+        esperar_listo(host, puerto, proceso, log)
+        catalogo = Cliente(host, puerto, Registro())
+        ctx = {
+            "ids": (minimo, maximo),
+            "usuarios": usuarios,
+            "generos": [g["nombre"] for g in catalogo.pedir("GET", "/api/generos", "")[1]],
+            "plataformas": [p["nombre"] for p in catalogo.pedir("GET", "/api/plataformas", "")[1]],
+        }
+        print(f"{juegos} juegos, {len(usuarios)} usuarios, concurrencia {args.concurrencia}, "
+              f"{args.segundos:.0f}s (+{args.calentamiento:.0f}s de calentamiento)")
+        resultado = ejecutar(host, puerto, ctx, mezcla, args.concurrencia, args.segundos,
+                             args.calentamiento, args.semilla, args.pausa_ms)
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait(timeout=30)
+
+    resultado["meta"] = {
+        "commit": git("rev-parse", "--short", "HEAD") or None,
+        # Con cambios sin commit el resultado no corresponde exactamente a `commit`
+        "cambios_sin_commit": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "juegos": juegos,
+        "usuarios": len(usuarios),
+        "concurrencia": args.concurrencia,
+        "segundos": args.segundos,
+        "calentamiento": args.calentamiento,
+        "pausa_ms": args.pausa_ms,
+        "mezcla": mezcla,
+        "semilla": args.semilla,
+        "hilos_servidor": None if args.url else args.hilos_servidor,
+        "entorno": {v: os.environ[v] for v in ENTORNO if v in os.environ},
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+    }
+
+    total = resultado["total"]
+    print(f"{'TOTAL':42s} {total['por_seg']:8.1f} req/s  p50 {total['p50_ms']:8.2f}  p95 {total['p95_ms']:8.2f}"
+          f"  p99 {total['p99_ms']:8.2f} ms  errores {total['errores']}")
+    for ruta, r in resultado["rutas"].items():
+        print(f"{ruta:42s} {r['por_seg']:8.1f} req/s  p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}"
+              f"  p99 {r['p99_ms']:8.2f} ms  errores {r['errores']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"meta": resultado.pop("meta"), **resultado}, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bloqueos import BackendBloqueosMemoria, BackendBloqueosTabla, BloqueoOcupado, GestorBloqueos
+
+# -------------------------------
+# Prueba de estrés de los bloqueos de edición
+# -------------------------------
+# Varios hilos se disputan unos pocos juegos: bloquean, "editan" unos ms, renuevan y liberan.
+# Algunos hilos simulan un editor que se cae (TTL corto y nunca liberan): sus bloqueos solo
+# se recuperan al vencer. Cada concesión obtenida se anota en un registro compartido; si al
+# obtener una hay otra vigente de otro usuario en el mismo juego es una violación (debe ser 0).
+# Uso: python benchmarks/estres_bloqueos.py                       (backend en memoria)
+#      BENCH_DB_URL=postgresql://... python benchmarks/estres_bloqueos.py --backend tabla
+#      (la tabla requiere sql/013_bloqueos.sql; usa juegos 900000000+ para no tocar bloqueos reales)
+
+BASE_JUEGOS = 900000000
+
+
+def crear_backend(nombre, hilos):
+    if nombre == "memoria":
+        return BackendBloqueosMemoria(), None
+    from pool_conexiones import PoolConexiones
+    url = os.getenv("BENCH_DB_URL")
+    if not url:
+        sys.exit("Definir BENCH_DB_URL para el backend tabla")
+    pool = PoolConexiones(maxconn=hilos + 2, dsn=url)
+    return BackendBloqueosTabla(pool), pool
+
+
+class Registro:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vigentes = {}   # juego -> (usuario, expira)
+        self.violaciones = []
+
+    def tomar(self, juego, usuario, expira):
+        ahora = datetime.now(timezone.utc)
+        with self._lock:
+            actual = self._vigentes.get(juego)
+            if actual is not None and actual[0] != usuario and actual[1] > ahora:
+                self.violaciones.append({"juego": juego, "dueno": actual[0], "intruso": usuario})
+            self._vigentes[juego] = (usuario, expira)
+
+    def renovar(self, juego, usuario, expira):
+        with self._lock:
+            if self._vigentes.get(juego, (None,))[0] == usuario:
+                self._vigentes[juego] = (usuario, expira)
+
+    def soltar(self, juego, usuario):
+        # Se quita del registro ANTES de liberar en el backend
+        with self._lock:
+            if self._vigentes.get(juego, (None,))[0] == usuario:
+                del self._vigentes[juego]
+
+
+def editor(gestor, registro, juegos, usuario, fin, edicion_ms, cae):
+    intentos = 0
+    while time.monotonic() < fin:
+        juego = random.choice(juegos)
+        intentos += 1
+        try:
+            concesion = gestor.adquirir(juego, usuario)
+        except BloqueoOcupado:
+            time.sleep(random.uniform(0, edicion_ms / 1000))
+            continue
+        registro.tomar(juego, usuario, concesion["expira"])
+        if cae:
+            # Se "cae" con el bloqueo tomado: nunca lo renueva ni lo libera
+            time.sleep(gestor.ttl * 2)
+            continue
+        time.sleep(random.uniform(0, edicion_ms / 2000))
+        for renovada in gestor.renovar([concesion["concesion"]], usuario):
+            registro.renovar(juego, usuario, renovada["expira"])
+        time.sleep(random.uniform(0, edicion_ms / 2000))
+        registro.soltar(juego, usuario)
+        gestor.liberar(usuario, concesiones=[concesion["concesion"]])
+    return intentos
+
+
+def ejecutar(backend, hilos, caidos, juegos, segundos, ttl, ttl_caidos, edicion_ms):
+    # Dos gestores sobre el mismo backend: el de los caídos con TTL corto para que venzan durante la prueba
+    gestor = GestorBloqueos(backend, ttl=ttl, barrido=0.5)
+    gestor_caidos = GestorBloqueos(backend, ttl=ttl_caidos, barrido=0)
+    ids = list(range(BASE_JUEGOS, BASE_JUEGOS + juegos))
+    usuarios = [f"w{i}" for i in range(hilos)] + [f"c{i}" for i in range(caidos)]
+    for usuario in usuarios:
+        backend.liberar(usuario, ids, [])
+
+    registro = Registro()
+    intentos = []
+    fin = time.monotonic() + segundos
+
+    def correr(g, usuario, cae):
+        intentos.append(editor(g, registro, ids, usuario, fin, edicion_ms, cae))
+
+    trabajadores = [threading.Thread(target=correr, args=(gestor, f"w{i}", False)) for i in range(hilos)]
+    trabajadores += [threading.Thread(target=correr, args=(gestor_caidos, f"c{i}", True), daemon=True)
+                     for i in range(caidos)]
+    gestor.iniciar()
+    inicio = time.perf_counter()
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores[:hilos]:
+        t.join()
+    duracion = time.perf_counter() - inicio
+    gestor.detener()
+
+    metricas = gestor.metricas()
+    for usuario in usuarios:
+        backend.liberar(usuario, ids, [])
+    return {
+        "backend": type(backend).__name__,
+        "hilos": hilos,
+        "caidos": caidos,
+        "juegos": juegos,
+        "segundos": round(duracion, 1),
+        "adquiridos_por_seg": round(metricas["adquiridos"] / duracion, 1),
+        "conflictos_por_seg": round(metricas["conflictos"] / duracion, 1),
+        "adquirir_p50_ms": metricas["adquirir_p50_ms"],
+        "adquirir_p95_ms": metricas["adquirir_p95_ms"],
+        "caidos_adquiridos": gestor_caidos.adquiridos,
+        "vencidos_barridos": metricas["vencidos_barridos"],
+        "renovaciones_perdidas": metricas["renovaciones_perdidas"],
+        "violaciones": len(registro.violaciones),
+        "ejemplos_violacion": registro.violaciones[:5],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estrés de bloqueos: exclusión mutua, contención y vencimientos")
+    parser.add_argument("--backend", choices=["memoria", "tabla"], default="memoria")
+    parser.add_argument("--hilos", type=int, default=16)
+    parser.add_argument("--caidos", type=int, default=2, help="hilos que toman un bloqueo y nunca lo liberan")
+    parser.add_argument("--juegos", type=int, default=4)
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--ttl", type=int, default=30)
+    parser.add_argument("--ttl-caidos", type=int, default=1)
+    parser.add_argument("--edicion-ms", type=float, default=20)
+    parser.add_argument("--json", help="guarda los resultados en este archivo")
+    args = parser.parse_args()
+
+    backend, pool = crear_backend(args.backend, args.hilos + args.caidos)
+    resultado = ejecutar(backend, args.hilos, args.caidos, args.juegos, args.segundos,
+                         args.ttl, args.ttl_caidos, args.edicion_ms)
+    print(json.dumps(resultado, indent=2, default=str))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, default=str)
+    sys.exit(1 if resultado["violaciones"] else 0)
@@ -0,0 +1,113 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+import psycopg2
+import psycopg2.extras
+
+# -------------------------------
+# Datos sintéticos para benchmarks
+# -------------------------------
+# Agrega juegos hasta llegar al total pedido usando las funciones existentes
+# (insertar_genero, ..., insertar_juegos_lote de sql/011). Usar SOLO contra una base de pruebas.
+# Uso: BENCH_DB_URL=postgresql://... python benchmarks/sembrar_datos.py --juegos 100000
+
+GENEROS = ["Action", "Adventure", "RPG", "Shooter", "Puzzle", "Racing", "Sports", "Strategy", "Indie",
+           "Casual", "Simulation", "Arcade", "Platformer", "Fighting", "Family", "Board Games",
+           "Educational", "Card", "Massively Multiplayer"]
+PLATAFORMAS = ["PC", "PlayStation 5", "PlayStation 4", "PlayStation 3", "Xbox One", "Xbox Series S/X",
+               "Xbox 360", "Nintendo Switch", "iOS", "Android", "macOS", "Linux", "Web"]
+TOTAL_DESARROLLADORES = 2000
+TOTAL_ETIQUETAS = 3000
+
+
+def conectar(url=None):
+    url = url or os.getenv("BENCH_DB_URL")
+    if not url:
+        sys.exit("Definir BENCH_DB_URL (base de pruebas: el benchmark escribe datos)")
+    return psycopg2.connect(url)
+
+
+def _dimension(cur, funcion, nombres):
+    ids = []
+    for nombre in nombres:
+        cur.execute(f"SELECT {funcion}(%s);", (nombre,))
+        ids.append(cur.fetchone()[0])
+    return ids
+
+
+def contar_juegos(cur):
+    cur.callproc("contar_juegos")
+    return cur.fetchone()[0]
+
+
+def sembrar(conn, total, lote=5000, semilla=0):
+    # Devuelve cuántos juegos agregó; es incremental: 10k -> 100k solo inserta la diferencia
+    with conn.cursor() as cur:
+        actuales = contar_juegos(cur)
+        if actuales >= total:
+            return 0
+
+        generos = _dimension(cur, "insertar_genero", GENEROS)
+        plataformas = _dimension(cur, "insertar_plataforma", PLATAFORMAS)
+        desarrolladores = _dimension(cur, "insertar_desarrollador",
+                                     [f"Estudio {i}" for i in range(TOTAL_DESARROLLADORES)])
+        etiquetas = _dimension(cur, "insertar_etiqueta", [f"tag-{i}" for i in range(TOTAL_ETIQUETAS)])
+        conn.commit()
+
+        rnd = random.Random(semilla + actuales)
+        inicio = time.perf_counter()
+        for desde in range(actuales, total, lote):
+            juegos = []
+            for n in range(desde, min(total, desde + lote)):
+                juegos.append({
+                    "nombre": f"Bench {n}",
+                    "fecha": f"{rnd.randint(1990, 2025)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                    "rating": round(rnd.uniform(0, 5), 2),
+                    "generos": rnd.sample(generos, rnd.randint(1, 3)),
+                    "plataformas": rnd.sample(plataformas, rnd.randint(1, 4)),
+                    "desarrolladores": [rnd.choice(desarrolladores)],
+                    "etiquetas": rnd.sample(etiquetas, rnd.randint(0, 5)),
+                })
+            cur.execute("SELECT count(*) FROM insertar_juegos_lote(%s::jsonb);",
+                        (psycopg2.extras.Json(juegos),))
+            conn.commit()
+            hechos = desde + len(juegos) - actuales
+            print(f"  sembrados {hechos}/{total - actuales} "
+                  f"({hechos / (time.perf_counter() - inicio):.0f} juegos/s)", end="\r", flush=True)
+        print()
+        cur.execute("ANALYZE;")
+        conn.commit()
+    return total - actuales
+
+
+def sembrar_usuarios(conn, total):
+    # Usuarios simulados "Carga N" hasta llegar a `total` (pings, bloqueos y ediciones de benchmarks/carga.py)
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM usuarios_simulados;")
+        actuales = cur.fetchone()[0]
+        if actuales < total:
+            cur.execute("""
+                INSERT INTO usuarios_simulados (nombre, correo)
+                SELECT 'Carga ' || n, 'carga' || n || '@bench.local'
+                FROM generate_series(%s, %s) AS n;
+            """, (actuales, total - 1))
+    conn.commit()
+    return max(0, total - actuales)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Siembra juegos sintéticos en la base de pruebas")
+    parser.add_argument("--juegos", type=int, default=10000, help="total de juegos a alcanzar")
+    parser.add_argument("--lote", type=int, default=5000, help="juegos por llamada a insertar_juegos_lote")
+    parser.add_argument("--usuarios", type=int, default=0, help="total de usuarios simulados a alcanzar")
+    args = parser.parse_args()
+
+    conexion = conectar()
+    agregados = sembrar(conexion, args.juegos, lote=args.lote)
+    print(f"{agregados} juegos agregados")
+    if args.usuarios:
+        print(f"{sembrar_usuarios(conexion, args.usuarios)} usuarios agregados")
+    conexion.close()
@@ -0,0 +1,417 @@
+import asyncio
+import inspect
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+log = logging.getLogger(__name__)
+
+
+# -------------------------------
+# Bloqueos de edición con concesiones (leases)
+# -------------------------------
+# Un bloqueo es una concesión {"concesion", "juego_id", "usuario", "expira"}: dura `ttl` segundos,
+# el dueño la renueva mientras edita y se libera sola si deja de renovarla. Backends:
+# - BackendBloqueosTabla: tabla bloqueos_juegos (sql/013_bloqueos.sql), compartida por todos los procesos.
+# - BackendBloqueosMemoria: un dict en el proceso; para pruebas o un único proceso.
+# Los advisory locks de PostgreSQL no sirven aquí: pertenecen a la sesión, y la conexión vuelve al
+# pool al terminar cada petición, así que el bloqueo quedaría en manos de quien la preste después.
+# BackendBloqueosTablaAsync y GestorBloqueosAsync son lo mismo sobre asyncpg (app_async.py).
+
+class BloqueoOcupado(Exception):
+    def __init__(self, juego_id, usuario, expira):
+        super().__init__(f"Juego {juego_id} bloqueado por {usuario} hasta {expira.isoformat()}")
+        self.juego_id = juego_id
+        self.usuario = usuario
+        self.expira = expira
+
+
+class BackendBloqueosMemoria:
+    def __init__(self):
+        self._bloqueos = {}          # juego_id -> concesión
+        self._lock = threading.Lock()
+
+    def adquirir(self, juego_id, usuario, ttl):
+        ahora = datetime.now(timezone.utc)
+        with self._lock:
+            actual = self._bloqueos.get(juego_id)
+            if actual is not None and actual["expira"] >= ahora and actual["usuario"] != usuario:
+                raise BloqueoOcupado(juego_id, actual["usuario"], actual["expira"])
+            # El mismo usuario que vuelve a bloquear conserva su concesión (p. ej. recargó la página)
+            vigente = actual is not None and actual["expira"] >= ahora
+            concesion = {
+                "concesion": actual["concesion"] if vigente else uuid.uuid4().hex,
+                "juego_id": juego_id,
+                "usuario": usuario,
+                "expira": ahora + timedelta(seconds=ttl),
+            }
+            self._bloqueos[juego_id] = concesion
+            return dict(concesion)
+
+    def renovar(self, concesiones, usuario, ttl):
+        ahora = datetime.now(timezone.utc)
+        renovadas = []
+        with self._lock:
+            for actual in self._bloqueos.values():
+                if actual["concesion"] in concesiones and actual["usuario"] == usuario and actual["expira"] >= ahora:
+                    actual["expira"] = ahora + timedelta(seconds=ttl)
+                    renovadas.append(dict(actual))
+        return renovadas
+
+    def liberar(self, usuario, juegos=(), concesiones=()):
+        liberados = []
+        with self._lock:
+            for juego_id, actual in list(self._bloqueos.items()):
+                if actual["usuario"] == usuario and (juego_id in juegos or actual["concesion"] in concesiones):
+                    del self._bloqueos[juego_id]
+                    liberados.append(juego_id)
+        return sorted(liberados)
+
+    def de_usuario(self, usuario):
+        ahora = datetime.now(timezone.utc)
+        with self._lock:
+            return sorted((dict(c) for c in self._bloqueos.values() if c["usuario"] == usuario and c["expira"] >= ahora),
+                          key=lambda c: c["juego_id"])
+
+    def barrer(self):
+        ahora = datetime.now(timezone.utc)
+        with self._lock:
+            vencidos = [j for j, c in self._bloqueos.items() if c["expira"] < ahora]
+            for juego_id in vencidos:
+                del self._bloqueos[juego_id]
+        return len(vencidos)
+
+
+# Sentencias de BackendBloqueosTabla, con parámetros con nombre; la versión asyncpg las pasa a $n
+COLUMNAS = "concesion::text, juego_id, usuario, expira"
+
+# Un solo round trip: toma el bloqueo si está libre, vencido o ya es suyo; si no, la segunda
+# parte devuelve al dueño actual (la misma foto de la tabla, antes del intento)
+SQL_ADQUIRIR = f"""
+    WITH intento AS (
+        INSERT INTO bloqueos_juegos AS b (juego_id, concesion, usuario, expira)
+        VALUES (%(juego)s, gen_random_uuid(), %(usuario)s, now() + make_interval(secs => %(ttl)s))
+        ON CONFLICT (juego_id) DO UPDATE
+        SET concesion = CASE WHEN b.usuario = EXCLUDED.usuario AND b.expira >= now()
+                             THEN b.concesion ELSE EXCLUDED.concesion END,
+            usuario = EXCLUDED.usuario,
+            tomado_en = CASE WHEN b.usuario = EXCLUDED.usuario AND b.expira >= now()
+                             THEN b.tomado_en ELSE now() END,
+            expira = EXCLUDED.expira
+        WHERE b.expira < now() OR b.usuario = EXCLUDED.usuario
+        RETURNING {COLUMNAS}
+    )
+    SELECT true, * FROM intento
+    UNION ALL
+    SELECT false, {COLUMNAS} FROM bloqueos_juegos
+    WHERE juego_id = %(juego)s AND NOT EXISTS (SELECT 1 FROM intento);
+"""
+
+SQL_RENOVAR = f"""
+    UPDATE bloqueos_juegos SET expira = now() + make_interval(secs => %(ttl)s)
+    WHERE concesion = ANY(%(concesiones)s::uuid[]) AND usuario = %(usuario)s AND expira >= now()
+    RETURNING {COLUMNAS};
+"""
+
+SQL_LIBERAR = """
+    DELETE FROM bloqueos_juegos
+    WHERE usuario = %(usuario)s AND (juego_id = ANY(%(juegos)s::int[]) OR concesion = ANY(%(concesiones)s::uuid[]))
+    RETURNING juego_id;
+"""
+
+SQL_DE_USUARIO = f"""
+    SELECT {COLUMNAS} FROM bloqueos_juegos
+    WHERE usuario = %(usuario)s AND expira >= now() ORDER BY juego_id;
+"""
+
+SQL_BARRER = "DELETE FROM bloqueos_juegos WHERE expira < now();"
+
+
+def _concesion(fila):
+    return {"concesion": fila[0].replace("-", ""), "juego_id": fila[1], "usuario": fila[2], "expira": fila[3]}
+
+
+def _uuids(concesiones):
+    return [str(uuid.UUID(c)) for c in concesiones]
+
+
+class BackendBloqueosTabla:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def adquirir(self, juego_id, usuario, ttl):
+        with self.pool.conexion(application_name=usuario) as conn, conn.cursor() as cur:
+            for _ in range(3):
+                cur.execute(SQL_ADQUIRIR, {"juego": juego_id, "usuario": usuario, "ttl": ttl})
+                fila = cur.fetchone()
+                if fila is not None:
+                    break
+                # El dueño lo insertó otra transacción después de la foto de esta sentencia: se repite
+                conn.commit()
+        return _resultado_adquirir(fila, juego_id)
+
+    def renovar(self, concesiones, usuario, ttl):
+        with self.pool.conexion(application_name=usuario) as conn, conn.cursor() as cur:
+            cur.execute(SQL_RENOVAR, {"ttl": ttl, "concesiones": _uuids(concesiones), "usuario": usuario})
+            return [_concesion(f) for f in cur.fetchall()]
+
+    def liberar(self, usuario, juegos=(), concesiones=()):
+        with self.pool.conexion(application_name=usuario) as conn, conn.cursor() as cur:
+            cur.execute(SQL_LIBERAR, {"usuario": usuario, "juegos": list(juegos),
+                                      "concesiones": _uuids(concesiones)})
+            return sorted(f[0] for f in cur.fetchall())
+
+    def de_usuario(self, usuario):
+        with self.pool.conexion(application_name=usuario) as conn, conn.cursor() as cur:
+            cur.execute(SQL_DE_USUARIO, {"usuario": usuario})
+            return [_concesion(f) for f in cur.fetchall()]
+
+    def barrer(self):
+        with self.pool.conexion(application_name="barrido_bloqueos") as conn, conn.cursor() as cur:
+            cur.execute(SQL_BARRER)
+            return cur.rowcount
+
+
+def _resultado_adquirir(fila, juego_id):
+    if fila is None:
+        raise RuntimeError(f"No se pudo resolver el bloqueo del juego {juego_id}")
+    if not fila[0]:
+        raise BloqueoOcupado(juego_id, fila[3], fila[4])
+    return _concesion(fila[1:])
+
+
+def a_posicionales(sql):
+    # "%(nombre)s" -> "$n" (asyncpg); devuelve la sentencia y el orden de los nombres
+    nombres = []
+
+    def reemplazar(m):
+        if m.group(1) not in nombres:
+            nombres.append(m.group(1))
+        return f"${nombres.index(m.group(1)) + 1}"
+
+    return re.sub(r"%\((\w+)\)s", reemplazar, sql), nombres
+
+
+class BackendBloqueosTablaAsync:
+    # Las mismas sentencias sobre un pool de asyncpg; sin transacción explícita cada una se confirma sola
+    def __init__(self, pool):
+        self.pool = pool
+        self._sql = {nombre: a_posicionales(sql) for nombre, sql in (
+            ("adquirir", SQL_ADQUIRIR), ("renovar", SQL_RENOVAR), ("liberar", SQL_LIBERAR),
+            ("de_usuario", SQL_DE_USUARIO))}
+
+    def _argumentos(self, nombre, valores):
+        sql, nombres = self._sql[nombre]
+        return [sql] + [valores[n] for n in nombres]
+
+    async def adquirir(self, juego_id, usuario, ttl):
+        argumentos = self._argumentos("adquirir", {"juego": juego_id, "usuario": usuario, "ttl": float(ttl)})
+        async with self.pool.acquire() as conn:
+            for _ in range(3):
+                fila = await conn.fetchrow(*argumentos)
+                if fila is not None:
+                    break
+        return _resultado_adquirir(fila, juego_id)
+
+    async def renovar(self, concesiones, usuario, ttl):
+        argumentos = self._argumentos("renovar", {"ttl": float(ttl), "concesiones": _uuids(concesiones),
+                                                  "usuario": usuario})
+        return [_concesion(f) for f in await self.pool.fetch(*argumentos)]
+
+    async def liberar(self, usuario, juegos=(), concesiones=()):
+        argumentos = self._argumentos("liberar", {"usuario": usuario, "juegos": list(juegos),
+                                                  "concesiones": _uuids(concesiones)})
+        return sorted(f[0] for f in await self.pool.fetch(*argumentos))
+
+    async def de_usuario(self, usuario):
+        return [_concesion(f) for f in await self.pool.fetch(*self._argumentos("de_usuario", {"usuario": usuario}))]
+
+    async def barrer(self):
+        # asyncpg devuelve la etiqueta del comando, p. ej. "DELETE 3"
+        return int((await self.pool.execute(SQL_BARRER)).split()[-1])
+
+
+def normalizar_concesiones(concesiones):
+    # Acepta el id con o sin guiones; los mal formados no pueden coincidir con ninguna concesión
+    normalizadas = []
+    for concesion in concesiones:
+        try:
+            normalizadas.append(uuid.UUID(str(concesion)).hex)
+        except ValueError:
+            pass
+    return normalizadas
+
+
+class GestorBloqueos:
+    # Misma interfaz para cualquier backend, más el barrido periódico y métricas de contención
+    def __init__(self, backend, ttl=300, barrido=60, muestras=1000, lider=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.barrido = barrido
+        self.lider = lider                         # compartido.Liderazgo: con varios workers barre uno solo
+        self._latencias = deque(maxlen=muestras)   # ms de los últimos intentos de adquirir
+        self._conflictos = deque(maxlen=10000)     # instantes de los últimos 409
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self.adquiridos = 0
+        self.conflictos = 0
+        self.renovados = 0
+        self.perdidos = 0          # renovaciones de concesiones vencidas o ajenas
+        self.liberados = 0
+        self.barridos = 0
+        self.errores_barrido = 0
+
+    def iniciar(self):
+        if self._hilo is None and self.barrido > 0:
+            self._hilo = threading.Thread(target=self._bucle, name="barrido-bloqueos", daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+    def _bucle(self):
+        while not self._detener.wait(self.barrido):
+            if self.lider is None or self.lider.es_lider():
+                self.barrer()
+
+    def adquirir(self, juego_id, usuario):
+        inicio = time.perf_counter()
+        try:
+            concesion = self.backend.adquirir(juego_id, str(usuario), self.ttl)
+        except BloqueoOcupado:
+            self._anotar_conflicto()
+            raise
+        finally:
+            self._anotar_latencia(inicio)
+        self._anotar("adquiridos", 1)
+        return concesion
+
+    def renovar(self, concesiones, usuario):
+        renovadas = self.backend.renovar(normalizar_concesiones(concesiones), str(usuario), self.ttl)
+        self._anotar_renovacion(len(concesiones), len(renovadas))
+        return renovadas
+
+    def liberar(self, usuario, juegos=(), concesiones=()):
+        liberados = self.backend.liberar(str(usuario), [int(j) for j in juegos], normalizar_concesiones(concesiones))
+        self._anotar("liberados", len(liberados))
+        return liberados
+
+    def de_usuario(self, usuario):
+        return self.backend.de_usuario(str(usuario))
+
+    def barrer(self):
+        try:
+            borrados = self.backend.barrer()
+        except Exception:
+            self._anotar_error_barrido()
+            return 0
+        self._anotar("barridos", borrados)
+        return borrados
+
+    # ---- contadores (compartidos con GestorBloqueosAsync) ----
+
+    def _anotar(self, contador, n):
+        with self._lock:
+            setattr(self, contador, getattr(self, contador) + n)
+
+    def _anotar_latencia(self, inicio):
+        with self._lock:
+            self._latencias.append((time.perf_counter() - inicio) * 1000)
+
+    def _anotar_conflicto(self):
+        with self._lock:
+            self.conflictos += 1
+            self._conflictos.append(time.monotonic())
+
+    def _anotar_renovacion(self, pedidas, renovadas):
+        with self._lock:
+            self.renovados += renovadas
+            self.perdidos += pedidas - renovadas
+
+    def _anotar_error_barrido(self):
+        self._anotar("errores_barrido", 1)
+        log.exception("Error en el barrido de bloqueos")
+
+    def metricas(self):
+        with self._lock:
+            latencias = sorted(self._latencias)
+            hace_un_minuto = time.monotonic() - 60
+            conflictos_minuto = sum(1 for t in self._conflictos if t >= hace_un_minuto)
+            return {
+                "backend": type(self.backend).__name__,
+                "ttl": self.ttl,
+                "barrido": self.barrido,
+                "adquiridos": self.adquiridos,
+                "conflictos": self.conflictos,
+                "conflictos_por_seg": round(conflictos_minuto / 60, 3),
+                "renovados": self.renovados,
+                "renovaciones_perdidas": self.perdidos,
+                "liberados": self.liberados,
+                "vencidos_barridos": self.barridos,
+                "errores_barrido": self.errores_barrido,
+                "adquirir_p50_ms": round(latencias[len(latencias) // 2], 3) if latencias else None,
+                "adquirir_p95_ms": round(latencias[int(len(latencias) * 0.95)], 3) if latencias else None,
+            }
+
+
+class GestorBloqueosAsync(GestorBloqueos):
+    # Igual que GestorBloqueos pero con corrutinas y el barrido como tarea del event loop. Acepta un
+    # backend async (BackendBloqueosTablaAsync) o uno síncrono que no haga E/S (BackendBloqueosMemoria).
+    def iniciar(self):
+        # Se llama desde el event loop (p. ej. en el lifespan de la app ASGI)
+        if self._hilo is None and self.barrido > 0:
+            self._hilo = asyncio.get_running_loop().create_task(self._bucle_async())
+
+    def detener(self):
+        if self._hilo is not None:
+            self._hilo.cancel()
+
+    async def _bucle_async(self):
+        while True:
+            await asyncio.sleep(self.barrido)
+            await self.barrer()
+
+    @staticmethod
+    async def _esperar(resultado):
+        return await resultado if inspect.isawaitable(resultado) else resultado
+
+    async def adquirir(self, juego_id, usuario):
+        inicio = time.perf_counter()
+        try:
+            concesion = await self._esperar(self.backend.adquirir(juego_id, str(usuario), self.ttl))
+        except BloqueoOcupado:
+            self._anotar_conflicto()
+            raise
+        finally:
+            self._anotar_latencia(inicio)
+        self._anotar("adquiridos", 1)
+        return concesion
+
+    async def renovar(self, concesiones, usuario):
+        renovadas = await self._esperar(
+            self.backend.renovar(normalizar_concesiones(concesiones), str(usuario), self.ttl))
+        self._anotar_renovacion(len(concesiones), len(renovadas))
+        return renovadas
+
+    async def liberar(self, usuario, juegos=(), concesiones=()):
+        liberados = await self._esperar(
+            self.backend.liberar(str(usuario), [int(j) for j in juegos], normalizar_concesiones(concesiones)))
+        self._anotar("liberados", len(liberados))
+        return liberados
+
+    async def de_usuario(self, usuario):
+        return await self._esperar(self.backend.de_usuario(str(usuario)))
+
+    async def barrer(self):
+        try:
+            borrados = await self._esperar(self.backend.barrer())
+        except Exception:
+            self._anotar_error_barrido()
+            return 0
+        self._anotar("barridos", borrados)
+        return borrados
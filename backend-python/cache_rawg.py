@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+# -------------------------------
+# Cache en disco de respuestas RAWG (JSON comprimido, direccionado por contenido)
+# -------------------------------
+# clave = sha256(url + parámetros ordenados sin la API key) -> <dir>/ab/abcdef....json.gz
+
+
+class CacheRespuestasRAWG:
+    def __init__(self, directorio=".cache_rawg", ttl=86400, max_bytes=2 * 1024 ** 3):
+        self.directorio = directorio
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expirados = 0
+        self.guardados = 0
+        self.expulsados = 0
+        os.makedirs(directorio, exist_ok=True)
+        self._bytes = sum(os.path.getsize(r) for r, _ in self._archivos())
+
+    @staticmethod
+    def clave(url, params=None):
+        params = {k: v for k, v in (params or {}).items() if k != "key"}
+        texto = url + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+        return hashlib.sha256(texto.encode()).hexdigest()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave[:2], clave + ".json.gz")
+
+    def _archivos(self):
+        for sub in os.scandir(self.directorio):
+            if sub.is_dir():
+                for archivo in os.scandir(sub.path):
+                    if archivo.name.endswith(".json.gz"):
+                        yield archivo.path, archivo.stat()
+
+    def obtener(self, url, params=None, ignorar_ttl=False):
+        ruta = self._ruta(self.clave(url, params))
+        try:
+            edad = time.time() - os.path.getmtime(ruta)
+            if not ignorar_ttl and self.ttl and edad > self.ttl:
+                with self._lock:
+                    self.expirados += 1
+                    self.fallos += 1
+                return None
+            with gzip.open(ruta, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.fallos += 1
+            return None
+        with self._lock:
+            self.aciertos += 1
+        return data
+
+    def guardar(self, url, params, data):
+        ruta = self._ruta(self.clave(url, params))
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        previo = os.path.getsize(ruta) if os.path.exists(ruta) else 0
+
+        # Escritura atómica: nunca queda un archivo a medio escribir si el ETL se interrumpe
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            with gzip.GzipFile(fileobj=f, mode="wb", compresslevel=6) as gz:
+                gz.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        os.replace(temporal, ruta)
+
+        with self._lock:
+            self.guardados += 1
+            self._bytes += os.path.getsize(ruta) - previo
+            exceso = self.max_bytes and self._bytes > self.max_bytes
+        if exceso:
+            self.expulsar()
+
+    def expulsar(self):
+        # Borra los archivos más antiguos hasta quedar en el 90% del tamaño máximo
+        with self._lock:
+            archivos = sorted(self._archivos(), key=lambda a: a[1].st_mtime)
+            total = sum(st.st_size for _, st in archivos)
+            objetivo = self.max_bytes * 0.9
+            for ruta, st in archivos:
+                if total <= objetivo:
+                    break
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    continue
+                total -= st.st_size
+                self.expulsados += 1
+            self._bytes = total
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "expirados": self.expirados,
+                "guardados": self.guardados,
+                "expulsados": self.expulsados,
+                "megabytes": round(self._bytes / 1024 ** 2, 2),
+                "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else 0.0,
+            }
@@ -0,0 +1,271 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Response, make_response, request
+
+# -------------------------------
+# Cache de respuestas HTTP (TTL + LRU) con ETag / If-None-Match
+# -------------------------------
+# Las respuestas se agrupan ("catalogo", "estadisticas"...). Invalidar un grupo sube su
+# generación: las claves viejas dejan de usarse y salen solas por TTL o por LRU.
+# La generación es el momento (en ms) del último cambio, nunca menor que la anterior + 1, así que
+# no se repite tras reiniciar el backend y sirve a la vez de versión de los datos y de
+# Last-Modified. El ETag sale de esa versión y del recurso: un hash corto de la ruta con su query
+# string y de los headers de `vary` ("catalogo-1760790000000-3f2a9c0d1b7e4a65", más "-gzip"/"-br"
+# si va comprimido), sin calcular un hash del cuerpo. Así un ETag de una URL no valida otra del
+# mismo grupo, y un If-None-Match o If-Modified-Since vigente se responde con 304 antes de
+# consultar la cache o la base.
+# Los cambios que no pasan por la API (el ETL escribe directo en PostgreSQL) no suben la
+# generación; por eso la versión tampoco es menor que el inicio de la ventana de `ttl` segundos en
+# curso: esos cambios se ven a lo sumo `ttl` segundos después, como con la cache sola.
+
+
+def ahora_ms():
+    return int(time.time() * 1000)
+
+
+def siguiente_generacion(actual):
+    return max(actual + 1, ahora_ms())
+
+
+class BackendMemoria:
+    def __init__(self, max_entradas=1000, max_bytes=64 * 1024 ** 2, generaciones=None):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        # Con varios workers (compartido.GeneracionesCompartidas) invalidar en uno invalida en todos
+        self.generaciones = generaciones
+        self._datos = OrderedDict()   # clave -> (expira, cuerpo, etag)
+        self._generaciones = {}
+        self._inicio = ahora_ms()   # generación de los grupos que aún no se invalidaron
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            if entrada[0] < time.monotonic():
+                self._quitar(clave)
+                return None
+            self._datos.move_to_end(clave)
+            return entrada[1], entrada[2]
+
+    def guardar(self, clave, cuerpo, etag, ttl):
+        with self._lock:
+            if clave in self._datos:
+                self._quitar(clave)
+            self._datos[clave] = (time.monotonic() + ttl, cuerpo, etag)
+            self._bytes += len(cuerpo)
+            while self._datos and (len(self._datos) > self.max_entradas or self._bytes > self.max_bytes):
+                self._quitar(next(iter(self._datos)))
+
+    def _quitar(self, clave):
+        _, cuerpo, _ = self._datos.pop(clave)
+        self._bytes -= len(cuerpo)
+
+    def generacion(self, grupo):
+        if self.generaciones is not None:
+            return self.generaciones.generacion(grupo)
+        with self._lock:
+            return self._generaciones.get(grupo, self._inicio)
+
+    def invalidar(self, grupo):
+        if self.generaciones is not None:
+            return self.generaciones.invalidar(grupo)
+        with self._lock:
+            self._generaciones[grupo] = siguiente_generacion(self._generaciones.get(grupo, self._inicio))
+
+    def tamano(self):
+        with self._lock:
+            return {"entradas": len(self._datos), "bytes": self._bytes}
+
+
+class BackendRedis:
+    # Cualquier servidor compatible con el protocolo Redis (Redis, Valkey, KeyDB, Dragonfly...)
+    # max(generación + 1, ahora) en el servidor: dos backends que invalidan a la vez no se pisan
+    SCRIPT_INVALIDAR = """
+        local siguiente = math.max(tonumber(redis.call('GET', KEYS[1]) or '0') + 1, tonumber(ARGV[1]))
+        redis.call('SET', KEYS[1], siguiente)
+        return siguiente
+    """
+
+    def __init__(self, url, prefijo="api:"):
+        import redis  # dependencia opcional
+
+        self.cliente = redis.Redis.from_url(url)
+        self.prefijo = prefijo
+
+    def obtener(self, clave):
+        cuerpo, etag = self.cliente.hmget(self.prefijo + clave, "cuerpo", "etag")
+        if cuerpo is None:
+            return None
+        return cuerpo, etag.decode()
+
+    def guardar(self, clave, cuerpo, etag, ttl):
+        pipe = self.cliente.pipeline()
+        pipe.hset(self.prefijo + clave, mapping={"cuerpo": cuerpo, "etag": etag})
+        pipe.expire(self.prefijo + clave, max(1, int(ttl)))
+        pipe.execute()
+
+    def generacion(self, grupo):
+        clave = f"{self.prefijo}gen:{grupo}"
+        valor = self.cliente.get(clave)
+        if valor is None:
+            # Primera vez (o el servidor perdió la clave): arranca en el momento actual
+            self.cliente.set(clave, ahora_ms(), nx=True)
+            valor = self.cliente.get(clave)
+        return int(valor)
+
+    def invalidar(self, grupo):
+        self.cliente.eval(self.SCRIPT_INVALIDAR, 1, f"{self.prefijo}gen:{grupo}", ahora_ms())
+
+    def tamano(self):
+        return {"entradas": None, "bytes": None}
+
+
+class CacheRespuestas:
+    def __init__(self, backend, ttl=300, activa=True, compresor=None, max_age=0):
+        self.backend = backend
+        self.ttl = ttl
+        self.activa = activa
+        self.compresor = compresor    # compresion.Compresor: cuerpos guardados ya comprimidos
+        self.max_age = max_age        # Cache-Control; 0 = el navegador guarda y revalida siempre
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.respuestas_304 = 0
+        self.bytes_desde_cache = 0   # cuerpos servidos sin tocar PostgreSQL
+        self.bytes_ahorrados_304 = 0  # cuerpos que ni siquiera se enviaron
+
+    def _contar(self, campo, cantidad=1):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + cantidad)
+
+    def version(self, grupo):
+        ventana = int(time.time() // self.ttl * self.ttl * 1000) if self.ttl > 0 else 0
+        return max(self.backend.generacion(grupo), ventana)
+
+    @staticmethod
+    def _recurso(vary):
+        # La misma clave para la misma representación (sin contar la codificación)
+        partes = [request.full_path] + [f"{c}:{request.headers.get(c, '')}" for c in vary]
+        return hashlib.sha1("\n".join(partes).encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _etiqueta_vigente(base, version):
+        # La etiqueta del cliente que sigue valiendo, o None. If-None-Match compara sin importar
+        # la codificación: "-gzip" o "-br" son el mismo contenido (comparación débil, RFC 9110)
+        if request.if_none_match:
+            if request.if_none_match.star_tag:
+                return base
+            for etiqueta in request.if_none_match.as_set(include_weak=True):
+                if etiqueta in (base, f"{base}-gzip", f"{base}-br"):
+                    return etiqueta
+            return None
+        # If-Modified-Since solo cuenta si no vino If-None-Match
+        desde = request.if_modified_since
+        if desde is not None and desde.timestamp() >= version // 1000:
+            return base
+        return None
+
+    def _cabeceras(self, respuesta, etag, version, max_age, vary=()):
+        respuesta.set_etag(etag)
+        respuesta.last_modified = datetime.fromtimestamp(version // 1000, timezone.utc)
+        if max_age:
+            respuesta.cache_control.max_age = max_age
+        else:
+            respuesta.cache_control.no_cache = True
+        if self.compresor is not None:
+            respuesta.vary.add("Accept-Encoding")
+        for cabecera in vary:
+            respuesta.vary.add(cabecera)
+        return respuesta
+
+    def _responder(self, cuerpo, etag, version, max_age, vary=()):
+        respuesta = Response(cuerpo, mimetype="application/json")
+        sufijo = etag.rsplit("-", 1)[1]
+        if sufijo in ("gzip", "br"):
+            respuesta.headers["Content-Encoding"] = sufijo
+        return self._cabeceras(respuesta, etag, version, max_age, vary)
+
+    def cachear(self, grupo, ttl=None, max_age=None, omitir=None, vary=()):
+        # omitir(): peticiones que no pasan por la cache (p. ej. las que eligen streaming con un
+        # header que no está en la clave); vary: headers que cambian la respuesta cacheada
+        def decorador(vista):
+            @wraps(vista)
+            def envoltura(*args, **kwargs):
+                # Con ?explain=1 el plan es de esa ejecución: no se cachea
+                if not self.activa or request.args.get("explain") or (omitir is not None and omitir()):
+                    return vista(*args, **kwargs)
+
+                edad = self.max_age if max_age is None else max_age
+                version = self.version(grupo)
+                recurso = self._recurso(vary)
+                base = f"{grupo}-{version}-{recurso}"
+                codificacion = self.compresor.elegir() if self.compresor is not None else None
+                # La clave identifica la misma representación que el ETag
+                clave = f"{grupo}:{version}:{recurso}"
+                clave_codificada = f"{clave}|{codificacion}" if codificacion else clave
+                guardado = self.backend.obtener(clave_codificada)
+
+                vigente = self._etiqueta_vigente(base, version)
+                if vigente is not None:
+                    self._contar("respuestas_304")
+                    if guardado is not None:
+                        self._contar("bytes_ahorrados_304", len(guardado[0]))
+                    etag = guardado[1] if guardado is not None else vigente
+                    return self._cabeceras(Response(status=304), etag, version, edad, vary)
+
+                if guardado is not None:
+                    self._contar("aciertos")
+                    self._contar("bytes_desde_cache", len(guardado[0]))
+                    return self._responder(guardado[0], guardado[1], version, edad, vary)
+
+                self._contar("fallos")
+                # Otra codificación de la misma respuesta ya guardada: se comprime esa
+                sin_comprimir = self.backend.obtener(clave) if codificacion else None
+                if sin_comprimir is not None:
+                    cuerpo = sin_comprimir[0]
+                else:
+                    respuesta = make_response(vista(*args, **kwargs))
+                    # Las respuestas en streaming no se guardan: leerlas aquí las cargaría enteras en memoria
+                    if respuesta.status_code != 200 or respuesta.direct_passthrough or respuesta.is_streamed:
+                        return respuesta
+                    cuerpo = respuesta.get_data()
+                    self.backend.guardar(clave, cuerpo, base, ttl or self.ttl)
+
+                etag = base
+                if codificacion:
+                    if len(cuerpo) >= self.compresor.minimo:
+                        cuerpo = self.compresor.comprimir(cuerpo, codificacion)
+                        etag = f"{base}-{codificacion}"
+                    self.backend.guardar(clave_codificada, cuerpo, etag, ttl or self.ttl)
+                return self._responder(cuerpo, etag, version, edad, vary)
+            return envoltura
+        return decorador
+
+    def invalidar(self, *grupos):
+        for grupo in grupos:
+            self.backend.invalidar(grupo)
+
+    def metricas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "activa": self.activa,
+                "backend": type(self.backend).__name__,
+                "ttl": self.ttl,
+                "max_age": self.max_age,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else 0.0,
+                "respuestas_304": self.respuestas_304,
+                "bytes_desde_cache": self.bytes_desde_cache,
+                "bytes_ahorrados_304": self.bytes_ahorrados_304,
+                **self.backend.tamano(),
+            }
@@ -0,0 +1,91 @@
+import sqlite3
+import threading
+
+# -------------------------------
+# Checkpoints del ETL en un archivo SQLite local
+# -------------------------------
+# progreso: última página completada por modo y fecha de la última ejecución terminada
+# juegos:   rawg_id -> id en nuestra BD, campo "updated" de RAWG y hash del contenido cargado
+
+
+class CheckpointETL:
+    def __init__(self, ruta="etl_checkpoint.sqlite3"):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS progreso (
+                clave TEXT PRIMARY KEY,
+                valor TEXT
+            );
+            CREATE TABLE IF NOT EXISTS juegos (
+                rawg_id INTEGER PRIMARY KEY,
+                id_db INTEGER NOT NULL,
+                updated TEXT,
+                hash TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    # ---------- progreso ----------
+    def _leer(self, clave):
+        with self._lock:
+            fila = self._conn.execute("SELECT valor FROM progreso WHERE clave = ?;", (clave,)).fetchone()
+        return fila[0] if fila else None
+
+    def _escribir(self, clave, valor):
+        self._conn.execute(
+            "INSERT INTO progreso (clave, valor) VALUES (?, ?) "
+            "ON CONFLICT (clave) DO UPDATE SET valor = excluded.valor;",
+            (clave, valor),
+        )
+
+    def ultima_pagina(self, modo):
+        valor = self._leer(f"pagina:{modo}")
+        return int(valor) if valor else 0
+
+    def ultima_ejecucion(self):
+        return self._leer("ultima_ejecucion")
+
+    def terminar_ejecucion(self, modo, marca):
+        # La próxima ejecución de este modo vuelve a empezar desde la página 1
+        with self._lock:
+            self._escribir(f"pagina:{modo}", "0")
+            self._escribir("ultima_ejecucion", marca)
+            self._conn.commit()
+
+    # ---------- juegos ----------
+    def obtener_juegos(self, rawg_ids):
+        rawg_ids = list(rawg_ids)
+        resultado = {}
+        with self._lock:
+            for i in range(0, len(rawg_ids), 500):
+                parte = rawg_ids[i:i + 500]
+                marcas = ",".join("?" * len(parte))
+                for rawg_id, id_db, updated, hash_ in self._conn.execute(
+                    f"SELECT rawg_id, id_db, updated, hash FROM juegos WHERE rawg_id IN ({marcas});", parte
+                ):
+                    resultado[rawg_id] = (id_db, updated, hash_)
+        return resultado
+
+    def confirmar_lote(self, modo, pagina, juegos):
+        # juegos: [(rawg_id, id_db, updated, hash)]; se llama después del commit en PostgreSQL
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO juegos (rawg_id, id_db, updated, hash) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (rawg_id) DO UPDATE SET id_db = excluded.id_db, "
+                "updated = excluded.updated, hash = excluded.hash;",
+                juegos,
+            )
+            self._escribir(f"pagina:{modo}", str(pagina))
+            self._conn.commit()
+
+    def reiniciar(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM progreso;")
+            self._conn.execute("DELETE FROM juegos;")
+            self._conn.commit()
+
+    def cerrar(self):
+        self._conn.close()
@@ -0,0 +1,190 @@
+import atexit
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+# -------------------------------
+# Estado compartido entre los workers de servidor_prefork.py (solo POSIX)
+# -------------------------------
+# Cada worker es un proceso con su propia memoria. Lo que debe verse igual en todos vive en
+# ESTADO_COMPARTIDO_DIR (el maestro crea uno temporal si no se define):
+# - GeneracionesCompartidas: las generaciones de la cache de respuestas en un archivo mapeado en
+#   memoria; una escritura en un worker invalida la cache de todos. Leerlas no toca el disco.
+# - MetricasCompartidas: cada worker vuelca su registro a <pid>.json y GET /metrics suma los de
+#   todos. Los contadores e histogramas de los workers que ya terminaron (reciclados, recargados)
+#   se acumulan en retirados.json para que los totales no retrocedan.
+# - La presencia ya se comparte con su SQLite (PRESENCIA_ARCHIVO dentro del mismo directorio).
+# - Liderazgo: un solo worker a la vez hace las tareas de fondo que no deben repetirse por worker
+#   (refresco de las vistas materializadas, barrido de bloqueos vencidos).
+
+
+@contextmanager
+def bloqueo_archivo(ruta):
+    # Exclusión mutua entre procesos; el archivo de bloqueo nunca se borra
+    with open(ruta, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class GeneracionesCompartidas:
+    # Un contador de 8 bytes por ranura; dos grupos en la misma ranura solo se invalidan juntos.
+    # Como en cache_respuestas.BackendMemoria, cada generación es el momento (ms) del último cambio
+    RANURAS = 256
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with bloqueo_archivo(ruta + ".lock"):
+            fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                nuevo = os.fstat(fd).st_size < self.RANURAS * 8
+                if nuevo:
+                    os.ftruncate(fd, self.RANURAS * 8)
+                self._mapa = mmap.mmap(fd, self.RANURAS * 8)
+            finally:
+                os.close(fd)
+            if nuevo:
+                inicio = int(time.time() * 1000)
+                for ranura in range(self.RANURAS):
+                    struct.pack_into("<Q", self._mapa, ranura * 8, inicio)
+
+    def _desplazamiento(self, grupo):
+        return zlib.crc32(grupo.encode()) % self.RANURAS * 8
+
+    def generacion(self, grupo):
+        return struct.unpack_from("<Q", self._mapa, self._desplazamiento(grupo))[0]
+
+    def invalidar(self, grupo):
+        desplazamiento = self._desplazamiento(grupo)
+        with bloqueo_archivo(self.ruta + ".lock"):
+            valor = struct.unpack_from("<Q", self._mapa, desplazamiento)[0]
+            struct.pack_into("<Q", self._mapa, desplazamiento, max(valor + 1, int(time.time() * 1000)))
+
+
+class Liderazgo:
+    # flock no bloqueante sobre un archivo que el ganador mantiene abierto mientras vive: cuando sale
+    # (reciclado, recarga, caída) el sistema suelta el bloqueo y el próximo worker que pregunta lo toma
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._archivo = None
+        self._lock = threading.Lock()
+
+    @property
+    def activo(self):
+        # Sin intentar tomarlo (métricas)
+        return self._archivo is not None
+
+    def es_lider(self):
+        with self._lock:
+            if self._archivo is None:
+                archivo = open(self.ruta, "a")
+                try:
+                    fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    archivo.close()
+                    return False
+                self._archivo = archivo
+                log.info("lider_elegido", extra={"ruta": self.ruta})
+            return True
+
+
+def _a_json(instantanea):
+    # {métrica: {(etiquetas,): valor}} -> JSON (las claves tupla pasan a listas)
+    return {nombre: [[list(k), v] for k, v in series.items()] for nombre, series in instantanea.items()}
+
+
+def _de_json(datos):
+    return {nombre: {tuple(k): v for k, v in series} for nombre, series in datos.items()}
+
+
+def _leer(ruta):
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            return _de_json(json.load(f))
+    except (OSError, ValueError):
+        return {}
+
+
+def _escribir(ruta, instantanea):
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(_a_json(instantanea), f)
+    os.replace(temporal, ruta)
+
+
+def proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricasCompartidas:
+    def __init__(self, directorio, registro, intervalo=5):
+        self.directorio = directorio
+        self.registro = registro
+        self.intervalo = intervalo
+        self.archivo = os.path.join(directorio, f"{os.getpid()}.json")
+        self._retirados = os.path.join(directorio, "retirados.json")
+        self._lock_archivo = os.path.join(directorio, "metricas.lock")
+        self._detener = threading.Event()
+        self._hilo = None
+        os.makedirs(directorio, exist_ok=True)
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, name="volcado-metricas", daemon=True)
+            self._hilo.start()
+            # Último volcado al salir: lo contado desde el volcado anterior no se pierde
+            atexit.register(self.volcar)
+
+    def detener(self):
+        self._detener.set()
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.volcar()
+            except Exception:
+                log.exception("Error al volcar las métricas del worker")
+
+    def volcar(self):
+        _escribir(self.archivo, self.registro.instantanea())
+
+    def exponer(self):
+        # Las de este proceso en vivo, más las de los demás workers según su último volcado
+        otras = []
+        with bloqueo_archivo(self._lock_archivo):
+            retirados = _leer(self._retirados)
+            hubo_retirados = False
+            for nombre in os.listdir(self.directorio):
+                base, extension = os.path.splitext(nombre)
+                ruta = os.path.join(self.directorio, nombre)
+                if extension != ".json" or not base.isdigit() or ruta == self.archivo:
+                    continue
+                if proceso_vivo(int(base)):
+                    otras.append(_leer(ruta))
+                    continue
+                # Worker terminado: sus contadores e histogramas se suman a los retirados; los
+                # medidores (conexiones abiertas, etc.) ya no valen nada
+                acumulables = self.registro.acumulables()
+                self.registro.sumar(retirados, {n: s for n, s in _leer(ruta).items() if n in acumulables})
+                os.remove(ruta)
+                hubo_retirados = True
+            if hubo_retirados:
+                _escribir(self._retirados, retirados)
+        return self.registro.exponer(otras + [retirados])
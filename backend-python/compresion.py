@@ -0,0 +1,87 @@
+import gzip
+import threading
+
+from flask import request
+
+# -------------------------------
+# Compresión negociada de las respuestas (gzip / brotli)
+# -------------------------------
+# Según Accept-Encoding (respetando q=0) se elige brotli si está instalado (pip install brotli) y
+# si no gzip. Solo se comprimen los cuerpos JSON o de texto de al menos `minimo` bytes: por debajo
+# de ~1 KB la cabecera de gzip y el tiempo de CPU no compensan.
+# - instalar(app) comprime en un after_request las respuestas que no pasan por la cache.
+# - CacheRespuestas recibe el mismo Compresor y guarda ya comprimido cada cuerpo (una vez por
+#   versión y codificación), con un ETag distinto por codificación ("catalogo-...-br").
+# Las respuestas con ETag propio (p. ej. la versión de GET /api/juegos/<id>, que vuelve en If-Match)
+# y las que ya traen Content-Encoding (listados en streaming) no se tocan.
+
+TIPOS_COMPRIMIBLES = ("application/json", "application/x-ndjson", "text/")
+
+
+class Compresor:
+    def __init__(self, minimo=1024, nivel_gzip=6, nivel_brotli=5, brotli=True):
+        self.minimo = minimo
+        self.nivel_gzip = nivel_gzip
+        self.nivel_brotli = nivel_brotli
+        self._brotli = None
+        if brotli:
+            try:
+                import brotli as modulo_brotli  # dependencia opcional
+                self._brotli = modulo_brotli
+            except ImportError:
+                pass
+        # Orden de preferencia cuando el cliente acepta varias con el mismo q
+        self.codificaciones = (["br"] if self._brotli is not None else []) + ["gzip"]
+        self._lock = threading.Lock()
+        self.respuestas = {c: 0 for c in self.codificaciones}
+        self.bytes_originales = 0
+        self.bytes_enviados = 0
+
+    def elegir(self):
+        # None: identidad (el cliente no acepta ninguna o solo con q=0)
+        return request.accept_encodings.best_match(self.codificaciones)
+
+    def comprimir(self, cuerpo, codificacion):
+        if codificacion == "br":
+            comprimido = self._brotli.compress(cuerpo, quality=self.nivel_brotli)
+        else:
+            # mtime=0: el mismo cuerpo da siempre los mismos bytes (un ETag fuerte por codificación)
+            comprimido = gzip.compress(cuerpo, compresslevel=self.nivel_gzip, mtime=0)
+        with self._lock:
+            self.respuestas[codificacion] += 1
+            self.bytes_originales += len(cuerpo)
+            self.bytes_enviados += len(comprimido)
+        return comprimido
+
+    def comprimible(self, respuesta):
+        return (respuesta.mimetype or "").startswith(TIPOS_COMPRIMIBLES) and "Content-Encoding" not in respuesta.headers
+
+    def aplicar(self, respuesta):
+        if respuesta.direct_passthrough or respuesta.is_streamed or respuesta.status_code in (204, 206, 304):
+            return respuesta
+        if not self.comprimible(respuesta) or "ETag" in respuesta.headers:
+            return respuesta
+        cuerpo = respuesta.get_data()
+        if len(cuerpo) < self.minimo:
+            return respuesta
+        respuesta.vary.add("Accept-Encoding")
+        codificacion = self.elegir()
+        if codificacion is None:
+            return respuesta
+        respuesta.set_data(self.comprimir(cuerpo, codificacion))
+        respuesta.headers["Content-Encoding"] = codificacion
+        return respuesta
+
+    def instalar(self, app):
+        app.after_request(self.aplicar)
+
+    def metricas(self):
+        with self._lock:
+            return {
+                "codificaciones": list(self.codificaciones),
+                "minimo_bytes": self.minimo,
+                "respuestas": dict(self.respuestas),
+                "bytes_originales": self.bytes_originales,
+                "bytes_enviados": self.bytes_enviados,
+                "ratio": round(self.bytes_enviados / self.bytes_originales, 4) if self.bytes_originales else None,
+            }
@@ -1,8 +1,20 @@
-import requests
 import psycopg2
 import os
+import io
+import time
+import json
+import hashlib
+import argparse
+import signal
+import threading
+from datetime import datetime, timezone
+from collections import OrderedDict
 from urllib.parse import urlparse
 from dotenv import load_dotenv
+from rawg_fetcher import ClienteRAWG, ExtractorConcurrente, RAWG_BASE_URL
+from checkpoint_etl import CheckpointETL
+from cache_rawg import CacheRespuestasRAWG
+from pipeline_etl import Etapa, Pipeline
 
 # -------------------------------
 # Cargar variables de entorno
@@ -10,6 +22,21 @@ from dotenv import load_dotenv
 load_dotenv()
 db_url = os.getenv("DB_URL")
 api_key = os.getenv("RAWG_API_KEY")
+rawg_base_url = os.getenv("RAWG_BASE_URL", RAWG_BASE_URL)  # apuntar a stub_rawg.py para pruebas locales
+concurrencia = int(os.getenv("RAWG_CONCURRENCIA", 8))
+tasa_rawg = float(os.getenv("RAWG_RPS", 5))                # peticiones por segundo permitidas
+paginas_adelantadas = int(os.getenv("RAWG_PAGINAS_ADELANTADAS", 4))
+paginas_por_lote = int(os.getenv("ETL_PAGINAS_POR_LOTE", 5))    # páginas de RAWG por transacción
+cache_max_desarrolladores = int(os.getenv("ETL_CACHE_DESARROLLADORES", 50000))
+cache_max_etiquetas = int(os.getenv("ETL_CACHE_ETIQUETAS", 50000))
+ruta_checkpoint = os.getenv("ETL_CHECKPOINT", "etl_checkpoint.sqlite3")
+hilos_transformacion = int(os.getenv("ETL_HILOS_TRANSFORMACION", 2))
+hilos_carga = int(os.getenv("ETL_HILOS_CARGA", 1))             # cada hilo de carga usa su propia conexión
+capacidad_colas = int(os.getenv("ETL_CAPACIDAD_COLAS", 8))     # páginas en vuelo entre etapas
+cache_rawg_dir = os.getenv("RAWG_CACHE_DIR", ".cache_rawg")     # vacío = sin cache de respuestas
+cache_rawg_ttl = float(os.getenv("RAWG_CACHE_TTL", 86400))
+cache_rawg_max_mb = float(os.getenv("RAWG_CACHE_MAX_MB", 2048))
+refrescar_estadisticas = os.getenv("ETL_REFRESCAR_ESTADISTICAS", "0") == "1"  # requiere sql/012
 
 # -------------------------------
 # Parsear cadena de conexión
@@ -19,35 +46,128 @@ result = urlparse(db_url)
 # -------------------------------
 # Conexión a la base de datos
 # -------------------------------
-conn = psycopg2.connect(
-    dbname=result.path[1:],  # Quita la primera barra '/'
-    user=result.username,
-    password=result.password,
-    host=result.hostname,
-    port=result.port
-)
-conn.autocommit = True
+def conectar():
+    nueva = psycopg2.connect(
+        dbname=result.path[1:],  # Quita la primera barra '/'
+        user=result.username,
+        password=result.password,
+        host=result.hostname,
+        port=result.port
+    )
+    nueva.autocommit = True
+    return nueva
+
+conn = conectar()
 cur = conn.cursor()
 
+# -------------------------------
+# Cache nombre -> id de dimensiones
+# -------------------------------
+
+class CacheDimension:
+    # LRU acotado (capacidad=None -> sin límite, para géneros y plataformas)
+    def __init__(self, capacidad=None):
+        self.capacidad = capacidad
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()  # la comparten los hilos de carga del pipeline
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsados = 0
+
+    def obtener(self, nombre):
+        with self._lock:
+            id_dim = self._datos.get(nombre)
+            if id_dim is None:
+                self.fallos += 1
+                return None
+            self.aciertos += 1
+            self._datos.move_to_end(nombre)
+            return id_dim
+
+    def guardar(self, nombre, id_dim):
+        with self._lock:
+            self._datos[nombre] = id_dim
+            self._datos.move_to_end(nombre)
+            if self.capacidad is not None and len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+                self.expulsados += 1
+
+    def lleno(self):
+        return self.capacidad is not None and len(self._datos) >= self.capacidad
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            "entradas": len(self._datos),
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "expulsados": self.expulsados,
+            "tasa_aciertos": round(self.aciertos / consultas, 4) if consultas else 0.0,
+        }
+
+
+caches = {
+    "generos": CacheDimension(),
+    "plataformas": CacheDimension(),
+    "desarrolladores": CacheDimension(cache_max_desarrolladores),
+    "etiquetas": CacheDimension(cache_max_etiquetas),
+}
+
+# dimensión -> función existente que lista (id, nombre) para precalentar la cache
+FUNCIONES_LISTADO = {
+    "generos": ("obtener_generos", ()),
+    "plataformas": ("obtener_plataformas", ()),
+    "desarrolladores": ("buscar_desarrolladores", ("",)),
+    "etiquetas": ("buscar_etiquetas", ("",)),
+}
+
+
+def precalentar_caches():
+    # Cursor con nombre (del lado del servidor): al cliente solo llegan las filas que caben en la
+    # cache, no el listado completo de desarrolladores y etiquetas
+    autocommit_previo = conn.autocommit
+    conn.autocommit = False
+    try:
+        for dimension, (funcion, args) in FUNCIONES_LISTADO.items():
+            cache = caches[dimension]
+            with conn.cursor(name=f"precalentar_{dimension}") as listado:
+                listado.itersize = 5000
+                listado.execute(f"SELECT * FROM {funcion}({', '.join(['%s'] * len(args))});", args)
+                while not cache.lleno():
+                    filas = listado.fetchmany(5000)
+                    if not filas:
+                        break
+                    for id_dim, nombre in filas:
+                        cache.guardar(nombre, id_dim)
+            print(f"Cache de {dimension}: {len(cache._datos)} entradas precargadas")
+    finally:
+        conn.rollback()
+        conn.autocommit = autocommit_previo
+
 # -------------------------------
 # Funciones para insertar en BD
 # -------------------------------
 
+def _insertar_dimension(dimension, funcion, nombre):
+    cache = caches[dimension]
+    id_dim = cache.obtener(nombre)
+    if id_dim is None:
+        cur.execute(f"SELECT {funcion}(%s);", (nombre,))
+        id_dim = cur.fetchone()[0]
+        cache.guardar(nombre, id_dim)
+    return id_dim
+
 def insertar_genero(nombre):
-    cur.execute("SELECT insertar_genero(%s);", (nombre,))
-    return cur.fetchone()[0]
+    return _insertar_dimension("generos", "insertar_genero", nombre)
 
 def insertar_plataforma(nombre):
-    cur.execute("SELECT insertar_plataforma(%s);", (nombre,))
-    return cur.fetchone()[0]
+    return _insertar_dimension("plataformas", "insertar_plataforma", nombre)
 
 def insertar_desarrollador(nombre):
-    cur.execute("SELECT insertar_desarrollador(%s);", (nombre,))
-    return cur.fetchone()[0]
+    return _insertar_dimension("desarrolladores", "insertar_desarrollador", nombre)
 
 def insertar_etiqueta(nombre):
-    cur.execute("SELECT insertar_etiqueta(%s);", (nombre,))
-    return cur.fetchone()[0]
+    return _insertar_dimension("etiquetas", "insertar_etiqueta", nombre)
 
 def insertar_juego(nombre, fecha, rating):
     cur.execute("SELECT insertar_juego(%s, %s, %s);", (nombre, fecha, rating))
@@ -69,105 +189,456 @@ def insertar_juego_etiqueta(id_juego, id_etiqueta):
 # Función para consumir RAWG API
 # -------------------------------
 
+# Cliente compartido: sesión keep-alive, token bucket, reintentos con backoff en 429/5xx
+# y cache en disco de las respuestas
+cache_respuestas = CacheRespuestasRAWG(
+    cache_rawg_dir, ttl=cache_rawg_ttl, max_bytes=int(cache_rawg_max_mb * 1024 ** 2)
+) if cache_rawg_dir else None
+cliente_rawg = ClienteRAWG(api_key, base_url=rawg_base_url, concurrencia=concurrencia, tasa=tasa_rawg,
+                           cache=cache_respuestas)
+
 def obtener_juegos_desde_api(url=None, pagina=1):
     if url is None:
-        url = "https://api.rawg.io/api/games"
+        url = f"{cliente_rawg.base_url}/games"
     params = {
-        "key": api_key,
         "page": pagina,
         "page_size": 40  # máximo permitido
     }
-    response = requests.get(url, params=params)
-    if response.status_code != 200:
-        print(f"Error al obtener juegos: {response.status_code} - {response.text}")
-        return None
-    return response.json()
+    return cliente_rawg.get_json(url, params)
 
 # -------------------------------
 # ETL: Extraer de API, cargar en BD
 # -------------------------------
 
 def obtener_detalles_juego(juego_id):
-    url = f"https://api.rawg.io/api/games/{juego_id}"
-    params = {
-        "key": api_key
-    }
-    response = requests.get(url, params=params)
-    
-    # Verifica si la respuesta fue exitosa
-    if response.status_code != 200:
-        print(f"Error al obtener detalles del juego ID {juego_id}: {response.status_code} - {response.text}")
-        return None
-    
-    try:
-        return response.json()
-    except Exception as e:
-        print(f"Error al parsear JSON del juego ID {juego_id}: {e}")
-        return None
-
+    return cliente_rawg.obtener_detalles(juego_id)
 
 
+# -------------------------------
+# Transformación: juego RAWG -> registro plano
+# -------------------------------
 
-def cargar_juegos():
-    url_base = "https://api.rawg.io/api/games"
-    pagina = 1
-    total_insertados = 0
-
-    while True:
-        data = obtener_juegos_desde_api(pagina=pagina)
-        if data is None:
-            break
-
-        juegos = data.get("results", [])
-        if not juegos:
-            break
-
-        for juego in juegos:
-            nombre = juego["name"]
-            fecha = juego.get("released")
-            rating = juego.get("rating")
-
-            print(f"Ingresando juego: {nombre}")
-            id_juego = insertar_juego(nombre, fecha, rating)
-            total_insertados += 1
-
-            # Géneros
-            for genero in juego.get("genres", []):
-                id_genero = insertar_genero(genero["name"])
-                insertar_juego_genero(id_juego, id_genero)
+def normalizar_juego(juego):
+    return {
+        "rawg_id": juego.get("id"),
+        "updated": juego.get("updated"),
+        "nombre": juego["name"],
+        "fecha": juego.get("released"),
+        "rating": juego.get("rating"),
+        "generos": [g["name"] for g in juego.get("genres") or []],
+        "plataformas": [p["platform"]["name"] for p in juego.get("platforms") or []],
+        # Los desarrolladores vienen del detalle; si no llegó (detalles_fallidos) quedan en None
+        # y la carga no toca los que el juego ya tenía
+        "desarrolladores": [d["name"] for d in juego["developers"] or []] if "developers" in juego else None,
+        "etiquetas": [t["name"] for t in juego.get("tags") or []],
+    }
 
-            # Plataformas
-            for plataforma_info in juego.get("platforms", []):
-                nombre_plataforma = plataforma_info["platform"]["name"]
-                id_plataforma = insertar_plataforma(nombre_plataforma)
-                insertar_juego_plataforma(id_juego, id_plataforma)
+def hash_contenido(registro):
+    # Solo lo que se escribe en la BD; el orden de las listas de RAWG no importa
+    contenido = {
+        "nombre": registro["nombre"],
+        "fecha": registro["fecha"],
+        "rating": registro["rating"],
+        # None (detalle fallido) no coincide con ningún hash completo: la próxima corrida lo recarga
+        **{dim: sorted(set(registro[dim])) if registro[dim] is not None else None for dim in DIMENSIONES},
+    }
+    return hashlib.sha1(json.dumps(contenido, sort_keys=True).encode()).hexdigest()
 
-            # Desarrolladores
-            detalles = obtener_detalles_juego(juego["id"])
-            if detalles and "developers" in detalles:
-                for dev in detalles["developers"]:
-                    id_dev = insertar_desarrollador(dev["name"])
-                    insertar_juego_desarrollador(id_juego, id_dev)
+# -------------------------------
+# Carga masiva por lotes
+# -------------------------------
 
-            # Etiquetas
-            for etiqueta in juego.get("tags", []):
-                id_etiqueta = insertar_etiqueta(etiqueta["name"])
-                insertar_juego_etiqueta(id_juego, id_etiqueta)
+# dimensión -> (función que inserta/devuelve id por nombre, función que inserta la relación,
+#               tabla de la relación, su columna de la dimensión)
+DIMENSIONES = {
+    "generos": ("insertar_genero", "insertar_juego_genero", "juego_genero", "id_genero"),
+    "plataformas": ("insertar_plataforma", "insertar_juego_plataforma", "juego_plataforma", "id_plataforma"),
+    "desarrolladores": ("insertar_desarrollador", "insertar_juego_desarrollador",
+                        "juego_desarrollador", "id_desarrollador"),
+    "etiquetas": ("insertar_etiqueta", "insertar_juego_etiqueta", "juego_etiqueta", "id_etiqueta"),
+}
+
+
+class CargadorLotes:
+    # Un lote = varias páginas de juegos escritas en una sola transacción con ~11 sentencias
+    # (4 más si trae juegos que ya existían)
+    def __init__(self, conn):
+        self.conn = conn
+        self.round_trips = 0
+        self.juegos = 0
+        self.relaciones = 0
+        self.segundos = 0.0
+        self._staging_creada = False
+        self._ids_nuevos = []    # (dimensión, nombre, id) resueltos en la transacción en curso
+
+    def _ejecutar(self, cur, sql, params=None):
+        self.round_trips += 1
+        cur.execute(sql, params)
+
+    def _crear_staging(self, cur):
+        if self._staging_creada:
+            return
+        self._ejecutar(cur, """
+            CREATE TEMP TABLE IF NOT EXISTS stg_juego_relacion (
+                tipo text NOT NULL,
+                id_juego integer NOT NULL,
+                id_dim integer NOT NULL
+            ) ON COMMIT DELETE ROWS;
+        """)
+        self._staging_creada = True
+
+    def resolver_dimension(self, cur, dimension, nombres):
+        # Primero la cache; los que falten se resuelven en una sola sentencia con la función existente
+        cache = caches[dimension]
+        ids = {}
+        faltantes = []
+        for nombre in nombres:
+            id_dim = cache.obtener(nombre)
+            if id_dim is None:
+                faltantes.append(nombre)
+            else:
+                ids[nombre] = id_dim
+        if faltantes:
+            funcion = DIMENSIONES[dimension][0]
+            self._ejecutar(cur, f"SELECT t.nombre, {funcion}(t.nombre) FROM unnest(%s::text[]) AS t(nombre);",
+                           (sorted(faltantes),))
+            # A la cache compartida recién tras el commit: si el lote se revierte esos ids no
+            # existen, y los otros hilos de carga no deben usarlos antes
+            for nombre, id_dim in cur.fetchall():
+                ids[nombre] = id_dim
+                self._ids_nuevos.append((dimension, nombre, id_dim))
+        return ids
+
+    def _escribir_juegos(self, cur, registros):
+        # Registros con "id_db" ya existen (modo incremental) y se actualizan; el resto se inserta
+        nuevos = [(i, r) for i, r in enumerate(registros) if r.get("id_db") is None]
+        existentes = [(i, r) for i, r in enumerate(registros) if r.get("id_db") is not None]
+        ids = [r.get("id_db") for r in registros]
+
+        if nuevos:
+            self._ejecutar(cur, """
+                SELECT t.ord, insertar_juego(t.nombre, t.fecha, t.rating)
+                FROM unnest(%s::text[], %s::date[], %s::numeric[]) WITH ORDINALITY AS t(nombre, fecha, rating, ord);
+            """, ([r["nombre"] for _, r in nuevos],
+                  [r["fecha"] for _, r in nuevos],
+                  [r["rating"] for _, r in nuevos]))
+            por_orden = dict(cur.fetchall())
+            for ord_, (i, _) in enumerate(nuevos, start=1):
+                ids[i] = por_orden[ord_]
+
+        if existentes:
+            self._ejecutar(cur, """
+                SELECT count(*) FROM (
+                    SELECT actualizar_juego(t.id, t.nombre, t.fecha, t.rating)
+                    FROM unnest(%s::integer[], %s::text[], %s::date[], %s::numeric[]) AS t(id, nombre, fecha, rating)
+                ) AS r;
+            """, ([r["id_db"] for _, r in existentes],
+                  [r["nombre"] for _, r in existentes],
+                  [r["fecha"] for _, r in existentes],
+                  [r["rating"] for _, r in existentes]))
+
+        return ids
+
+    def cargar(self, registros):
+        if not registros:
+            return []
+        inicio = time.perf_counter()
+        autocommit_previo = self.conn.autocommit
+        self.conn.autocommit = False
+        try:
+            with self.conn.cursor() as cur:
+                self._crear_staging(cur)
+                ids_juegos = self._escribir_juegos(cur, registros)
+
+                # Relaciones a staging vía COPY y luego un merge set-based por dimensión
+                buffer = io.StringIO()
+                filas = 0
+                for dimension in DIMENSIONES:
+                    nombres = {n for r in registros for n in r[dimension] or ()}
+                    ids = self.resolver_dimension(cur, dimension, nombres)
+                    for id_juego, r in zip(ids_juegos, registros):
+                        for id_dim in {ids[n] for n in r[dimension] or ()}:
+                            buffer.write(f"{dimension}\t{id_juego}\t{id_dim}\n")
+                            filas += 1
+
+                buffer.seek(0)
+                self.round_trips += 1
+                cur.copy_expert("COPY stg_juego_relacion (tipo, id_juego, id_dim) FROM STDIN;", buffer)
+
+                # Juegos que ya existían: el staging trae sus relaciones completas, así que se quitan
+                # las que RAWG ya no lista y solo se insertan las que faltan. Una dimensión en None
+                # (su detalle no llegó) no es una lista vacía: esas relaciones no se tocan
+                for dimension, (_, funcion_relacion, tabla, columna) in DIMENSIONES.items():
+                    existentes = [r["id_db"] for r in registros
+                                  if r.get("id_db") is not None and r[dimension] is not None]
+                    if existentes:
+                        self._ejecutar(cur, f"""
+                            DELETE FROM {tabla} AS t
+                            WHERE t.id_juego = ANY(%s)
+                              AND NOT EXISTS (
+                                  SELECT 1 FROM stg_juego_relacion s
+                                  WHERE s.tipo = %s AND s.id_juego = t.id_juego AND s.id_dim = t.{columna}
+                              );
+                        """, (existentes, dimension))
+                    self._ejecutar(cur, f"""
+                        SELECT count(*) FROM (
+                            SELECT {funcion_relacion}(s.id_juego, s.id_dim)
+                            FROM stg_juego_relacion s
+                            WHERE s.tipo = %s
+                              AND NOT EXISTS (
+                                  SELECT 1 FROM {tabla} t WHERE t.id_juego = s.id_juego AND t.{columna} = s.id_dim
+                              )
+                        ) AS r;
+                    """, (dimension,))
+
+            self.round_trips += 1
+            self.conn.commit()
+            for dimension, nombre, id_dim in self._ids_nuevos:
+                caches[dimension].guardar(nombre, id_dim)
+        except Exception:
+            self.conn.rollback()
+            # Si el lote revertido era el primero, la tabla de staging se revirtió con él
+            self._staging_creada = False
+            raise
+        finally:
+            self._ids_nuevos = []
+            self.conn.autocommit = autocommit_previo
+
+        self.juegos += len(registros)
+        self.relaciones += filas
+        self.segundos += time.perf_counter() - inicio
+        return ids_juegos
+
+    def estadisticas(self):
+        filas = self.juegos + self.relaciones
+        return {
+            "juegos": self.juegos,
+            "relaciones": self.relaciones,
+            "round_trips": self.round_trips,
+            "segundos": round(self.segundos, 2),
+            "filas_por_seg": round(filas / self.segundos, 1) if self.segundos else 0.0,
+        }
+
+
+def clasificar_lote(checkpoint, registros):
+    # Devuelve (a_cargar, omitidos) marcando con "id_db" los juegos ya cargados que cambiaron
+    unicos = {}
+    for r in registros:
+        unicos[r["rawg_id"]] = r  # RAWG puede repetir un juego entre páginas si cambia el orden
+    previos = checkpoint.obtener_juegos(unicos)
+
+    a_cargar = []
+    omitidos = 0
+    for rawg_id, r in unicos.items():
+        r["hash"] = hash_contenido(r)
+        previo = previos.get(rawg_id)
+        if previo is None:
+            a_cargar.append(r)
+            continue
+        id_db, updated, hash_previo = previo
+        if hash_previo == r["hash"] or (r["updated"] and r["updated"] == updated):
+            omitidos += 1
+            continue
+        r["id_db"] = id_db
+        a_cargar.append(r)
+    for r in a_cargar:
+        if any(r[dim] is None for dim in DIMENSIONES):
+            # Carga incompleta: sin "updated" en el checkpoint la próxima corrida no lo omite
+            r["updated"] = None
+    omitidos += len(registros) - len(unicos)
+    return a_cargar, omitidos
 
-        # ¿Hay una siguiente página?
-        if not data.get("next"):
-            break
 
-        pagina += 1
+# -------------------------------
+# Pipeline: extracción -> transformación -> carga
+# -------------------------------
 
-    print(f"Total de juegos insertados: {total_insertados}")
+class ConfirmadorPaginas:
+    # Con varios hilos las páginas terminan en desorden; el checkpoint solo avanza hasta
+    # la última página contigua confirmada para que al retomar no quede ningún hueco
+    def __init__(self, checkpoint, modo, pagina_inicial):
+        self.checkpoint = checkpoint
+        self.modo = modo
+        self.contigua = pagina_inicial - 1
+        self._terminadas = set()
+        self._lock = threading.Lock()
+        self.conteo = {"insertados": 0, "actualizados": 0, "omitidos": 0}
+
+    def confirmar(self, paginas, registros, ids, omitidos):
+        with self._lock:
+            self._terminadas.update(paginas)
+            while self.contigua + 1 in self._terminadas:
+                self.contigua += 1
+                self._terminadas.discard(self.contigua)
+            self.checkpoint.confirmar_lote(self.modo, self.contigua, [
+                (r["rawg_id"], id_db, r["updated"], r["hash"]) for r, id_db in zip(registros, ids)
+            ])
+            actualizados = sum(1 for r in registros if r.get("id_db") is not None)
+            self.conteo["actualizados"] += actualizados
+            self.conteo["insertados"] += len(registros) - actualizados
+            self.conteo["omitidos"] += omitidos
+
+
+class TrabajadorTransformacion:
+    def __init__(self, checkpoint):
+        self.checkpoint = checkpoint
+
+    def procesar(self, item):
+        pagina, data = item
+        registros = [normalizar_juego(j) for j in data.get("results", [])]
+        a_cargar, omitidos = clasificar_lote(self.checkpoint, registros)
+        return pagina, a_cargar, omitidos
+
+
+class TrabajadorCarga:
+    def __init__(self, confirmador, cargadores):
+        self.confirmador = confirmador
+        self.cargador = CargadorLotes(conectar())
+        cargadores.append(self.cargador)
+        self._paginas = []
+        self._registros = []
+        self._omitidos = 0
+
+    def procesar(self, item):
+        pagina, registros, omitidos = item
+        self._paginas.append(pagina)
+        self._registros.extend(registros)
+        self._omitidos += omitidos
+        if len(self._paginas) >= paginas_por_lote:
+            self._vaciar()
+
+    def _vaciar(self):
+        if not self._paginas:
+            return
+        ids = self.cargador.cargar(self._registros)
+        self.confirmador.confirmar(self._paginas, self._registros, ids, self._omitidos)
+        c = self.confirmador.conteo
+        print(f"Página {max(self._paginas)}: {c['insertados']} insertados, "
+              f"{c['actualizados']} actualizados, {c['omitidos']} sin cambios")
+        self._paginas, self._registros, self._omitidos = [], [], 0
+
+    def terminar(self):
+        try:
+            self._vaciar()
+        finally:
+            self.cargador.conn.close()
+
+
+def cargar_juegos(modo="completo", reiniciar=False):
+    # modo "completo": recorre todo el catálogo y retoma desde la última página confirmada
+    # modo "incremental": solo juegos con "updated" desde la última ejecución terminada
+    checkpoint = CheckpointETL(ruta_checkpoint)
+    if reiniciar:
+        checkpoint.reiniciar()
+
+    inicio_ejecucion = datetime.now(timezone.utc)
+    filtros = {}
+    if modo == "incremental":
+        desde = checkpoint.ultima_ejecucion()
+        if desde:
+            filtros["updated"] = f"{desde[:10]},{inicio_ejecucion.date().isoformat()}"
+        filtros["ordering"] = "-updated"
+        print(f"Modo incremental desde {desde or 'el inicio'}")
+
+    pagina_inicial = checkpoint.ultima_pagina(modo) + 1
+    if pagina_inicial > 1:
+        print(f"Retomando desde la página {pagina_inicial}")
+
+    precalentar_caches()
+
+    # Extracción (páginas y detalles en paralelo), transformación y carga corren a la vez,
+    # unidas por colas acotadas: el ritmo lo marca la etapa más lenta, no la suma de todas
+    extractor = ExtractorConcurrente(cliente_rawg, concurrencia=concurrencia,
+                                     paginas_adelantadas=paginas_adelantadas)
+    confirmador = ConfirmadorPaginas(checkpoint, modo, pagina_inicial)
+    cargadores = []
+    pipeline = Pipeline(
+        extractor.iterar(pagina_inicial=pagina_inicial, **filtros),
+        [
+            Etapa("transformacion", lambda: TrabajadorTransformacion(checkpoint), hilos_transformacion),
+            Etapa("carga", lambda: TrabajadorCarga(confirmador, cargadores), hilos_carga),
+        ],
+        capacidad=capacidad_colas,
+    )
+
+    # Primer Ctrl+C: deja de descargar y confirma lo ya descargado. Segundo: aborta.
+    def al_interrumpir(signum, frame):
+        print("Interrupción recibida: terminando de cargar lo ya descargado (Ctrl+C otra vez para abortar)")
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        pipeline.detener()
+
+    handler_previo = signal.signal(signal.SIGINT, al_interrumpir)
+    try:
+        etapas = pipeline.ejecutar()
+    finally:
+        signal.signal(signal.SIGINT, handler_previo)
+
+    if not pipeline.detenido():
+        checkpoint.terminar_ejecucion(modo, inicio_ejecucion.isoformat())
+    checkpoint.cerrar()
+
+    conteo = confirmador.conteo
+    stats = extractor.estadisticas()
+    carga = {
+        clave: sum(c.estadisticas()[clave] for c in cargadores)
+        for clave in ("juegos", "relaciones", "round_trips", "segundos")
+    }
+    filas_por_seg = (carga["juegos"] + carga["relaciones"]) / carga["segundos"] if carga["segundos"] else 0.0
+    # La ruta fila a fila hacía 1 + 2 por cada relación sentencias por juego
+    round_trips_fila_a_fila = carga["juegos"] + 2 * carga["relaciones"]
+    print(f"Juegos: {conteo['insertados']} insertados, {conteo['actualizados']} actualizados, "
+          f"{conteo['omitidos']} sin cambios")
+    print(f"Extracción: {stats['paginas']} páginas, {stats['juegos']} juegos en {stats['segundos']}s "
+          f"({stats['paginas_por_seg']} páginas/s, {stats['juegos_por_seg']} juegos/s, "
+          f"{stats['reintentos']} reintentos)")
+    print(f"Carga: {carga['juegos']} juegos + {carga['relaciones']} relaciones en {carga['segundos']:.2f}s "
+          f"({filas_por_seg:.1f} filas/s, {carga['round_trips']} round trips "
+          f"vs ~{round_trips_fila_a_fila} fila a fila)")
+    for e in etapas:
+        print(f"Etapa {e['etapa']} ({e['hilos']} hilos): {e['items']} páginas, {e['items_por_seg']} páginas/s, "
+              f"latencia media {e['latencia_media_ms']} ms (máx {e['latencia_max_ms']} ms), "
+              f"cola máx {e['cola_max']}")
+    for dimension, cache in caches.items():
+        c = cache.estadisticas()
+        print(f"Cache {dimension}: {c['entradas']} entradas, {c['aciertos']} aciertos, {c['fallos']} fallos "
+              f"({c['tasa_aciertos']:.1%}), {c['expulsados']} expulsados")
+    if cliente_rawg.cache is not None:
+        c = cliente_rawg.cache.estadisticas()
+        print(f"Cache de respuestas RAWG: {c['aciertos']} aciertos, {c['fallos']} fallos "
+              f"({c['tasa_aciertos']:.1%}), {c['guardados']} guardadas, {c['expulsados']} expulsadas, "
+              f"{c['megabytes']} MB")
+    if pipeline.detenido():
+        print(f"Ejecución interrumpida; se retomará desde la página {confirmador.contigua + 1}")
+    if refrescar_estadisticas and (conteo["insertados"] or conteo["actualizados"]):
+        cur.execute("SELECT refrescar_estadisticas();")
+        actualizado_en = cur.fetchone()[0]
+        conn.commit()
+        print(f"Estadísticas materializadas refrescadas ({actualizado_en:%Y-%m-%d %H:%M:%S})")
+    return conteo
 
 # -------------------------------
 # Ejecutar el ETL
 # -------------------------------
 
 if __name__ == "__main__":
-    cargar_juegos()
+    parser = argparse.ArgumentParser(description="ETL de RAWG hacia PostgreSQL")
+    parser.add_argument("--incremental", action="store_true",
+                        help="solo juegos nuevos o modificados desde la última ejecución")
+    parser.add_argument("--reiniciar", action="store_true",
+                        help="ignora los checkpoints guardados y empieza desde cero")
+    parser.add_argument("--replay", action="store_true",
+                        help="carga solo desde la cache de respuestas RAWG, sin red")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="no lee ni escribe la cache de respuestas RAWG")
+    args = parser.parse_args()
+
+    if args.sin_cache:
+        cliente_rawg.cache = None
+    if args.replay:
+        cliente_rawg.modo_replay()
+
+    cargar_juegos(modo="incremental" if args.incremental else "completo", reiniciar=args.reiniciar)
     print("Carga completada.")
     cur.close()
     conn.close()
+    cliente_rawg.cerrar()
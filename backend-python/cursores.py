@@ -0,0 +1,47 @@
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+
+# -------------------------------
+# Cursores opacos de la paginación keyset (sql/008_paginacion_cursor.sql)
+# -------------------------------
+# Compartidos por app.py y app_async.py: el cursor que entrega un modo sirve en el otro.
+
+ORDENES_CURSOR = ("rating", "nombre")
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(orden, fila):
+    # fila = (id, nombre, fecha, rating); la clave depende del orden
+    valor = fila[3] if orden == "rating" else fila[1]
+    if orden == "rating":
+        valor = str(valor if valor is not None else -1)
+    datos = json.dumps({"o": orden, "v": valor, "id": fila[0]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor, orden):
+    if not cursor:
+        return None, None
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if datos["o"] != orden:
+            raise CursorInvalido("El cursor pertenece a otro orden")
+        valor = datos["v"]
+        # El valor termina en p_valor::numeric / ::text (sql/008): uno mal formado es un 400, no un 500
+        if not isinstance(valor, str):
+            raise CursorInvalido("Valor de cursor inválido")
+        if orden == "rating":
+            try:
+                finito = Decimal(valor).is_finite()
+            except InvalidOperation:
+                finito = False
+            if not finito:
+                raise CursorInvalido(f"Rating de cursor inválido: {valor!r}")
+        return valor, int(datos["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise CursorInvalido(f"Cursor inválido: {e}")
@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# -------------------------------
+# Refresco en segundo plano de las estadísticas materializadas
+# -------------------------------
+# Las vistas de sql/012_estadisticas_materializadas.sql se leen en tiempo constante; este hilo
+# las refresca cuando hubo escrituras (agrupando ráfagas) o, como mínimo, cada `intervalo` segundos.
+# Con varios workers (servidor_prefork.py) refresca solo el líder (compartido.Liderazgo); las
+# escrituras de los demás le llegan por la generación compartida GENERACION_SUCIA, que el líder
+# revisa cada `revisar_cada` segundos.
+
+GENERACION_SUCIA = "estadisticas_sucias"
+
+# estadística -> (consulta en vivo, vista materializada, orden de las filas)
+ESTADISTICAS = {
+    "generos": ("SELECT * FROM estadisticas_juegos_por_genero();",
+                "mv_estadisticas_genero", "m.total DESC, m.genero"),
+    "top3": ("SELECT * FROM top3_juegos_por_genero();",
+             "mv_top3_genero", "m.genero, m.rating DESC NULLS LAST, m.id"),
+    "top3_opt": ("SELECT * FROM top3_juegos_por_genero_optimizado();",
+                 "mv_top3_genero_opt", "m.genero, m.rating DESC NULLS LAST, m.id"),
+}
+
+
+def sql_materializada(vista, orden):
+    # Filas de la vista y hora del último refresco en una sola consulta (parámetro: la vista)
+    return f"""
+        SELECT f.actualizado_en, m.*
+        FROM estadisticas_frescura f
+        LEFT JOIN {vista} m ON true
+        WHERE f.vista = %s
+        ORDER BY {orden};
+    """
+
+
+class RefrescadorEstadisticas:
+    def __init__(self, pool, intervalo=300, espera_minima=5, al_refrescar=None, generaciones=None,
+                 lider=None, revisar_cada=1):
+        self.pool = pool
+        self.intervalo = intervalo            # refresco periódico aunque no haya escrituras
+        self.espera_minima = espera_minima    # tras una escritura, espera a que termine la ráfaga
+        self.al_refrescar = al_refrescar      # p. ej. invalidar la cache de respuestas
+        self.generaciones = generaciones      # compartido.GeneracionesCompartidas (varios workers)
+        self.lider = lider                    # compartido.Liderazgo; None = este proceso refresca
+        self.revisar_cada = revisar_cada
+        self._generacion = generaciones.generacion(GENERACION_SUCIA) if generaciones else None
+        self._sucio = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.refrescos = 0
+        self.errores = 0
+        self.ultimo_ms = None
+        self.actualizado_en = None
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, name="refresco-estadisticas", daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._sucio.set()
+
+    def marcar_sucio(self):
+        if self.generaciones is not None:
+            self.generaciones.invalidar(GENERACION_SUCIA)
+        self._sucio.set()
+
+    def _pendiente(self):
+        # Escritura en este proceso o, con varios workers, en cualquiera
+        if self._sucio.is_set():
+            return True
+        return self.generaciones is not None and self.generaciones.generacion(GENERACION_SUCIA) != self._generacion
+
+    def _bucle(self):
+        proximo = time.monotonic() + self.intervalo
+        while not self._detener.is_set():
+            espera = proximo - time.monotonic()
+            if self.generaciones is not None:
+                espera = min(espera, self.revisar_cada)
+            self._sucio.wait(max(0.0, espera))
+            if self._detener.is_set():
+                break
+            pendiente = self._pendiente()
+            if not pendiente and time.monotonic() < proximo:
+                continue
+            # Lo que se escriba durante el refresco vuelve a marcar la vista como sucia
+            self._sucio.clear()
+            proximo = time.monotonic() + self.intervalo
+            if self.lider is not None and not self.lider.es_lider():
+                # Refresca otro worker; lo marcado aquí ya está en la generación compartida
+                self._generacion = self.generaciones.generacion(GENERACION_SUCIA)
+                continue
+            if pendiente:
+                self._detener.wait(self.espera_minima)
+                self._sucio.clear()
+            if self.generaciones is not None:
+                self._generacion = self.generaciones.generacion(GENERACION_SUCIA)
+            try:
+                self.refrescar()
+            except Exception:
+                with self._lock:
+                    self.errores += 1
+                log.exception("Error al refrescar estadísticas materializadas")
+
+    def refrescar(self):
+        inicio = time.perf_counter()
+        with self.pool.conexion(application_name="refresco_estadisticas") as conn, conn.cursor() as cur:
+            # REFRESH ... CONCURRENTLY: las lecturas siguen viendo la versión anterior mientras tanto
+            cur.execute("SELECT refrescar_estadisticas();")
+            actualizado_en = cur.fetchone()[0]
+        with self._lock:
+            self.refrescos += 1
+            self.ultimo_ms = round((time.perf_counter() - inicio) * 1000, 2)
+            self.actualizado_en = actualizado_en
+        if self.al_refrescar:
+            self.al_refrescar()
+        return actualizado_en
+
+    def metricas(self):
+        with self._lock:
+            return {
+                "intervalo": self.intervalo,
+                "espera_minima": self.espera_minima,
+                "pendiente": self._pendiente(),
+                "lider": self.lider.activo if self.lider is not None else True,
+                "refrescos": self.refrescos,
+                "errores": self.errores,
+                "ultimo_ms": self.ultimo_ms,
+                "actualizado_en": self.actualizado_en.isoformat() if self.actualizado_en else None,
+            }
@@ -0,0 +1,356 @@
+import bisect
+import heapq
+import logging
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+
+log = logging.getLogger(__name__)
+
+# -------------------------------
+# Índice en memoria para el autocompletado de desarrolladores y etiquetas
+# -------------------------------
+# - Posiciones en orden de rango (largo, nombre, id): la primera coincidencia encontrada es la mejor.
+# - Nombre que empieza con la consulta: rango contiguo de una lista alfabética (bisect).
+# - Trigramas de "  " + nombre (más "  x" por palabra) -> array('I') de posiciones: descartan al
+#   instante consultas sin coincidencias y, si la posting más corta (o la intersección de las dos
+#   más cortas) es chica, se verifica directo.
+# - Si hay muchos candidatos se buscan " consulta" (inicio de palabra) y "consulta" (subcadena)
+#   con str.find sobre todos los nombres concatenados en orden de rango, cortando al llegar a `limit`.
+# Lo agregado después de la última reconstrucción queda en una cola sin ordenar que se revisa entera.
+
+MAX_MEMO = 4096
+VERIFICAR_DIRECTO = 512   # postings más cortas que esto se verifican una por una
+
+
+def normalizar(texto):
+    texto = unicodedata.normalize("NFKD", " ".join(texto.lower().split()))
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def _claves_indice(normalizado):
+    relleno = "  " + normalizado
+    claves = {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+    for palabra in normalizado.split()[1:]:
+        claves.add("  " + palabra[0])
+    return claves
+
+
+def _claves_consulta(q):
+    if len(q) == 1:
+        return ["  " + q]
+    if len(q) == 2:
+        return [" " + q]
+    return [q[i:i + 3] for i in range(len(q) - 2)]
+
+
+class IndiceNombres:
+    def __init__(self, nombre, max_cola=0.1):
+        self.nombre = nombre
+        self.max_cola = max_cola   # fracción sin ordenar que dispara una reconstrucción
+        self._ids = array("i")
+        self._nombres = []         # nombre original (internado)
+        self._normalizados = []    # mismo objeto que el original si no cambia al normalizar
+        self._texto = ""           # normalizados unidos por "\n", en orden de posición
+        self._inicios = array("I", [0])  # desplazamiento de cada posición en _texto (+ el final)
+        self._postings = {}        # trigrama -> array('I') de posiciones
+        self._alfabetico = []      # normalizados en orden alfabético (prefijos con bisect)
+        self._alfabetico_pos = array("I")
+        self._ordenados = 0        # las posiciones menores a esta están en orden de rango
+        self._conocidos = set()    # ids ya indexados (la sincronización puede repetir filas)
+        self._memo = {}            # (consulta, limit) -> resultados; se vacía al agregar
+        self._lock = threading.Lock()
+        self._escritura = threading.Lock()
+        self.ultimo_id = 0
+        self.listo = False
+        self.reconstrucciones = 0
+        self.consultas = 0
+        self.aciertos_memo = 0
+        self.segundos_consulta = 0.0
+
+    def __len__(self):
+        return len(self._ids)
+
+    @staticmethod
+    def _entrada(id_nombre, nombre):
+        nombre = sys.intern(nombre)
+        normalizado = normalizar(nombre)
+        return id_nombre, nombre, (nombre if normalizado == nombre else sys.intern(normalizado))
+
+    def cargar(self, filas):
+        # Agrega (id, nombre) en bloque; si la cola sin ordenar crece demasiado, reconstruye
+        with self._escritura:
+            nuevas = [self._entrada(i, n) for i, n in filas if n and n.strip() and i not in self._conocidos]
+            if not nuevas:
+                return 0
+            cola = len(self._ids) - self._ordenados + len(nuevas)
+            if cola > self.max_cola * (len(self._ids) + len(nuevas)):
+                self._reconstruir(nuevas)
+            else:
+                for entrada in nuevas:
+                    self._agregar_cola(*entrada)
+            return len(nuevas)
+
+    def agregar(self, id_nombre, nombre):
+        self.cargar([(id_nombre, nombre)])
+
+    def _reconstruir(self, nuevas):
+        # Arma las estructuras nuevas sin bloquear las búsquedas y las reemplaza de una vez
+        entradas = list(zip(self._ids, self._nombres, self._normalizados)) + nuevas
+        entradas.sort(key=lambda e: (len(e[2]), e[2], e[0]))
+        ids = array("i", (e[0] for e in entradas))
+        nombres = [e[1] for e in entradas]
+        normalizados = [e[2] for e in entradas]
+        inicios = array("I", [0])
+        postings = {}
+        for posicion, normalizado in enumerate(normalizados):
+            inicios.append(inicios[-1] + len(normalizado) + 1)
+            for clave in _claves_indice(normalizado):
+                lista = postings.get(clave)
+                if lista is None:
+                    lista = postings[clave] = array("I")
+                lista.append(posicion)
+        orden = sorted(range(len(normalizados)), key=normalizados.__getitem__)
+        texto = "".join(n + "\n" for n in normalizados)
+
+        with self._lock:
+            self._ids, self._nombres, self._normalizados = ids, nombres, normalizados
+            self._texto, self._inicios = texto, inicios
+            self._postings = postings
+            self._alfabetico = [normalizados[p] for p in orden]
+            self._alfabetico_pos = array("I", orden)
+            self._ordenados = len(ids)
+            self._conocidos.update(e[0] for e in nuevas)
+            self.ultimo_id = max(self.ultimo_id, max(e[0] for e in nuevas))
+            self._memo.clear()
+            self.reconstrucciones += 1
+
+    def _agregar_cola(self, id_nombre, nombre, normalizado):
+        with self._lock:
+            posicion = len(self._ids)
+            self._ids.append(id_nombre)
+            self._nombres.append(nombre)
+            self._normalizados.append(normalizado)
+            self._texto += normalizado + "\n"
+            self._inicios.append(len(self._texto))
+            for clave in _claves_indice(normalizado):
+                postings = self._postings.get(clave)
+                if postings is None:
+                    postings = self._postings[clave] = array("I")
+                postings.append(posicion)
+            i = bisect.bisect_left(self._alfabetico, normalizado)
+            self._alfabetico.insert(i, normalizado)
+            self._alfabetico_pos.insert(i, posicion)
+            self._conocidos.add(id_nombre)
+            self.ultimo_id = max(self.ultimo_id, id_nombre)
+            self._memo.clear()
+
+    def _ocurrencias(self, patron, acepta, necesarios):
+        # Posiciones cuyo nombre contiene `patron` y cumple `acepta`, en orden de rango.
+        # La parte ordenada corta al juntar `necesarios`; la cola se revisa entera.
+        texto, inicios = self._texto, self._inicios
+        fin_ordenados = inicios[self._ordenados]
+        elegidos = []
+        for desde, hasta, cortar in ((0, fin_ordenados, True), (fin_ordenados, len(texto), False)):
+            i = texto.find(patron, desde, hasta)
+            while i != -1:
+                p = bisect.bisect_right(inicios, i) - 1
+                if acepta(self._normalizados[p]):
+                    elegidos.append(p)
+                    if cortar and len(elegidos) >= necesarios:
+                        break
+                i = texto.find(patron, inicios[p + 1], hasta)
+        return elegidos
+
+    @staticmethod
+    def _rango(q, normalizado):
+        if normalizado == q:
+            nivel = 0
+        elif normalizado.startswith(q):
+            nivel = 1
+        elif (" " + q) in normalizado:
+            nivel = 2
+        else:
+            nivel = 3
+        return nivel, len(normalizado), normalizado
+
+    def _buscar(self, q, limit):
+        normalizados, ids = self._normalizados, self._ids
+        if not q:
+            return list(self._alfabetico_pos[:limit])
+
+        listas = [self._postings.get(clave) for clave in _claves_consulta(q)]
+        if any(lista is None for lista in listas):
+            return []
+        listas.sort(key=len)
+        candidatos = listas[0]
+        if len(candidatos) > VERIFICAR_DIRECTO and len(listas) > 1 and len(listas[1]) <= 4 * VERIFICAR_DIRECTO:
+            # Dos postings medianas: su intersección (en C) suele dejar pocos candidatos
+            interseccion = set(candidatos).intersection(listas[1])
+            if len(interseccion) <= VERIFICAR_DIRECTO:
+                candidatos = sorted(interseccion)
+        espacio_q = " " + q
+
+        if len(candidatos) <= VERIFICAR_DIRECTO:
+            # Pocos candidatos: se clasifican por nivel en orden de rango, hasta `limit` por nivel
+            corte = bisect.bisect_left(candidatos, self._ordenados)
+            niveles = ([], [], [], [])
+            for p in candidatos[:corte]:
+                n = normalizados[p]
+                if len(q) < 3 or q in n:
+                    nivel = niveles[self._rango(q, n)[0]]
+                    if len(nivel) < limit:
+                        nivel.append(p)
+            elegidos = [p for nivel in niveles for p in nivel]
+            elegidos += [p for p in candidatos[corte:] if len(q) < 3 or q in normalizados[p]]
+        else:
+            # Nivel 0-1: el nombre empieza con la consulta (rango contiguo en orden alfabético).
+            # En la parte ordenada, posición menor = mejor rango; la cola se agrega aparte.
+            desde = bisect.bisect_left(self._alfabetico, q)
+            hasta = bisect.bisect_left(self._alfabetico, q + "\uffff")
+            prefijo = self._alfabetico_pos[desde:hasta]
+            if len(prefijo) > limit:
+                cola = [p for p in prefijo if p >= self._ordenados] if self._ordenados < len(ids) else []
+                prefijo = heapq.nsmallest(limit, prefijo) + cola
+            elegidos = list(prefijo)
+
+            # Nivel 2: otra palabra empieza con la consulta
+            if len(elegidos) < limit:
+                elegidos += self._ocurrencias(espacio_q, lambda n: not n.startswith(q), limit - len(elegidos))
+            # Nivel 3: subcadena (solo consultas de 3+ letras)
+            if len(elegidos) < limit and len(q) >= 3:
+                elegidos += self._ocurrencias(
+                    q, lambda n: not n.startswith(q) and espacio_q not in n, limit - len(elegidos))
+
+        return heapq.nsmallest(limit, elegidos, key=lambda p: self._rango(q, normalizados[p]) + (ids[p],))
+
+    def buscar(self, q, limit=20):
+        # Devuelve [(id, nombre)] ordenados: exacto, prefijo del nombre, prefijo de palabra, subcadena
+        inicio = time.perf_counter()
+        q = normalizar(q)
+        with self._lock:
+            resultados = self._memo.get((q, limit))
+            if resultados is not None:
+                self.aciertos_memo += 1
+            else:
+                resultados = [(self._ids[p], self._nombres[p]) for p in self._buscar(q, limit)]
+                # El autocompletado repite mucho las mismas consultas (sobre todo las primeras teclas)
+                if len(self._memo) >= MAX_MEMO:
+                    self._memo.clear()
+                self._memo[(q, limit)] = resultados
+            self.consultas += 1
+            self.segundos_consulta += time.perf_counter() - inicio
+        return resultados
+
+    def memoria(self):
+        with self._lock:
+            cadenas = {id(s): s for s in self._nombres}
+            cadenas.update((id(s), s) for s in self._normalizados)
+            bytes_postings = sum(sys.getsizeof(p) for p in self._postings.values())
+            bytes_claves = sum(sys.getsizeof(k) for k in self._postings)
+            bytes_cadenas = sum(sys.getsizeof(s) for s in cadenas.values()) + sys.getsizeof(self._texto)
+            bytes_estructuras = (sys.getsizeof(self._ids) + sys.getsizeof(self._nombres)
+                                 + sys.getsizeof(self._normalizados) + sys.getsizeof(self._inicios)
+                                 + sys.getsizeof(self._postings) + sys.getsizeof(self._alfabetico)
+                                 + sys.getsizeof(self._alfabetico_pos) + sys.getsizeof(self._conocidos))
+            total = bytes_postings + bytes_claves + bytes_cadenas + bytes_estructuras
+            return {
+                "indice": self.nombre,
+                "listo": self.listo,
+                "nombres": len(self._ids),
+                "sin_ordenar": len(self._ids) - self._ordenados,
+                "reconstrucciones": self.reconstrucciones,
+                "trigramas": len(self._postings),
+                "postings": sum(len(p) for p in self._postings.values()),
+                "bytes_postings": bytes_postings + bytes_claves,
+                "bytes_cadenas": bytes_cadenas,
+                "bytes_estructuras": bytes_estructuras,
+                "megabytes": round(total / 1024 ** 2, 2),
+                "consultas": self.consultas,
+                "aciertos_memo": self.aciertos_memo,
+                "consulta_media_us": round(self.segundos_consulta / self.consultas * 1e6, 1) if self.consultas else 0.0,
+            }
+
+
+# -------------------------------
+# Carga inicial y sincronización incremental desde PostgreSQL
+# -------------------------------
+class SincronizadorIndices:
+    # indices: {tabla: IndiceNombres}; trae las filas con id mayor al último indexado y, con
+    # sql/016, las de transacciones que la foto anterior no veía (confirmadas fuera del orden de
+    # sus ids). Las repetidas las descarta IndiceNombres.cargar
+    def __init__(self, pool, indices, intervalo=30, lote=5000):
+        self.pool = pool
+        self.indices = indices
+        self.intervalo = intervalo
+        self.lote = lote
+        self._con_cambio_xid = {}   # tabla -> si tiene la columna de sql/016
+        self.horizonte = None       # xmin de la última foto
+        self._detener = threading.Event()
+        self._hilo = None
+        self.sincronizaciones = 0
+        self.errores = 0
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, name="sincronizar-indices", daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                self.sincronizar()
+            except Exception:
+                self.errores += 1
+                log.exception("Error al sincronizar los índices de búsqueda")
+            self._detener.wait(self.intervalo)
+
+    def _tiene_cambio_xid(self, cur, tabla):
+        if tabla not in self._con_cambio_xid:
+            cur.execute("""
+                SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                               WHERE table_schema = current_schema() AND table_name = %s
+                                 AND column_name = 'cambio_xid');
+            """, (tabla,))
+            self._con_cambio_xid[tabla] = cur.fetchone()[0]
+        return self._con_cambio_xid[tabla]
+
+    def sincronizar(self):
+        nuevos = 0
+        with self.pool.conexion(application_name="indice_busqueda") as conn, conn.cursor() as cur:
+            # Una sola foto: el horizonte nuevo es el de la misma lectura
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY;")
+            horizonte = None
+            if any(self._tiene_cambio_xid(cur, tabla) for tabla in self.indices):
+                cur.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text;")
+                horizonte = cur.fetchone()[0]
+            for tabla, indice in self.indices.items():
+                inicio = time.perf_counter()
+                condicion, params = "id > %s", [indice.ultimo_id]
+                if self.horizonte is not None and self._tiene_cambio_xid(cur, tabla):
+                    condicion, params = "id > %s OR cambio_xid >= %s::xid8", [indice.ultimo_id, self.horizonte]
+                desde_id = 0
+                filas = []
+                while True:
+                    cur.execute(f"SELECT id, nombre FROM {tabla} WHERE ({condicion}) AND id > %s ORDER BY id LIMIT %s;",
+                                (*params, desde_id, self.lote))
+                    bloque = cur.fetchall()
+                    filas.extend(bloque)
+                    if len(bloque) < self.lote:
+                        break
+                    desde_id = bloque[-1][0]
+                nuevos += indice.cargar(filas)
+                if filas:
+                    # Avanza aunque la última fila no tuviera nombre
+                    indice.ultimo_id = max(indice.ultimo_id, filas[-1][0])
+                if not indice.listo:
+                    indice.listo = True
+                    log.info("Índice de búsqueda construido", extra={"tabla": tabla, "nombres": len(indice), "segundos": round(time.perf_counter() - inicio, 2)})
+        self.horizonte = horizonte
+        self.sincronizaciones += 1
+        return nuevos
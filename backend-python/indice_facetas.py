@@ -0,0 +1,619 @@
+import bisect
+import logging
+import sys
+import threading
+import time
+from array import array
+from datetime import date
+
+log = logging.getLogger(__name__)
+
+# -------------------------------
+# Índice de facetas en memoria (bitmaps) para el filtrado de juegos
+# -------------------------------
+# - Cada juego tiene una posición densa en orden (rating desc, id desc), el mismo de la paginación
+#   por cursor: los primeros bits de un resultado son su primera página.
+# - Cada valor de faceta (género, plataforma, desarrollador, etiqueta) es un bitmap (int de Python)
+#   si es denso, o un array('I') ordenado de posiciones si es disperso.
+# - Rating y fecha son bitmaps por bit (bit-sliced): un rango cuesta O(bits) operaciones.
+# - Lo insertado/actualizado tras la última reconstrucción va a una cola de posiciones al final;
+#   la posición vieja de un juego actualizado se apaga en el bitmap de vivos.
+# - Con sql/015 cada sincronización relee los juegos cuya transacción de cambio (cambio_xid) la
+#   foto anterior no veía: lo que escriben el ETL, otros procesos o SQL directo entra sin esperar
+#   a la reconstrucción. Sin sql/015 solo entran los ids nuevos y los marcados en este proceso.
+# - Con varios workers (servidor_prefork.py) cada uno tiene su índice; una escritura en cualquiera
+#   mueve la generación compartida GENERACION y los demás sincronizan en `revisar_cada` segundos.
+
+# faceta -> (tabla intermedia, columna del valor); las mismas que llenan insertar_juego_*
+FACETAS = {
+    "generos": ("juego_genero", "id_genero"),
+    "plataformas": ("juego_plataforma", "id_plataforma"),
+    "desarrolladores": ("juego_desarrollador", "id_desarrollador"),
+    "etiquetas": ("juego_etiqueta", "id_etiqueta"),
+}
+# facetas cuyos valores se filtran por nombre y se cuentan todos (son pocos)
+FACETAS_CON_NOMBRE = {"generos": "obtener_generos", "plataformas": "obtener_plataformas"}
+
+BITS_RATING = 9            # rating * 100: 0..500
+BITS_FECHA = 16            # días desde ORIGEN_FECHAS: hasta 2079
+ORIGEN_FECHAS = date(1900, 1, 1)
+DENSIDAD_BITMAP = 1 / 32   # con más juegos que esta fracción, el valor se guarda como bitmap
+GENERACION = "facetas"     # grupo en compartido.GeneracionesCompartidas
+MAX_MEMO = 1024            # combinaciones de filtros con conteos memorizados (paginar no recuenta)
+
+# id, rating_entero y fecha_entera calculados en PostgreSQL (la carga de 1M filas no pasa por Decimal/date)
+COLUMNAS_JUEGO = f"""
+    j.id,
+    CASE WHEN j.rating IS NOT NULL THEN LEAST(500, GREATEST(0, round(j.rating * 100)))::int END,
+    CASE WHEN j.fecha_lanzamiento IS NOT NULL
+         THEN LEAST({(1 << BITS_FECHA) - 1}, GREATEST(0, j.fecha_lanzamiento - DATE '{ORIGEN_FECHAS.isoformat()}')) END
+"""
+
+
+def rating_entero(rating):
+    return None if rating is None else max(0, min(500, int(round(float(rating) * 100))))
+
+
+def fecha_entera(fecha):
+    if fecha is None:
+        return None
+    return max(0, min((1 << BITS_FECHA) - 1, (fecha - ORIGEN_FECHAS).days))
+
+
+def bitmap_desde_posiciones(posiciones, n):
+    # Una cadena de '0'/'1' (bit más alto primero) se convierte a int en C
+    buffer = bytearray(b"0") * n
+    for p in posiciones:
+        buffer[n - 1 - p] = 49
+    return int(buffer, 2) if n else 0
+
+
+def posiciones_de(bitmap):
+    while bitmap:
+        bajo = bitmap & -bitmap
+        yield bajo.bit_length() - 1
+        bitmap ^= bajo
+
+
+def _posiciones_desde(bitmap, desde, n, trozo=64):
+    # Bits encendidos >= desde en orden, por bloques de bytes: no desplaza el int completo en cada paso
+    datos = bitmap.to_bytes((n + 7) // 8, "little")
+    vacio = bytes(trozo)
+    for b in range(desde >> 3, len(datos), trozo):
+        bloque = datos[b:b + trozo]
+        if bloque == vacio[:len(bloque)]:
+            continue
+        valor = int.from_bytes(bloque, "little")
+        base = b << 3
+        if base < desde:
+            valor >>= desde - base
+            valor <<= desde - base
+        while valor:
+            bajo = valor & -valor
+            yield base + bajo.bit_length() - 1
+            valor ^= bajo
+
+
+def _bitmap_disperso(posiciones, n):
+    # Pocas posiciones: bytes little-endian en vez de una cadena de n caracteres
+    buffer = bytearray((n + 7) // 8)
+    for p in posiciones:
+        buffer[p >> 3] |= 1 << (p & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def _rebanadas(valores, bits):
+    # Índice por bits: rebanada i = juegos con el bit i del valor encendido (+ bitmap de existencia)
+    ceros = "0" * bits
+    formato = f"0{bits}b"
+    filas = "".join(ceros if v is None else format(v, formato) for v in reversed(valores))
+    rebanadas = [int(filas[bits - 1 - i::bits] or "0", 2) for i in range(bits)]
+    existe = int("".join("0" if v is None else "1" for v in reversed(valores)) or "0", 2)
+    return rebanadas, existe
+
+
+def _mayor_igual(rebanadas, existe, c):
+    # O'Neil: recorre los bits de c de mayor a menor; x ^ (x & r) equivale a x & ~r sin ints negativos
+    if c <= 0:
+        return existe
+    if c >= 1 << len(rebanadas):
+        return 0
+    mayor, igual = 0, existe
+    for i in reversed(range(len(rebanadas))):
+        comun = igual & rebanadas[i]
+        if (c >> i) & 1:
+            igual = comun
+        else:
+            mayor |= comun
+            igual ^= comun
+    return mayor | igual
+
+
+def _menor_igual(rebanadas, existe, c):
+    if c < 0:
+        return 0
+    if c >= (1 << len(rebanadas)) - 1:
+        return existe
+    menor, igual = 0, existe
+    for i in reversed(range(len(rebanadas))):
+        comun = igual & rebanadas[i]
+        if (c >> i) & 1:
+            menor |= igual ^ comun
+            igual = comun
+        else:
+            igual ^= comun
+    return menor | igual
+
+
+def _agregar_rebanadas(campo, valor, bit):
+    rebanadas, existe = campo
+    if valor is None:
+        return campo
+    for i in range(len(rebanadas)):
+        if (valor >> i) & 1:
+            rebanadas[i] |= bit
+    return rebanadas, existe | bit
+
+
+class EstadoFacetas:
+    # Una versión completa del índice; se reemplaza entera al reconstruir
+    def __init__(self, filas_juegos, relaciones, nombres, destacar=20):
+        # filas_juegos: [(id, rating_entero, fecha_entera)] en orden de posición (ver COLUMNAS_JUEGO)
+        # relaciones: {faceta: {valor: [ids de juego]}}; nombres: {faceta: {id: nombre}}
+        n = len(filas_juegos)
+        self.n = n
+        self.ordenados = n
+        self.ids = array("i", (f[0] for f in filas_juegos))
+        ratings = [f[1] for f in filas_juegos]
+        self.ratings = array("h", (-1 if r is None else r for r in ratings))
+        self.pos_por_id = array("i", [-1]) * (max(self.ids, default=0) + 1)
+        for p, id_juego in enumerate(self.ids):
+            self.pos_por_id[id_juego] = p
+        self.vivos = (1 << n) - 1
+        self.rating = _rebanadas(ratings, BITS_RATING)
+        self.fecha = _rebanadas([f[2] for f in filas_juegos], BITS_FECHA)
+
+        pos_por_id = self.pos_por_id
+        self.valores = {}
+        self.destacados = {}
+        for faceta in FACETAS:
+            juegos_por_valor = relaciones.get(faceta, {})
+            # Los más usados se cuentan en cada consulta: van como bitmap aunque sean dispersos
+            if faceta in FACETAS_CON_NOMBRE:
+                self.destacados[faceta] = list(juegos_por_valor)
+            else:
+                self.destacados[faceta] = sorted(juegos_por_valor, key=lambda v: len(juegos_por_valor[v]),
+                                                 reverse=True)[:destacar]
+            densos = set(self.destacados[faceta])
+            valores = {}
+            for valor, ids in juegos_por_valor.items():
+                posiciones = [pos_por_id[i] for i in ids if i < len(pos_por_id) and pos_por_id[i] >= 0]
+                if valor in densos or len(posiciones) > n * DENSIDAD_BITMAP:
+                    valores[valor] = bitmap_desde_posiciones(posiciones, n)
+                else:
+                    valores[valor] = array("I", posiciones)
+            self.valores[faceta] = valores
+        self.nombres = nombres
+        self.ids_por_nombre = {f: {nombre.lower(): i for i, nombre in m.items()} for f, m in nombres.items()}
+
+    def clave(self, p):
+        # Orden de rango: rating desc (nulos al final), id desc
+        return -self.ratings[p], -self.ids[p]
+
+    # ---- escrituras (cola al final) ----
+
+    def eliminar(self, id_juego):
+        if id_juego < len(self.pos_por_id) and self.pos_por_id[id_juego] >= 0:
+            p = self.pos_por_id[id_juego]
+            self.vivos ^= 1 << p
+            self.pos_por_id[id_juego] = -1
+            return p
+        return None
+
+    def agregar(self, id_juego, rating, fecha, relaciones):
+        # rating y fecha ya como enteros (rating_entero / fecha_entera)
+        self.eliminar(id_juego)
+        p = self.n
+        self.n += 1
+        bit = 1 << p
+        self.ids.append(id_juego)
+        self.ratings.append(-1 if rating is None else rating)
+        if id_juego >= len(self.pos_por_id):
+            self.pos_por_id.extend([-1] * (id_juego + 1 - len(self.pos_por_id)))
+        self.pos_por_id[id_juego] = p
+        self.vivos |= bit
+        self.rating = _agregar_rebanadas(self.rating, rating, bit)
+        self.fecha = _agregar_rebanadas(self.fecha, fecha, bit)
+
+        for faceta, valores in relaciones.items():
+            guardados = self.valores[faceta]
+            for valor in set(valores):
+                actual = guardados.get(valor)
+                if actual is None:
+                    guardados[valor] = array("I", [p])
+                elif isinstance(actual, int):
+                    guardados[valor] = actual | bit
+                else:
+                    actual.append(p)
+
+    # ---- lecturas ----
+
+    def bitmap(self, faceta, valor):
+        actual = self.valores[faceta].get(valor)
+        if actual is None:
+            return 0
+        if isinstance(actual, int):
+            return actual
+        return _bitmap_disperso(actual, self.n)
+
+    def filtro_faceta(self, faceta, valores, modo):
+        resultado = None
+        for valor in valores:
+            b = self.bitmap(faceta, valor)
+            resultado = b if resultado is None else (resultado & b if modo == "and" else resultado | b)
+        return resultado
+
+    def filtro_rango(self, campo, minimo, maximo):
+        rebanadas, existe = getattr(self, campo)
+        resultado = existe
+        if minimo is not None:
+            resultado &= _mayor_igual(rebanadas, existe, minimo)
+        if maximo is not None:
+            resultado &= _menor_igual(rebanadas, existe, maximo)
+        return resultado
+
+    def contar(self, base, faceta, valores):
+        # [(valor, juegos de base con ese valor)]; los bytes de base solo si hay valores dispersos
+        guardados = self.valores[faceta]
+        bytes_base = None
+        cuentas = []
+        for valor in valores:
+            actual = guardados[valor]
+            if isinstance(actual, int):
+                cuentas.append((valor, (base & actual).bit_count()))
+                continue
+            if bytes_base is None:
+                bytes_base = base.to_bytes((self.n + 7) // 8, "little")
+            cuentas.append((valor, sum((bytes_base[p >> 3] >> (p & 7)) & 1 for p in actual)))
+        return cuentas
+
+    def pagina(self, resultado, offset, limit):
+        # Posiciones [offset, offset + limit) de `resultado` en orden de rango, mezclando la cola
+        ordenados = self.ordenados
+        s = resultado & ((1 << ordenados) - 1)
+        cola = sorted((ordenados + p for p in posiciones_de(resultado >> ordenados)), key=self.clave)
+        claves_cola = [self.clave(p) for p in cola]
+
+        def antes(p):
+            # Cuántos resultados van antes de la posición ordenada p
+            de_cola = bisect.bisect_left(claves_cola, self.clave(p)) if p < ordenados else len(cola)
+            return (s & ((1 << p) - 1)).bit_count() + de_cola
+
+        # Búsqueda binaria de la primera posición con `offset` resultados antes (bit_count en C)
+        bajo, alto = 0, ordenados if offset else 0
+        while bajo < alto:
+            medio = (bajo + alto) // 2
+            if antes(medio) >= offset:
+                alto = medio
+            else:
+                bajo = medio + 1
+        if bajo == 0:
+            inicio, rango, j = 0, 0, 0
+        else:
+            inicio = bajo - 1
+            rango = antes(inicio)
+            j = bisect.bisect_left(claves_cola, self.clave(inicio))
+
+        elegidos = []
+        ordenadas = _posiciones_desde(s, inicio, ordenados)
+        siguiente = next(ordenadas, None)
+        while len(elegidos) < limit:
+            if siguiente is not None and (j >= len(cola) or self.clave(siguiente) < claves_cola[j]):
+                elegido = siguiente
+                siguiente = next(ordenadas, None)
+            elif j < len(cola):
+                elegido = cola[j]
+                j += 1
+            else:
+                break
+            if rango >= offset:
+                elegidos.append(elegido)
+            rango += 1
+        return [self.ids[p] for p in elegidos]
+
+
+class IndiceFacetas:
+    def __init__(self, pool, intervalo=30, reconstruir_cada=3600, max_cola=0.02, destacar=20,
+                 generaciones=None, revisar_cada=0.5):
+        self.pool = pool
+        self.intervalo = intervalo              # sincronización de juegos nuevos/modificados
+        self.generaciones = generaciones        # compartido.GeneracionesCompartidas (varios workers)
+        self.revisar_cada = revisar_cada        # cada cuánto se mira la generación compartida
+        self._generacion = None                 # la vista al empezar la última vuelta
+        self.reconstruir_cada = reconstruir_cada
+        self.max_cola = max_cola                # fracción de la cola que dispara una reconstrucción
+        self.destacar = destacar                # desarrolladores/etiquetas contados además de los filtrados
+        self.estado = None
+        self._lock = threading.Lock()
+        self._pendientes = set()
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        self.ultimo_id = 0
+        self.horizonte = None                   # xmin de la última foto (None: sin sql/015)
+        self._aplicados = {}                    # id -> cambio_xid ya aplicado desde el horizonte
+        self.ultima_reconstruccion = 0.0
+        self.segundos_reconstruccion = None
+        self.reconstrucciones = 0
+        self.consultas = 0
+        self.segundos_consulta = 0.0
+        self.errores = 0
+        self._memo = {}                         # filtros -> conteos; se vacía con cada cambio del índice
+        self.aciertos_memo = 0
+
+    @property
+    def listo(self):
+        return self.estado is not None
+
+    # ---- carga y sincronización ----
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, name="indice-facetas", daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._despertar.set()
+
+    def marcar(self, ids):
+        # Juegos insertados o actualizados por el backend: se reindexan en la próxima vuelta
+        with self._lock:
+            self._pendientes.update(ids)
+        if self.generaciones is not None:
+            self.generaciones.invalidar(GENERACION)
+        self._despertar.set()
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            if self.generaciones is not None:
+                # Antes de leer la base: lo escrito durante esta vuelta la vuelve a mover
+                self._generacion = self.generaciones.generacion(GENERACION)
+            try:
+                estado = self.estado
+                if (estado is None or time.monotonic() - self.ultima_reconstruccion > self.reconstruir_cada
+                        or estado.n - estado.ordenados > self.max_cola * max(1, estado.ordenados)):
+                    self.reconstruir()
+                else:
+                    self.sincronizar()
+            except Exception:
+                self.errores += 1
+                log.exception("Error en el índice de facetas")
+            self._esperar()
+
+    def _esperar(self):
+        # Hasta marcar(), el intervalo o (con varios workers) una escritura en otro worker
+        limite = time.monotonic() + self.intervalo
+        while not self._despertar.is_set():
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            if self.generaciones is None:
+                self._despertar.wait(restante)
+            elif not self._despertar.wait(min(restante, self.revisar_cada)):
+                if self.generaciones.generacion(GENERACION) != self._generacion:
+                    break
+        self._despertar.clear()
+
+    def reconstruir(self):
+        inicio = time.perf_counter()
+        with self._lock:
+            self._pendientes.clear()
+        with self.pool.conexion(application_name="indice_facetas") as conn, conn.cursor() as cur:
+            # Una sola foto de la base para que las posiciones coincidan en todas las consultas
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY;")
+            cur.execute(f"""
+                SELECT {COLUMNAS_JUEGO} FROM juegos j
+                ORDER BY COALESCE(j.rating, -1) DESC, j.id DESC;
+            """)
+            filas = cur.fetchall()
+
+            relaciones = {}
+            for faceta, (tabla, columna) in FACETAS.items():
+                cur.execute(f"SELECT {columna}, array_agg(id_juego) FROM {tabla} GROUP BY {columna};")
+                relaciones[faceta] = dict(cur.fetchall())
+
+            nombres = {}
+            for faceta, funcion in FACETAS_CON_NOMBRE.items():
+                cur.callproc(funcion)
+                nombres[faceta] = dict(cur.fetchall())
+
+            horizonte, aplicados = self._horizonte(cur)
+
+        estado = EstadoFacetas(filas, relaciones, nombres, destacar=self.destacar)
+        with self._lock:
+            self.estado = estado
+            self.horizonte, self._aplicados = horizonte, aplicados
+            self._memo.clear()
+            self.ultimo_id = max(self.ultimo_id, max(estado.ids, default=0))
+            self.ultima_reconstruccion = time.monotonic()
+            self.segundos_reconstruccion = round(time.perf_counter() - inicio, 2)
+            self.reconstrucciones += 1
+        log.info("Índice de facetas construido", extra={"juegos": estado.n, "segundos": self.segundos_reconstruccion})
+        # Lo escrito mientras se reconstruía se reaplica sobre la versión nueva
+        self.sincronizar()
+
+    def _horizonte(self, cur):
+        # (xmin de la foto de esta transacción, {id: cambio_xid} de lo que ya se ve desde ahí);
+        # (None, {}) si la base no tiene sql/015
+        cur.execute("""
+            SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                           WHERE table_schema = current_schema() AND table_name = 'juegos'
+                             AND column_name = 'cambio_xid');
+        """)
+        if not cur.fetchone()[0]:
+            return None, {}
+        horizonte = self._xmin(cur)
+        cur.execute("SELECT id, cambio_xid::text FROM juegos WHERE cambio_xid >= %s::xid8;", (str(horizonte),))
+        return horizonte, {id_juego: int(xid) for id_juego, xid in cur.fetchall()}
+
+    @staticmethod
+    def _xmin(cur):
+        # Toda transacción con xid menor ya había terminado cuando se tomó la foto
+        cur.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text;")
+        return int(cur.fetchone()[0])
+
+    def sincronizar(self):
+        with self._lock:
+            pendientes = sorted(self._pendientes)
+            self._pendientes.clear()
+        with self.pool.conexion(application_name="indice_facetas") as conn, conn.cursor() as cur:
+            # Una sola foto: el horizonte nuevo es el de la misma lectura
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY;")
+            relaciones_sql = ",\n".join(
+                f"ARRAY(SELECT r.{columna} FROM {tabla} r WHERE r.id_juego = j.id)"
+                for tabla, columna in FACETAS.values()
+            )
+            if self.horizonte is None:
+                cambio, condicion, params = "NULL", "", (pendientes, self.ultimo_id)
+            else:
+                cambio, condicion = "j.cambio_xid::text", "OR j.cambio_xid >= %s::xid8"
+                params = (pendientes, self.ultimo_id, str(self.horizonte))
+            cur.execute(f"""
+                SELECT {COLUMNAS_JUEGO}, {relaciones_sql}, {cambio}
+                FROM juegos j
+                WHERE j.id = ANY(%s) OR j.id > %s {condicion}
+                ORDER BY j.id;
+            """, params)
+            filas = cur.fetchall()
+            horizonte = self._xmin(cur) if self.horizonte is not None else None
+
+        encontrados = {f[0] for f in filas}
+        aplicadas = 0
+        with self._lock:
+            estado = self.estado
+            for fila in filas:
+                xid = int(fila[-1]) if fila[-1] is not None else None
+                # Las transacciones entre el horizonte y su confirmación se releen en varias vueltas
+                if xid is not None and self._aplicados.get(fila[0]) == xid:
+                    continue
+                estado.agregar(fila[0], fila[1], fila[2], dict(zip(FACETAS, fila[3:-1])))
+                if xid is not None:
+                    self._aplicados[fila[0]] = xid
+                aplicadas += 1
+            for id_juego in pendientes:
+                if id_juego not in encontrados:
+                    estado.eliminar(id_juego)
+            if aplicadas or pendientes:
+                self._memo.clear()
+            if filas:
+                self.ultimo_id = max(self.ultimo_id, filas[-1][0])
+            if horizonte is not None:
+                self.horizonte = horizonte
+                self._aplicados = {i: x for i, x in self._aplicados.items() if x >= horizonte}
+        return aplicadas
+
+    # ---- consultas ----
+
+    def resolver(self, faceta, valores):
+        # Acepta ids o, en géneros y plataformas, nombres (sin distinguir mayúsculas)
+        estado = self.estado
+        ids = []
+        for valor in valores:
+            if valor.isdigit():
+                ids.append(int(valor))
+            elif faceta in estado.ids_por_nombre:
+                ids.append(estado.ids_por_nombre[faceta].get(valor.lower(), -1))
+            else:
+                ids.append(-1)
+        return ids
+
+    def buscar(self, facetas, rating=(None, None), fecha=(None, None), offset=0, limit=12, con_conteos=True):
+        # facetas: {faceta: ([ids], "or"|"and")}; rating en 0..5 y fechas como date
+        inicio = time.perf_counter()
+        with self._lock:
+            estado = self.estado
+            filtros = {}
+            for faceta, (valores, modo) in facetas.items():
+                if valores:
+                    filtros[faceta] = estado.filtro_faceta(faceta, valores, modo)
+            if rating != (None, None):
+                filtros["rating"] = estado.filtro_rango("rating", rating_entero(rating[0]), rating_entero(rating[1]))
+            if fecha != (None, None):
+                filtros["fecha"] = estado.filtro_rango("fecha", fecha_entera(fecha[0]), fecha_entera(fecha[1]))
+
+            def combinar(excluir=None):
+                resultado = estado.vivos
+                for nombre, bitmap in filtros.items():
+                    if nombre != excluir:
+                        resultado &= bitmap
+                return resultado
+
+            resultado = combinar()
+            total = resultado.bit_count()
+            ids = estado.pagina(resultado, offset, limit)
+
+            conteos = None
+            if con_conteos:
+                clave = (tuple((f, tuple(v), m) for f, (v, m) in sorted(facetas.items()) if v), rating, fecha)
+                conteos = self._memo.get(clave)
+                if conteos is not None:
+                    self.aciertos_memo += 1
+                else:
+                    conteos = self._conteos(estado, facetas, filtros, resultado, combinar)
+                    if len(self._memo) >= MAX_MEMO:
+                        self._memo.clear()
+                    self._memo[clave] = conteos
+            self.consultas += 1
+            self.segundos_consulta += time.perf_counter() - inicio
+        return ids, total, conteos or {}
+
+    def _conteos(self, estado, facetas, filtros, resultado, combinar):
+        conteos = {}
+        for faceta in FACETAS:
+            # Conteo disyuntivo: cada faceta se cuenta sin su propio filtro
+            base = combinar(excluir=faceta) if faceta in filtros else resultado
+            valores = set(estado.destacados[faceta])
+            valores.update(v for v in facetas.get(faceta, ((), None))[0] if v in estado.valores[faceta])
+            cuentas = sorted(estado.contar(base, faceta, valores), key=lambda c: (-c[1], c[0]))
+            nombres = estado.nombres.get(faceta, {})
+            conteos[faceta] = [
+                {"id": v, "nombre": nombres[v], "total": c} if v in nombres else {"id": v, "total": c}
+                for v, c in cuentas if c
+            ]
+        return conteos
+
+    def metricas(self):
+        with self._lock:
+            estado = self.estado
+            if estado is None:
+                return {"listo": False, "errores": self.errores}
+            bytes_bitmaps = bytes_arrays = 0
+            valores_bitmap = valores_array = 0
+            for valores in estado.valores.values():
+                for actual in valores.values():
+                    if isinstance(actual, int):
+                        bytes_bitmaps += sys.getsizeof(actual)
+                        valores_bitmap += 1
+                    else:
+                        bytes_arrays += sys.getsizeof(actual)
+                        valores_array += 1
+            bytes_rangos = sum(sys.getsizeof(b) for campo in (estado.rating, estado.fecha) for b in campo[0] + [campo[1]])
+            bytes_posiciones = sum(sys.getsizeof(a) for a in (estado.ids, estado.ratings, estado.pos_por_id))
+            return {
+                "listo": True,
+                "juegos": estado.vivos.bit_count(),
+                "posiciones": estado.n,
+                "cola": estado.n - estado.ordenados,
+                "valores_bitmap": valores_bitmap,
+                "valores_array": valores_array,
+                "megabytes": round((bytes_bitmaps + bytes_arrays + bytes_rangos + bytes_posiciones) / 1024 ** 2, 2),
+                "megabytes_bitmaps": round(bytes_bitmaps / 1024 ** 2, 2),
+                "megabytes_arrays": round(bytes_arrays / 1024 ** 2, 2),
+                "reconstrucciones": self.reconstrucciones,
+                "segundos_reconstruccion": self.segundos_reconstruccion,
+                "consultas": self.consultas,
+                "aciertos_memo": self.aciertos_memo,
+                "consulta_media_ms": round(self.segundos_consulta / self.consultas * 1000, 3) if self.consultas else 0.0,
+                "errores": self.errores,
+            }
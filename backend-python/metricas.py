@@ -0,0 +1,351 @@
+import json
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import psycopg2.extensions
+from flask import g, request
+
+# -------------------------------
+# Métricas por petición (formato de texto de Prometheus) y logging en JSON
+# -------------------------------
+# - Cada petición registra su latencia total, el tiempo de préstamo de conexión del pool, el
+#   tiempo y las filas de cada consulta (etiquetada con la función SQL, p. ej. filtrar_juegos_func)
+#   y los bytes de la respuesta. GET /metrics lo expone para que Prometheus lo lea.
+# - CursorMedido se pasa como cursor_factory del pool: mide todas las consultas sin tocar las rutas.
+# - La ruta y los acumulados de la petición viajan en ContextVars; fuera de una petición (hilos de
+#   índices, refrescos, barridos) las consultas se etiquetan con ruta="segundo_plano".
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_FILAS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_ruta = ContextVar("ruta_metricas", default="segundo_plano")
+_peticion = ContextVar("peticion_metricas", default=None)   # acumulados de la petición en curso
+
+log = logging.getLogger("backend.metricas")
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres, valores, extra=""):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+_LE_INF = 'le="+Inf"'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(buckets)
+        self._series = {}        # valores de etiquetas -> [conteo por bucket (no acumulado), suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *etiquetas):
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(etiquetas)
+            if serie is None:
+                serie = self._series[etiquetas] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def instantanea(self):
+        with self._lock:
+            return {k: [list(v[0]), v[1], v[2]] for k, v in self._series.items()}
+
+    def exponer(self, series=None):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        series = self.instantanea() if series is None else series
+        for valores, (conteos, suma, total) in sorted(series.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.buckets, conteos):
+                acumulado += conteo
+                le = _etiquetas(self.etiquetas, valores, f'le="{_numero(limite)}"')
+                lineas.append(f"{self.nombre}_bucket{le} {acumulado}")
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, _LE_INF)} {total}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {total}")
+        return lineas
+
+
+class Contador:
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *etiquetas, cantidad=1):
+        with self._lock:
+            self._valores[etiquetas] = self._valores.get(etiquetas, 0) + cantidad
+
+    def instantanea(self):
+        with self._lock:
+            return dict(self._valores)
+
+    def exponer(self, series=None):
+        series = self.instantanea() if series is None else series
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} counter"] + [
+            f"{self.nombre}{_etiquetas(self.etiquetas, k)} {_numero(v)}" for k, v in sorted(series.items())]
+
+
+class Medidor:
+    # Valor leído en el momento del scrape: `funcion` devuelve un número o {etiqueta: número}
+    def __init__(self, nombre, ayuda, funcion, etiqueta=None, tipo="gauge"):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.funcion = funcion
+        self.etiqueta = etiqueta
+        self.tipo = tipo
+
+    def instantanea(self):
+        try:
+            valor = self.funcion()
+        except Exception as e:
+            log.warning("medidor_fallido", extra={"metrica": self.nombre, "error": str(e)})
+            return {}
+        if isinstance(valor, dict):
+            return {(k,): v for k, v in valor.items() if v is not None}
+        return {(): valor} if valor is not None else {}
+
+    def exponer(self, series=None):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        series = self.instantanea() if series is None else series
+        nombres = (self.etiqueta,) if self.etiqueta else ()
+        return lineas + [f"{self.nombre}{_etiquetas(nombres, k)} {_numero(v)}" for k, v in sorted(series.items())]
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._metricas = []
+
+    def _agregar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        return self._agregar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Contador(nombre, ayuda, etiquetas))
+
+    def medidor(self, nombre, ayuda, funcion, etiqueta=None, tipo="gauge"):
+        return self._agregar(Medidor(nombre, ayuda, funcion, etiqueta, tipo))
+
+    def instantanea(self):
+        return {m.nombre: m.instantanea() for m in self._metricas}
+
+    def acumulables(self):
+        # Las que solo crecen: se pueden sumar aunque el proceso que las contó ya no exista
+        return {m.nombre for m in self._metricas if not isinstance(m, Medidor)}
+
+    @staticmethod
+    def sumar(destino, origen):
+        # Suma una instantánea en otra (histogramas cubeta a cubeta)
+        for nombre, series in origen.items():
+            acumulado = destino.setdefault(nombre, {})
+            for clave, valor in series.items():
+                actual = acumulado.get(clave)
+                if actual is None:
+                    acumulado[clave] = [list(valor[0]), valor[1], valor[2]] if isinstance(valor, list) else valor
+                elif isinstance(valor, list):
+                    actual[0] = [a + b for a, b in zip(actual[0], valor[0])]
+                    actual[1] += valor[1]
+                    actual[2] += valor[2]
+                else:
+                    acumulado[clave] = actual + valor
+        return destino
+
+    def exponer(self, otras=()):
+        # `otras`: instantáneas de otros procesos (compartido.MetricasCompartidas) sumadas a las propias
+        instantanea = self.instantanea()
+        for otra in otras:
+            self.sumar(instantanea, otra)
+        lineas = []
+        for metrica in self._metricas:
+            lineas += metrica.exponer(instantanea.get(metrica.nombre, {}))
+        return "\n".join(lineas) + "\n"
+
+
+registro = RegistroMetricas()
+
+peticion_segundos = registro.histograma(
+    "backend_peticion_segundos", "Latencia total de la petición (hasta armar la respuesta)",
+    ("ruta", "metodo", "estado"))
+conexion_segundos = registro.histograma(
+    "backend_conexion_db_segundos", "Tiempo para obtener una conexión del pool (espera + creación)", ("ruta",))
+consulta_segundos = registro.histograma(
+    "backend_consulta_db_segundos", "Tiempo de cada consulta, por función SQL", ("ruta", "funcion"))
+consulta_filas = registro.histograma(
+    "backend_consulta_filas", "Filas devueltas o afectadas por consulta", ("ruta", "funcion"), BUCKETS_FILAS)
+respuesta_bytes = registro.histograma(
+    "backend_respuesta_bytes", "Tamaño del cuerpo de la respuesta (sin las respuestas en streaming)",
+    ("ruta",), BUCKETS_BYTES)
+peticiones_lentas = registro.contador(
+    "backend_peticiones_lentas_total", "Peticiones por encima del umbral de lentitud", ("ruta",))
+
+
+# ---------- consultas ----------
+
+# Funciones de PostgreSQL que no identifican la consulta (SELECT count(*), now(), ...)
+_INTERNAS = {"count", "sum", "min", "max", "avg", "coalesce", "now", "array_agg", "unnest", "exists",
+             "greatest", "least", "lower", "upper", "make_interval", "row_number", "cast", "nullif"}
+# Solo llamadas en posición de SELECT/FROM/JOIN: "INSERT INTO t (" o "AS (" no son funciones
+_LLAMADA = re.compile(r"\b(?:select|from|join)\s+(?:\*\s+from\s+)?([a-z_][a-z0-9_]*)\s*\(", re.IGNORECASE)
+_TABLA = re.compile(r"\b(?:from|into|update|join)\s+([a-z_][a-z0-9_.]*)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def nombre_consulta(sql):
+    # La primera función propia que aparece (filtrar_juegos_func, actualizar_juego, ...); si no
+    # hay, el verbo y la tabla ("select juegos")
+    for nombre in _LLAMADA.findall(sql):
+        if nombre.lower() not in _INTERNAS:
+            return nombre.lower()
+    palabras = sql.split(None, 1)
+    verbo = palabras[0].lower() if palabras else "sql"
+    tabla = _TABLA.search(sql)
+    return f"{verbo} {tabla.group(1).lower()}" if tabla else verbo
+
+
+def _observar_consulta(funcion, segundos, filas):
+    ruta = _ruta.get()
+    consulta_segundos.observar(segundos, ruta, funcion)
+    if filas is not None and filas >= 0:
+        consulta_filas.observar(filas, ruta, funcion)
+    acumulado = _peticion.get()
+    if acumulado is not None:
+        acumulado["db"] += segundos
+        acumulado["consultas"] += 1
+
+
+def observar_conexion(segundos):
+    # Se engancha en PoolConexiones.al_prestar
+    conexion_segundos.observar(segundos, _ruta.get())
+    acumulado = _peticion.get()
+    if acumulado is not None:
+        acumulado["conexion"] += segundos
+
+
+class CursorMedido(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            # Con cursor con nombre solo se mide el DECLARE; las filas llegan después con fetch
+            nombre = nombre_consulta(query) if isinstance(query, str) else "sql"
+            _observar_consulta(nombre, time.perf_counter() - inicio, None if self.name else self.rowcount)
+
+    def executemany(self, query, vars_list):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            nombre = nombre_consulta(query) if isinstance(query, str) else "sql"
+            _observar_consulta(nombre, time.perf_counter() - inicio, self.rowcount)
+
+    def callproc(self, procname, parameters=None):
+        inicio = time.perf_counter()
+        try:
+            return super().callproc(procname, parameters)
+        finally:
+            _observar_consulta(procname, time.perf_counter() - inicio, self.rowcount)
+
+
+# ---------- middleware ----------
+
+def instrumentar(app, umbral_lentas_ms=500):
+    @app.before_request
+    def _iniciar_medicion():
+        g.inicio_metricas = time.perf_counter()
+        # Plantilla de la ruta ("/api/juegos/<int:juego_id>"), no la URL: acota las series
+        _ruta.set(request.url_rule.rule if request.url_rule is not None else "sin_ruta")
+        _peticion.set({"db": 0.0, "conexion": 0.0, "consultas": 0})
+
+    @app.after_request
+    def _registrar_medicion(respuesta):
+        inicio = g.pop("inicio_metricas", None)
+        acumulado = _peticion.get()
+        if inicio is None or acumulado is None:
+            return respuesta
+        duracion = time.perf_counter() - inicio
+        ruta = _ruta.get()
+        peticion_segundos.observar(duracion, ruta, request.method, respuesta.status_code)
+        if not respuesta.is_streamed:
+            respuesta_bytes.observar(respuesta.calculate_content_length() or 0, ruta)
+
+        # Desglose para el navegador (pestaña Timing de las devtools) y para el log de lentas
+        respuesta.headers["Server-Timing"] = (
+            f"conexion;dur={acumulado['conexion'] * 1000:.2f}, "
+            f"db;dur={acumulado['db'] * 1000:.2f};desc=\"{acumulado['consultas']} consultas\", "
+            f"total;dur={duracion * 1000:.2f}")
+        if umbral_lentas_ms and duracion * 1000 >= umbral_lentas_ms:
+            peticiones_lentas.incrementar(ruta)
+            log.warning("peticion_lenta", extra={
+                "ruta": ruta,
+                "url": request.full_path.rstrip("?"),
+                "metodo": request.method,
+                "estado": respuesta.status_code,
+                "duracion_ms": round(duracion * 1000, 2),
+                "conexion_ms": round(acumulado["conexion"] * 1000, 2),
+                "db_ms": round(acumulado["db"] * 1000, 2),
+                "consultas": acumulado["consultas"],
+                # Lo que no es ni pool ni base: serialización, Python, cache...
+                "resto_ms": round((duracion - acumulado["conexion"] - acumulado["db"]) * 1000, 2),
+                "usuario": getattr(g, "usuario_simulado", None),
+            })
+        _peticion.set(None)
+        return respuesta
+
+
+# ---------- logging ----------
+
+_ATRIBUTOS_ESTANDAR = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class FormatoJSON(logging.Formatter):
+    # Una línea JSON por registro; los campos de `extra=` van como claves propias
+    def format(self, record):
+        datos = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "pid": record.process,   # con servidor_prefork.py, el worker que lo registró
+            "mensaje": record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_ESTANDAR and not clave.startswith("_"):
+                datos[clave] = valor
+        if record.exc_info:
+            datos["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+def configurar_logging(nivel="INFO", formato="json"):
+    manejador = logging.StreamHandler()
+    manejador.setFormatter(FormatoJSON() if formato == "json" else
+                           logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    raiz = logging.getLogger()
+    raiz.handlers[:] = [manejador]
+    raiz.setLevel(nivel.upper())
@@ -0,0 +1,67 @@
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+# -------------------------------
+# Planes de ejecución bajo demanda y por muestreo
+# -------------------------------
+# - Pedido explícito (?explain=1 o X-Explain: 1): EXPLAIN ANALYZE y el plan va en la respuesta.
+# - Muestreo 1 de cada N peticiones: EXPLAIN ANALYZE guardado en el buffer circular.
+# - Peticiones más lentas que el umbral: EXPLAIN simple (no vuelve a ejecutar la consulta)
+#   guardado en el buffer circular.
+
+
+class PerfiladorPlanes:
+    def __init__(self, muestreo_n=0, umbral_ms=0, capacidad=100):
+        self.muestreo_n = muestreo_n    # 0 = sin muestreo
+        self.umbral_ms = umbral_ms      # 0 = sin captura de lentas
+        self._buffer = deque(maxlen=capacidad)
+        self._lock = threading.Lock()
+        self.capturados = 0
+
+    def _muestrear(self):
+        return self.muestreo_n > 0 and random.randrange(self.muestreo_n) == 0
+
+    def _guardar(self, ruta, sql, params, duracion_ms, motivo, plan):
+        with self._lock:
+            self.capturados += 1
+            self._buffer.append({
+                "ruta": ruta,
+                "consulta": sql.strip(),
+                "parametros": [str(p) for p in (params or ())],
+                "duracion_ms": round(duracion_ms, 2),
+                "motivo": motivo,
+                "plan": plan,
+                "fecha": datetime.now(timezone.utc).isoformat(),
+            })
+
+    def ejecutar(self, cur, sql, params=None, ruta=None, solicitado=False):
+        # Ejecuta la consulta y devuelve (filas, plan); plan es None salvo pedido explícito
+        muestreado = not solicitado and self._muestrear()
+        plan = None
+        if solicitado or muestreado:
+            cur.execute("EXPLAIN ANALYZE " + sql, params)
+            plan = [row[0] for row in cur.fetchall()]
+
+        inicio = time.perf_counter()
+        cur.execute(sql, params)
+        filas = cur.fetchall()
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+
+        if muestreado:
+            self._guardar(ruta, sql, params, duracion_ms, "muestreo", plan)
+        elif self.umbral_ms and duracion_ms >= self.umbral_ms:
+            cur.execute("EXPLAIN " + sql, params)
+            self._guardar(ruta, sql, params, duracion_ms, "lenta", [row[0] for row in cur.fetchall()])
+
+        return filas, (plan if solicitado else None)
+
+    def planes(self):
+        with self._lock:
+            return list(reversed(self._buffer))
+
+    def limpiar(self):
+        with self._lock:
+            self._buffer.clear()
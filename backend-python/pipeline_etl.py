@@ -0,0 +1,172 @@
+import queue
+import threading
+import time
+
+# -------------------------------
+# Pipeline productor/consumidor por etapas con colas acotadas
+# -------------------------------
+# fuente -> cola -> etapa 1 (N hilos) -> cola -> etapa 2 (M hilos) ...
+# Las colas acotadas dan backpressure: si una etapa se atrasa, la anterior se bloquea en put().
+
+FIN = object()
+
+
+class EstadisticasEtapa:
+    def __init__(self, nombre, hilos):
+        self.nombre = nombre
+        self.hilos = hilos
+        self._lock = threading.Lock()
+        self.items = 0
+        self.segundos_ocupado = 0.0   # tiempo procesando (suma de todos los hilos)
+        self.latencia_max = 0.0
+        self.profundidad_max = 0      # máxima profundidad observada en la cola de entrada
+        self.inicio = None
+        self.fin = None
+
+    def registrar(self, segundos, profundidad):
+        with self._lock:
+            self.items += 1
+            self.segundos_ocupado += segundos
+            self.latencia_max = max(self.latencia_max, segundos)
+            self.profundidad_max = max(self.profundidad_max, profundidad)
+
+    def resumen(self, cola=None):
+        transcurrido = ((self.fin or time.monotonic()) - self.inicio) if self.inicio else 0.0
+        return {
+            "etapa": self.nombre,
+            "hilos": self.hilos,
+            "items": self.items,
+            "items_por_seg": round(self.items / transcurrido, 2) if transcurrido else 0.0,
+            "latencia_media_ms": round(self.segundos_ocupado / self.items * 1000, 2) if self.items else 0.0,
+            "latencia_max_ms": round(self.latencia_max * 1000, 2),
+            "cola_actual": cola.qsize() if cola is not None else 0,
+            "cola_max": self.profundidad_max,
+        }
+
+
+class Etapa:
+    # fabrica() crea un trabajador por hilo con procesar(item) -> salida|None y, opcional, terminar()
+    def __init__(self, nombre, fabrica, hilos=1):
+        self.nombre = nombre
+        self.fabrica = fabrica
+        self.hilos = max(1, hilos)
+
+
+class Pipeline:
+    def __init__(self, fuente, etapas, capacidad=8, nombre_fuente="extraccion"):
+        self.fuente = fuente
+        self.etapas = etapas
+        self.capacidad = capacidad
+        self.nombre_fuente = nombre_fuente
+        self._detener = threading.Event()
+        self._errores = []
+        self._colas = [queue.Queue(maxsize=capacidad) for _ in etapas]
+        self.estadisticas = [EstadisticasEtapa(nombre_fuente, 1)] + [
+            EstadisticasEtapa(e.nombre, e.hilos) for e in etapas
+        ]
+
+    def detener(self):
+        # Deja de producir; lo que ya está en las colas se procesa y se confirma
+        self._detener.set()
+
+    def detenido(self):
+        return self._detener.is_set()
+
+    def _fallo(self, error):
+        self._errores.append(error)
+        self._detener.set()
+
+    def _correr_fuente(self):
+        stats = self.estadisticas[0]
+        stats.inicio = time.monotonic()
+        salida = self._colas[0]
+        try:
+            iterador = iter(self.fuente)
+            while not self._detener.is_set():
+                t0 = time.monotonic()
+                try:
+                    item = next(iterador)
+                except StopIteration:
+                    break
+                stats.registrar(time.monotonic() - t0, 0)
+                salida.put(item)
+            cerrar = getattr(iterador, "close", None)
+            if cerrar:
+                cerrar()
+        except Exception as e:
+            self._fallo(e)
+        finally:
+            stats.fin = time.monotonic()
+            for _ in range(self.etapas[0].hilos):
+                salida.put(FIN)
+
+    def _correr_trabajador(self, indice, pendientes, lock_pendientes):
+        etapa = self.etapas[indice]
+        stats = self.estadisticas[indice + 1]
+        entrada = self._colas[indice]
+        salida = self._colas[indice + 1] if indice + 1 < len(self._colas) else None
+
+        trabajador = None
+        try:
+            trabajador = etapa.fabrica()
+        except Exception as e:
+            self._fallo(e)
+
+        while True:
+            item = entrada.get()
+            if item is FIN:
+                break
+            if trabajador is None or self._errores:
+                continue  # tras un error se vacía la cola para no bloquear a la etapa anterior
+            profundidad = entrada.qsize()
+            t0 = time.monotonic()
+            try:
+                resultado = trabajador.procesar(item)
+            except Exception as e:
+                self._fallo(e)
+                continue
+            stats.registrar(time.monotonic() - t0, profundidad)
+            if resultado is not None and salida is not None:
+                salida.put(resultado)
+
+        try:
+            if trabajador is not None and not self._errores and hasattr(trabajador, "terminar"):
+                resultado = trabajador.terminar()
+                if resultado is not None and salida is not None:
+                    salida.put(resultado)
+        except Exception as e:
+            self._fallo(e)
+        finally:
+            with lock_pendientes:
+                pendientes[0] -= 1
+                ultimo = pendientes[0] == 0
+            if ultimo:
+                stats.fin = time.monotonic()
+                if salida is not None:
+                    for _ in range(self.etapas[indice + 1].hilos):
+                        salida.put(FIN)
+
+    def ejecutar(self):
+        hilos = [threading.Thread(target=self._correr_fuente, name=self.nombre_fuente, daemon=True)]
+        for i, etapa in enumerate(self.etapas):
+            self.estadisticas[i + 1].inicio = time.monotonic()
+            pendientes = [etapa.hilos]
+            lock_pendientes = threading.Lock()
+            for n in range(etapa.hilos):
+                hilos.append(threading.Thread(
+                    target=self._correr_trabajador, args=(i, pendientes, lock_pendientes),
+                    name=f"{etapa.nombre}-{n}", daemon=True,
+                ))
+        for hilo in hilos:
+            hilo.start()
+        # join con timeout para que el hilo principal siga atendiendo señales (SIGINT)
+        for hilo in hilos:
+            while hilo.is_alive():
+                hilo.join(0.2)
+        if self._errores:
+            raise self._errores[0]
+        return self.resumen()
+
+    def resumen(self):
+        colas = [None] + self._colas
+        return [stats.resumen(cola) for stats, cola in zip(self.estadisticas, colas)]
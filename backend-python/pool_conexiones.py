@@ -0,0 +1,206 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolAgotadoError(Exception):
+    pass
+
+
+# -------------------------------
+# Pool de conexiones acotado y thread-safe
+# -------------------------------
+class PoolConexiones:
+    def __init__(self, maxconn=8, timeout=10, max_vida=1800, verificar_tras=30, **parametros):
+        self.maxconn = maxconn
+        self.timeout = timeout                # segundos máximos esperando una conexión libre
+        self.max_vida = max_vida              # recicla conexiones más viejas que esto
+        self.verificar_tras = verificar_tras  # health check si estuvo ociosa más de esto
+        self.parametros = parametros
+        self.al_prestar = None                # callback(segundos) tras cada préstamo (métricas)
+
+        self._cond = threading.Condition()
+        self._libres = []        # [(conn, creada_en, devuelta_en)]
+        self._creada_en = {}     # id(conn) -> timestamp de creación
+        self._app_name = {}      # id(conn) -> último application_name aplicado
+        self._en_uso = 0
+        self._abiertas = 0
+
+        self.creadas = 0
+        self.descartadas = 0
+        self.prestamos = 0
+        self.timeouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+    # ---------- ciclo de vida ----------
+    def _crear(self):
+        conn = psycopg2.connect(**self.parametros)
+        self._creada_en[id(conn)] = time.monotonic()
+        with self._cond:
+            self.creadas += 1
+        return conn
+
+    def _descartar(self, conn):
+        self._creada_en.pop(id(conn), None)
+        self._app_name.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self.descartadas += 1
+            self._abiertas -= 1
+            self._cond.notify()
+
+    def _esta_sana(self, conn, devuelta_en):
+        if conn.closed:
+            return False
+        if time.monotonic() - self._creada_en.get(id(conn), 0) > self.max_vida:
+            return False
+        if time.monotonic() - devuelta_en > self.verificar_tras:
+            try:
+                conn.autocommit = True
+                with conn.cursor(cursor_factory=extensions.cursor) as cur:
+                    cur.execute("SELECT 1;")
+                conn.autocommit = False
+            except Exception:
+                return False
+        return True
+
+    # ---------- préstamo / devolución ----------
+    def obtener(self, application_name=None):
+        inicio = time.monotonic()
+        limite = inicio + self.timeout
+        conn = None
+
+        while conn is None:
+            with self._cond:
+                while not self._libres and self._abiertas >= self.maxconn:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self.timeouts += 1
+                        raise PoolAgotadoError(
+                            f"No hay conexiones libres tras {self.timeout}s (max={self.maxconn})"
+                        )
+                    self._cond.wait(restante)
+
+                if self._libres:
+                    candidata, devuelta_en = self._libres.pop()
+                else:
+                    candidata, devuelta_en = None, None
+                    self._abiertas += 1
+
+            if candidata is None:
+                try:
+                    conn = self._crear()
+                except Exception:
+                    with self._cond:
+                        self._abiertas -= 1
+                        self._cond.notify()
+                    raise
+            elif self._esta_sana(candidata, devuelta_en):
+                conn = candidata
+            else:
+                self._descartar(candidata)
+
+        espera = time.monotonic() - inicio
+        with self._cond:
+            self._en_uso += 1
+            self.prestamos += 1
+            self.espera_total += espera
+            self.espera_max = max(self.espera_max, espera)
+
+        if application_name is not None:
+            try:
+                self._aplicar_app_name(conn, str(application_name))
+            except Exception:
+                self.devolver(conn, descartar=True)
+                raise
+        if self.al_prestar is not None:
+            self.al_prestar(time.monotonic() - inicio)
+        return conn
+
+    def _aplicar_app_name(self, conn, nombre):
+        # Solo cuesta un round trip cuando cambia el usuario respecto al último préstamo
+        if self._app_name.get(id(conn)) == nombre:
+            return
+        conn.autocommit = True
+        # Cursor base: el SET es parte del préstamo, no una consulta de la petición
+        with conn.cursor(cursor_factory=extensions.cursor) as cur:
+            cur.execute("SET application_name = %s;", (nombre,))
+        conn.autocommit = False
+        self._app_name[id(conn)] = nombre
+
+    def devolver(self, conn, descartar=False):
+        with self._cond:
+            self._en_uso -= 1
+
+        if not descartar and not conn.closed:
+            try:
+                estado = conn.get_transaction_status()
+                if estado != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                conn.autocommit = False
+            except Exception:
+                descartar = True
+
+        if descartar or conn.closed:
+            self._descartar(conn)
+            return
+
+        with self._cond:
+            self._libres.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def conexion(self, application_name=None, conn=None):
+        # Confirma al salir sin errores, revierte si hubo excepción y siempre devuelve la conexión.
+        # conn: una ya obtenida con obtener() (p. ej. el enrutador de réplicas, que elige antes)
+        if conn is None:
+            conn = self.obtener(application_name)
+        try:
+            yield conn
+            if not conn.closed and not conn.autocommit:
+                conn.commit()
+        except BaseException:
+            # BaseException: también GeneratorExit, cuando el cliente corta una respuesta en streaming
+            try:
+                if not conn.closed:
+                    conn.rollback()
+            except Exception:
+                pass
+            self.devolver(conn, descartar=conn.closed)
+            raise
+        else:
+            self.devolver(conn)
+
+    def cerrar(self):
+        with self._cond:
+            libres, self._libres = self._libres, []
+        for conn, _ in libres:
+            self._descartar(conn)
+
+    # ---------- métricas ----------
+    @property
+    def en_uso(self):
+        with self._cond:
+            return self._en_uso
+
+    def metricas(self):
+        with self._cond:
+            return {
+                "max": self.maxconn,
+                "abiertas": self._abiertas,
+                "en_uso": self._en_uso,
+                "libres": len(self._libres),
+                "creadas": self.creadas,
+                "descartadas": self.descartadas,
+                "prestamos": self.prestamos,
+                "timeouts": self.timeouts,
+                "espera_promedio_ms": round(self.espera_total / self.prestamos * 1000, 3) if self.prestamos else 0.0,
+                "espera_max_ms": round(self.espera_max * 1000, 3),
+            }
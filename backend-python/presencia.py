@@ -0,0 +1,150 @@
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# -------------------------------
+# Presencia de usuarios en memoria (pings y usuarios activos)
+# -------------------------------
+# - Un ping solo escribe en dos dicts (operaciones atómicas con el GIL): sin lock, sin base de datos.
+# - Los usuarios se agrupan en cubetas de `ancho_cubeta` segundos: "activos en los últimos N s"
+#   recorre solo las cubetas de la ventana y expirar es descartar cubetas viejas.
+# - Un hilo vuelca cada `intervalo` segundos los pings acumulados: un UPDATE por lote en PostgreSQL
+#   (cada usuario una sola vez, aunque haya hecho muchos pings) y, con `archivo`, un SQLite local
+#   compartido por todos los procesos del backend para que cada uno vea los pings de los demás.
+
+
+class RastreadorPresencia:
+    def __init__(self, pool=None, intervalo=5, retencion=300, ancho_cubeta=5, archivo=None):
+        self.pool = pool                  # None: no escribe en PostgreSQL (solo memoria / SQLite)
+        self.intervalo = intervalo
+        self.retencion = retencion        # ventana máxima que se puede consultar en memoria
+        self.ancho_cubeta = ancho_cubeta
+        self.archivo = archivo            # SQLite compartido entre procesos; None = solo este proceso
+
+        self._ultimo = {}                 # usuario -> último ping (epoch)
+        self._cubetas = {}                # int(t // ancho) -> {usuarios}; puede haber entradas viejas
+        self._sucios = {}                 # usuario -> último ping aún no volcado
+        self._sqlite = None
+        self._detener = threading.Event()
+        self._hilo = None
+
+        self.pings = 0
+        self.volcados = 0
+        self.filas_volcadas = 0
+        self.errores = 0
+        self.ultimo_volcado_ms = None
+
+    # ---- ping y consulta (rutas calientes, sin lock) ----
+
+    def ping(self, usuario_id, ahora=None):
+        ahora = time.time() if ahora is None else ahora
+        self._registrar(usuario_id, ahora)
+        self._sucios[usuario_id] = ahora
+        self.pings += 1
+
+    def _registrar(self, usuario_id, visto):
+        if self._ultimo.get(usuario_id, 0) >= visto:
+            return
+        self._ultimo[usuario_id] = visto
+        # setdefault + add son atómicos; la entrada en la cubeta anterior se ignora al leer
+        self._cubetas.setdefault(int(visto // self.ancho_cubeta), set()).add(usuario_id)
+
+    def activos(self, ventana, ahora=None):
+        ahora = time.time() if ahora is None else ahora
+        desde = ahora - ventana
+        activos = set()
+        for clave in range(int(desde // self.ancho_cubeta), int(ahora // self.ancho_cubeta) + 1):
+            for usuario_id in tuple(self._cubetas.get(clave, ())):
+                if self._ultimo.get(usuario_id, 0) > desde:
+                    activos.add(usuario_id)
+        return sorted(activos)
+
+    # ---- volcado periódico ----
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, name="presencia", daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=self.intervalo + 5)
+        # Lo pendiente se vuelca antes de salir para no perder el último intervalo
+        self.volcar()
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            self.volcar()
+
+    def volcar(self, ahora=None):
+        ahora = time.time() if ahora is None else ahora
+        inicio = time.perf_counter()
+        # pop uno a uno: un ping que llega mientras tanto vuelve a marcarse y sale en el próximo volcado
+        sucios = {}
+        for usuario_id in list(self._sucios):
+            sucios[usuario_id] = self._sucios.pop(usuario_id)
+        try:
+            if self.archivo:
+                self._sincronizar_sqlite(sucios, ahora)
+            if sucios and self.pool is not None:
+                with self.pool.conexion(application_name="presencia") as conn, conn.cursor() as cur:
+                    # actualizar_ping marca now(): el ultimo_ping guardado se atrasa como mucho `intervalo`
+                    cur.execute("SELECT actualizar_ping(u) FROM unnest(%s::int[]) AS u;", (sorted(sucios),))
+                self.filas_volcadas += len(sucios)
+            self.volcados += 1
+        except Exception:
+            # Se reintentan en el próximo volcado salvo que ya haya un ping más nuevo
+            for usuario_id, visto in sucios.items():
+                if self._sucios.get(usuario_id, 0) < visto:
+                    self._sucios[usuario_id] = visto
+            self.errores += 1
+            log.exception("Error al volcar la presencia")
+        self._expirar(ahora)
+        self.ultimo_volcado_ms = round((time.perf_counter() - inicio) * 1000, 2)
+
+    def _sincronizar_sqlite(self, sucios, ahora):
+        if self._sqlite is None:
+            self._sqlite = sqlite3.connect(self.archivo, timeout=5)
+            self._sqlite.execute("PRAGMA journal_mode=WAL;")
+            self._sqlite.execute("""
+                CREATE TABLE IF NOT EXISTS presencia (usuario_id INTEGER PRIMARY KEY, visto REAL NOT NULL);
+            """)
+        with self._sqlite:
+            self._sqlite.executemany("""
+                INSERT INTO presencia (usuario_id, visto) VALUES (?, ?)
+                ON CONFLICT (usuario_id) DO UPDATE SET visto = max(visto, excluded.visto);
+            """, list(sucios.items()))
+            self._sqlite.execute("DELETE FROM presencia WHERE visto < ?;", (ahora - self.retencion,))
+        # Pings de los otros procesos (los propios ya están en memoria)
+        for usuario_id, visto in self._sqlite.execute(
+                "SELECT usuario_id, visto FROM presencia WHERE visto >= ?;", (ahora - self.retencion,)):
+            self._registrar(usuario_id, visto)
+
+    def _expirar(self, ahora):
+        limite = int((ahora - self.retencion) // self.ancho_cubeta)
+        for clave in [c for c in list(self._cubetas) if c < limite]:
+            for usuario_id in self._cubetas.pop(clave, ()):
+                # Solo si su último ping sigue siendo de esa cubeta (no volvió a hacer ping)
+                if self._ultimo.get(usuario_id, math.inf) < (clave + 1) * self.ancho_cubeta:
+                    self._ultimo.pop(usuario_id, None)
+
+    def metricas(self):
+        return {
+            "usuarios_en_memoria": len(self._ultimo),
+            "cubetas": len(self._cubetas),
+            "pendientes": len(self._sucios),
+            "pings": self.pings,
+            "volcados": self.volcados,
+            "filas_volcadas": self.filas_volcadas,
+            "errores": self.errores,
+            "ultimo_volcado_ms": self.ultimo_volcado_ms,
+            "intervalo": self.intervalo,
+            "retencion": self.retencion,
+            "archivo": os.path.abspath(self.archivo) if self.archivo else None,
+        }
@@ -0,0 +1,225 @@
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RAWG_BASE_URL = "https://api.rawg.io/api"
+PAGE_SIZE = 40  # máximo permitido por RAWG
+
+
+# -------------------------------
+# Limitador de tasa (token bucket)
+# -------------------------------
+class LimitadorTokens:
+    def __init__(self, tasa, capacidad=None):
+        self.tasa = float(tasa)                       # tokens por segundo
+        self.capacidad = float(capacidad or max(1.0, tasa))
+        self._tokens = self.capacidad
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        if self.tasa <= 0:
+            return
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.tasa
+            time.sleep(espera)
+
+
+# -------------------------------
+# Cliente HTTP con keep-alive, reintentos y backoff
+# -------------------------------
+class ClienteRAWG:
+    def __init__(self, api_key, base_url=RAWG_BASE_URL, concurrencia=8, tasa=5,
+                 reintentos=5, backoff=0.5, timeout=30, cache=None):
+        self.api_key = api_key
+        self.cache = cache        # CacheRespuestasRAWG opcional
+        self.solo_cache = False   # modo replay: nunca sale a la red
+        self.base_url = base_url.rstrip("/")
+        self.reintentos = reintentos
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limitador = LimitadorTokens(tasa)
+
+        # Una sola sesión compartida: reutiliza conexiones TCP/TLS entre peticiones
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=concurrencia)
+        self.session.mount("http://", adaptador)
+        self.session.mount("https://", adaptador)
+
+        self._lock = threading.Lock()
+        self.peticiones = 0
+        self.reintentos_hechos = 0
+
+    def _espera_reintento(self, intento, response=None):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff * (2 ** intento) + random.uniform(0, self.backoff)
+
+    def modo_replay(self):
+        # Responde solo desde la cache (sin TTL) y sin limitar la tasa
+        if self.cache is None:
+            raise ValueError("El modo replay necesita una cache de respuestas")
+        self.solo_cache = True
+        self.limitador = LimitadorTokens(0)
+
+    def get_json(self, url, params=None):
+        params = dict(params or {})
+        if self.cache is not None:
+            data = self.cache.obtener(url, params, ignorar_ttl=self.solo_cache)
+            if data is not None or self.solo_cache:
+                return data
+        data = self._descargar(url, params)
+        if data is not None and self.cache is not None:
+            self.cache.guardar(url, params, data)
+        return data
+
+    def _descargar(self, url, params):
+        if self.api_key:
+            params["key"] = self.api_key
+
+        for intento in range(self.reintentos + 1):
+            self.limitador.adquirir()
+            with self._lock:
+                self.peticiones += 1
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                if intento == self.reintentos:
+                    print(f"Error de red en {url}: {e}")
+                    return None
+                response = None
+            else:
+                if response.status_code == 200:
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        print(f"Error al parsear JSON de {url}: {e}")
+                        return None
+                if response.status_code != 429 and response.status_code < 500:
+                    print(f"Error al obtener {url}: {response.status_code} - {response.text[:200]}")
+                    return None
+                if intento == self.reintentos:
+                    print(f"Error al obtener {url} tras {self.reintentos} reintentos: {response.status_code}")
+                    return None
+
+            with self._lock:
+                self.reintentos_hechos += 1
+            time.sleep(self._espera_reintento(intento, response))
+        return None
+
+    def obtener_pagina(self, pagina, page_size=PAGE_SIZE, **filtros):
+        params = {"page": pagina, "page_size": page_size}
+        params.update(filtros)
+        return self.get_json(f"{self.base_url}/games", params)
+
+    def obtener_detalles(self, juego_id):
+        return self.get_json(f"{self.base_url}/games/{juego_id}")
+
+    def cerrar(self):
+        self.session.close()
+
+
+# -------------------------------
+# Extracción concurrente: páginas adelantadas + detalles en paralelo
+# -------------------------------
+class ExtractorConcurrente:
+    def __init__(self, cliente, concurrencia=8, paginas_adelantadas=4, con_detalles=True):
+        self.cliente = cliente
+        self.concurrencia = concurrencia
+        self.paginas_adelantadas = max(1, paginas_adelantadas)
+        self.con_detalles = con_detalles
+
+        self.paginas = 0
+        self.juegos = 0
+        self.detalles_fallidos = 0
+        self._inicio = None
+
+    def _armar_detalles(self, executor, item):
+        data = item["pagina"].result()
+        juegos = (data or {}).get("results", [])
+        if self.con_detalles:
+            item["detalles"] = [executor.submit(self.cliente.obtener_detalles, j["id"]) for j in juegos]
+        else:
+            item["detalles"] = []
+
+    def iterar(self, pagina_inicial=1, pagina_final=None, **filtros):
+        # Genera (numero_pagina, data) en orden; cada juego trae "developers" de su detalle
+        self._inicio = time.monotonic()
+        ultima = pagina_final
+        siguiente = pagina_inicial
+        pendientes = deque()
+
+        with ThreadPoolExecutor(max_workers=self.concurrencia) as executor:
+            while True:
+                # Hasta conocer el total solo se pide una página a la vez
+                ventana = self.paginas_adelantadas if ultima is not None else 1
+                while len(pendientes) < ventana and (ultima is None or siguiente <= ultima):
+                    fut = executor.submit(self.cliente.obtener_pagina, siguiente, PAGE_SIZE, **filtros)
+                    pendientes.append({"numero": siguiente, "pagina": fut, "detalles": None})
+                    siguiente += 1
+                if not pendientes:
+                    break
+
+                item = pendientes[0]
+                data = item["pagina"].result()
+                if data is None or not data.get("results"):
+                    for resto in pendientes:
+                        resto["pagina"].cancel()
+                    break
+
+                if ultima is None:
+                    total = data.get("count")
+                    ultima_api = math.ceil(total / PAGE_SIZE) if total else None
+                    if ultima_api is not None:
+                        ultima = ultima_api if pagina_final is None else min(pagina_final, ultima_api)
+                    elif not data.get("next"):
+                        ultima = item["numero"]
+
+                # Dispara los detalles de toda página ya descargada, no solo de la actual
+                for otro in pendientes:
+                    if otro["detalles"] is None and otro["pagina"].done():
+                        self._armar_detalles(executor, otro)
+
+                wait(item["detalles"])
+                for juego, fut in zip(data["results"], item["detalles"]):
+                    detalles = fut.result()
+                    if detalles is None:
+                        self.detalles_fallidos += 1
+                    else:
+                        juego["developers"] = detalles.get("developers", [])
+
+                pendientes.popleft()
+                self.paginas += 1
+                self.juegos += len(data["results"])
+                yield item["numero"], data
+
+                if not data.get("next") and ultima is None:
+                    break
+
+    def estadisticas(self):
+        transcurrido = time.monotonic() - self._inicio if self._inicio else 0.0
+        return {
+            "paginas": self.paginas,
+            "juegos": self.juegos,
+            "peticiones": self.cliente.peticiones,
+            "reintentos": self.cliente.reintentos_hechos,
+            "detalles_fallidos": self.detalles_fallidos,
+            "segundos": round(transcurrido, 2),
+            "paginas_por_seg": round(self.paginas / transcurrido, 2) if transcurrido else 0.0,
+            "juegos_por_seg": round(self.juegos / transcurrido, 2) if transcurrido else 0.0,
+        }
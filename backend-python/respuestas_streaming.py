@@ -0,0 +1,75 @@
+import zlib
+
+from flask import Response, stream_with_context
+
+from serializacion import Filas
+
+# -------------------------------
+# Respuestas en streaming para listados grandes
+# -------------------------------
+# La consulta se lee con un cursor con nombre (del lado del servidor): PostgreSQL entrega `lote`
+# filas por FETCH y cada lote se serializa y se envía antes de pedir el siguiente, así la memoria
+# del backend no crece con el tamaño del catálogo y el cliente recibe las primeras filas enseguida.
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def lotes_de_consulta(conexion, sql, params=None, lote=2000, nombre="listado_streaming"):
+    # `conexion` es un context manager del pool (get_conn()); la conexión queda prestada mientras dura el envío
+    with conexion as conn, conn.cursor(name=nombre) as cur:
+        cur.itersize = lote
+        cur.execute(sql, params)
+        while True:
+            filas = cur.fetchmany(lote)
+            if not filas:
+                break
+            yield filas
+
+
+# Cada lote se codifica con serializacion.py, igual que las respuestas normales (fechas ISO,
+# Decimal como texto) y sin un dict por fila
+
+
+def como_ndjson(lotes, campos):
+    for filas in lotes:
+        yield Filas(campos, filas).lineas()
+
+
+def como_json(lotes, campos):
+    # Un arreglo JSON normal, enviado por partes (Transfer-Encoding: chunked); cada lote se
+    # codifica de una vez y se le quitan los corchetes
+    yield b"["
+    separador = b""
+    for filas in lotes:
+        yield separador + Filas(campos, filas).codificar()[1:-1]
+        separador = b","
+    yield b"]"
+
+
+def comprimir_gzip(trozos, nivel=6):
+    # Z_SYNC_FLUSH tras cada lote: el cliente puede descomprimir lo recibido sin esperar al final
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    for trozo in trozos:
+        datos = compresor.compress(trozo) + compresor.flush(zlib.Z_SYNC_FLUSH)
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+def acepta_gzip(request):
+    # Respeta q=0 ("gzip;q=0" lo rechaza), igual que Compresor.elegir
+    return request.accept_encodings["gzip"] > 0
+
+
+def respuesta_streaming(lotes, campos, formato="ndjson", gzip=False):
+    serializar = como_ndjson if formato == "ndjson" else como_json
+    trozos = serializar(lotes, campos)
+    headers = {"X-Accel-Buffering": "no", "Vary": "Accept-Encoding"}
+    if gzip:
+        trozos = comprimir_gzip(trozos)
+        headers["Content-Encoding"] = "gzip"
+    # stream_with_context: el generador corre después de salir de la vista y usa g (usuario simulado)
+    return Response(stream_with_context(trozos), mimetype=FORMATOS[formato], headers=headers)
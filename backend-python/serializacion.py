@@ -0,0 +1,147 @@
+import json
+import os
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import lru_cache
+from json.encoder import encode_basestring
+
+# -------------------------------
+# Serialización JSON de las respuestas
+# -------------------------------
+# Un solo formato para app.py, app_async.py y los listados en streaming:
+# - Fechas y horas en ISO 8601 ("2015-07-09", "2024-01-31T10:00:00+00:00"); Decimal y UUID como
+#   texto (el rating sigue llegando como "4.50", sin perder decimales).
+# - Filas(columnas, filas) codifica las filas de un cursor directamente a partir de los nombres de
+#   columna. Con columnar=True sale {"columns": [...], "rows": [[...], ...]}: los nombres de columna
+#   van una sola vez y la respuesta es bastante más chica.
+# - Con orjson instalado (opcional) se usa orjson; si no, la biblioteca estándar. JSON_RAPIDO=0
+#   fuerza la biblioteca estándar.
+# Ver benchmarks/bench_serializacion.py.
+
+JSON_RAPIDO = os.getenv("JSON_RAPIDO", "1") != "0"
+
+
+def _cargar_orjson():
+    if not JSON_RAPIDO:
+        return None
+    try:
+        import orjson  # dependencia opcional
+    except ImportError:
+        return None
+    return orjson
+
+
+orjson = _cargar_orjson()
+MOTOR = "orjson" if orjson is not None else "json"
+
+
+class Filas:
+    # Filas de un cursor (tuplas o registros de asyncpg) y los nombres de sus columnas
+    __slots__ = ("columnas", "filas", "columnar")
+
+    def __init__(self, columnas, filas, columnar=False):
+        self.columnas = tuple(columnas)
+        self.filas = filas
+        self.columnar = columnar
+
+    def objetos(self):
+        # Respaldo para cuando unas Filas quedan anidadas dentro de otra estructura
+        return [dict(zip(self.columnas, fila)) for fila in self.filas]
+
+    def codificar(self):
+        if self.columnar:
+            return _codificar_columnar(self.columnas, self.filas)
+        return _codificar_objetos(self.columnas, self.filas)
+
+    def lineas(self):
+        # NDJSON: un objeto por línea, cada línea terminada en "\n"
+        if orjson is not None:
+            dumps, opciones = orjson.dumps, _OPCIONES_ORJSON
+            return b"".join([dumps(o, default=por_defecto, option=opciones) + b"\n" for o in self.objetos()])
+        plantilla = _plantilla(self.columnas)
+        return "".join([plantilla % tuple([_valor(v) for v in fila]) + "\n" for fila in self.filas]).encode()
+
+
+def por_defecto(valor):
+    # datetime es subclase de date: las dos quedan en ISO 8601
+    if isinstance(valor, (date, time)):
+        return valor.isoformat()
+    if isinstance(valor, (Decimal, uuid.UUID)):
+        return str(valor)
+    if isinstance(valor, Filas):
+        return valor.objetos()
+    raise TypeError(f"{type(valor).__name__} no es serializable a JSON")
+
+
+# ---------- biblioteca estándar ----------
+
+# Un solo codificador reutilizado: json.dumps con argumentos crea uno nuevo en cada llamada
+_codificador = json.JSONEncoder(default=por_defecto, ensure_ascii=False, separators=(",", ":"))
+
+
+def _texto(valor):
+    return f'"{valor}"'
+
+
+def _iso(valor):
+    return f'"{valor.isoformat()}"'
+
+
+# Codificación de un valor según su tipo exacto; lo que no está aquí pasa por el codificador
+_VALORES = {
+    int: int.__repr__,
+    str: encode_basestring,
+    type(None): lambda valor: "null",
+    bool: lambda valor: "true" if valor else "false",
+    date: _iso,
+    datetime: _iso,
+    Decimal: _texto,
+    uuid.UUID: _texto,
+}
+
+
+def _valor(valor):
+    codificar = _VALORES.get(type(valor))
+    return codificar(valor) if codificar is not None else _codificador.encode(valor)
+
+
+@lru_cache(maxsize=256)
+def _plantilla(columnas):
+    # '{"id":%s,"nombre":%s}': cada fila se arma con un solo formateo, sin dict intermedio
+    return "{" + ",".join(encode_basestring(c).replace("%", "%%") + ":%s" for c in columnas) + "}"
+
+
+# ---------- orjson ----------
+
+# orjson ya escribe date/datetime/UUID igual que isoformat()/str(); OPT_NON_STR_KEYS acepta claves
+# enteras como la biblioteca estándar ({"1": ...})
+_OPCIONES_ORJSON = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def _codificar_objetos(columnas, filas):
+    if orjson is not None:
+        # orjson no tiene un modo "tupla + nombres": los dict los consume en C sin otra copia
+        return orjson.dumps([dict(zip(columnas, fila)) for fila in filas],
+                            default=por_defecto, option=_OPCIONES_ORJSON)
+    plantilla = _plantilla(columnas)
+    return ("[" + ",".join([plantilla % tuple([_valor(v) for v in fila]) for fila in filas]) + "]").encode()
+
+
+def _codificar_columnar(columnas, filas):
+    # Las tuplas se codifican como arreglos: una sola llamada para todo el listado
+    filas = [fila if isinstance(fila, tuple) else tuple(fila) for fila in filas]
+    return codificar({"columns": list(columnas), "rows": filas})
+
+
+def codificar(objeto):
+    # Bytes UTF-8. Un dict con Filas entre sus valores (p. ej. {"juegos": Filas(...), "total": n})
+    # se arma por partes para que las filas usen su propio camino
+    if isinstance(objeto, Filas):
+        return objeto.codificar()
+    if isinstance(objeto, dict) and any(isinstance(v, Filas) for v in objeto.values()):
+        partes = [codificar(str(clave)) + b":" + codificar(valor) for clave, valor in objeto.items()]
+        return b"{" + b",".join(partes) + b"}"
+    if orjson is not None:
+        return orjson.dumps(objeto, default=por_defecto, option=_OPCIONES_ORJSON)
+    return _codificador.encode(objeto).encode()
@@ -0,0 +1,289 @@
+import argparse
+import logging
+import os
+import random
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+# -------------------------------
+# Despliegue multiproceso: workers pre-forkeados sobre un socket compartido (solo POSIX)
+# -------------------------------
+# El maestro abre el socket y crea N workers con fork; cada uno importa app.py (pool, índices e
+# hilos propios) y lo sirve con Waitress sobre ese mismo socket, así la serialización JSON y el
+# armado de las filas se reparten entre núcleos en lugar de competir por un solo GIL.
+# - Reciclado: un worker que atendió --max-peticiones (+ un azar de hasta --max-peticiones-azar,
+#   para que no se reciclen todos a la vez) deja de aceptar, termina lo pendiente y sale; el
+#   maestro lo reemplaza.
+# - SIGHUP: recarga ordenada. Arranca una generación nueva con el código actual del disco (el
+#   maestro nunca importa app.py) y, cuando está lista, cierra de forma ordenada la anterior.
+# - SIGTERM / SIGINT: cierre ordenado de todos los workers (a lo sumo --gracia segundos).
+# - El estado compartido (cache, conteos, presencia, /metrics) va en ESTADO_COMPARTIDO_DIR; si no
+#   se define, el maestro crea un directorio temporal y lo borra al salir. Ver compartido.py.
+# Cada worker abre hasta DB_POOL_MAX conexiones: el total es --workers × DB_POOL_MAX.
+# Uso: python servidor_prefork.py --workers 4 --puerto 5000
+
+log = logging.getLogger("prefork")
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+# ---------- worker ----------
+
+class ContarPeticiones:
+    # Envoltura WSGI: al llegar al límite pide el cierre ordenado del worker
+    def __init__(self, app, limite, al_llegar):
+        self.app = app
+        self.limite = limite
+        self.al_llegar = al_llegar
+        self.atendidas = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.atendidas += 1
+            llego = self.atendidas == self.limite
+        if llego:
+            self.al_llegar()
+        return self.app(environ, start_response)
+
+
+def clases_waitress(cerrando):
+    # Mientras el worker se cierra, cada respuesta sale con "Connection: close": el cliente abre
+    # otra conexión (que atiende otro worker) en lugar de reusar una que está por cerrarse
+    from waitress.channel import HTTPChannel
+    from waitress.task import WSGITask
+
+    class TareaWorker(WSGITask):
+        def build_response_header(self):
+            if cerrando.is_set():
+                self.request.headers["CONNECTION"] = "close"
+            return super().build_response_header()
+
+    class CanalWorker(HTTPChannel):
+        task_class = TareaWorker
+
+    return CanalWorker
+
+
+def drenar(servidor, gracia, ociosa_seg=1.0):
+    # Sin aceptar conexiones nuevas: atiende lo que ya había entrado y cierra las conexiones
+    # keep-alive ociosas; las activas se cierran solas tras su próxima respuesta
+    from waitress import wasyncore
+    from waitress.channel import HTTPChannel
+
+    mapa = servidor._map
+    servidor.del_channel()   # el socket sigue abierto en el maestro y en los demás workers
+    limite = time.monotonic() + gracia
+    while time.monotonic() < limite:
+        canales = [c for c in list(mapa.values()) if isinstance(c, HTTPChannel)]
+        if not canales:
+            break
+        for canal in canales:
+            if not canal.requests and not canal.total_outbufs_len and time.time() - canal.last_activity > ociosa_seg:
+                canal.handle_close()
+        wasyncore.loop(timeout=0.05, map=mapa, use_poll=servidor.adj.asyncore_use_poll, count=1)
+    servidor.task_dispatcher.shutdown(timeout=max(0.0, limite - time.monotonic()))
+
+
+def ejecutar_worker(sock, args, listo_fd):
+    cerrando = threading.Event()
+    servidor = None
+
+    def pedir_cierre(*_):
+        cerrando.set()
+        if servidor is not None:
+            servidor.accepting = False   # el event loop deja de llamar a accept()
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)    # Ctrl+C lo maneja el maestro
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, pedir_cierre)
+
+    # Los módulos del proyecto que cargó el maestro (metricas) se vuelven a leer del disco: una
+    # recarga con SIGHUP toma el código nuevo
+    for nombre, modulo in list(sys.modules.items()):
+        if os.path.dirname(getattr(modulo, "__file__", None) or "") == DIRECTORIO:
+            del sys.modules[nombre]
+    import app
+    from waitress import wasyncore
+    from waitress.server import create_server
+
+    limite = args.max_peticiones + random.randint(0, args.max_peticiones_azar) if args.max_peticiones else 0
+    aplicacion = ContarPeticiones(app.app, limite, pedir_cierre)
+    servidor = create_server(aplicacion, sockets=[sock], threads=app.WAITRESS_THREADS, backlog=args.backlog)
+    servidor.channel_class = clases_waitress(cerrando)
+    os.write(listo_fd, f"{os.getpid()}\n".encode())
+    os.close(listo_fd)
+
+    while not cerrando.is_set():
+        wasyncore.loop(timeout=servidor.adj.asyncore_loop_timeout, map=servidor._map,
+                       use_poll=servidor.adj.asyncore_use_poll, count=1)
+    log.info("worker_saliendo", extra={"atendidas": aplicacion.atendidas})
+    drenar(servidor, args.gracia)
+    # El worker sale con os._exit (sin atexit): el último volcado de métricas va aquí
+    if app.metricas_compartidas is not None:
+        app.metricas_compartidas.volcar()
+
+
+# ---------- maestro ----------
+
+class Maestro:
+    def __init__(self, sock, args):
+        self.sock = sock
+        self.args = args
+        self.workers = {}          # pid -> (generación, lanzado_en)
+        self.listos = set()
+        self.generacion = 0
+        self.recargando_desde = None
+        self.senales = []
+        self.fallos_seguidos = 0
+        self._listo_r, self._listo_w = os.pipe()
+        os.set_blocking(self._listo_r, False)
+
+    def lanzar(self):
+        pid = os.fork()
+        if pid == 0:
+            codigo = 0
+            try:
+                os.close(self._listo_r)
+                ejecutar_worker(self.sock, self.args, self._listo_w)
+            except BaseException:
+                log.exception("worker_fallido")
+                codigo = 1
+            finally:
+                logging.shutdown()
+                os._exit(codigo)
+        self.workers[pid] = (self.generacion, time.monotonic())
+        log.info("worker_lanzado", extra={"worker": pid, "generacion": self.generacion})
+
+    def senal(self, numero, _frame):
+        self.senales.append(numero)
+
+    def ejecutar(self):
+        for numero in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(numero, self.senal)
+        while True:
+            while self.senales:
+                numero = self.senales.pop(0)
+                if numero == signal.SIGHUP:
+                    self.recargar()
+                else:
+                    return self.apagar()
+            self.leer_listos()
+            self.recoger()
+            self.completar()
+            self.terminar_recarga()
+            time.sleep(0.2)
+
+    def actuales(self):
+        return [pid for pid, (generacion, _) in self.workers.items() if generacion == self.generacion]
+
+    def leer_listos(self):
+        try:
+            datos = os.read(self._listo_r, 65536)
+        except BlockingIOError:
+            return
+        self.listos.update(int(linea) for linea in datos.split())
+
+    def recoger(self):
+        while self.workers:
+            pid, estado = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            generacion, lanzado_en = self.workers.pop(pid, (None, 0))
+            self.listos.discard(pid)
+            codigo = os.waitstatus_to_exitcode(estado)
+            # Un worker que muere al arrancar (p. ej. error en app.py) no se relanza en bucle
+            if codigo != 0 and time.monotonic() - lanzado_en < 10:
+                self.fallos_seguidos += 1
+            else:
+                self.fallos_seguidos = 0
+            log.info("worker_terminado", extra={"worker": pid, "generacion": generacion, "codigo": codigo})
+
+    def completar(self):
+        if self.fallos_seguidos and len(self.actuales()) < self.args.workers:
+            time.sleep(min(30, 2 ** self.fallos_seguidos))
+        while len(self.actuales()) < self.args.workers:
+            self.lanzar()
+
+    def recargar(self):
+        log.info("recarga", extra={"generacion": self.generacion + 1})
+        self.generacion += 1
+        self.recargando_desde = time.monotonic()
+
+    def terminar_recarga(self):
+        # La generación anterior se cierra cuando la nueva ya acepta conexiones (o tras 120 s)
+        if self.recargando_desde is None:
+            return
+        nuevos_listos = all(pid in self.listos for pid in self.actuales())
+        if nuevos_listos or time.monotonic() - self.recargando_desde > 120:
+            for pid, (generacion, _) in list(self.workers.items()):
+                if generacion != self.generacion:
+                    self.enviar(pid, signal.SIGTERM)
+            self.recargando_desde = None
+
+    def enviar(self, pid, numero):
+        try:
+            os.kill(pid, numero)
+        except ProcessLookupError:
+            pass
+
+    def apagar(self):
+        log.info("apagando", extra={"workers": len(self.workers)})
+        for pid in self.workers:
+            self.enviar(pid, signal.SIGTERM)
+        limite = time.monotonic() + self.args.gracia + 5
+        while self.workers and time.monotonic() < limite:
+            self.recoger()
+            time.sleep(0.1)
+        for pid in self.workers:
+            self.enviar(pid, signal.SIGKILL)
+        return 0
+
+
+def abrir_socket(host, puerto, backlog):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, puerto))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backend con varios procesos Waitress sobre un socket compartido")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--puerto", type=int, default=int(os.getenv("PUERTO", 5000)))
+    parser.add_argument("--backlog", type=int, default=1024)
+    parser.add_argument("--max-peticiones", type=int, default=int(os.getenv("WORKER_MAX_PETICIONES", 0)),
+                        help="reciclar cada worker tras N peticiones (0 = nunca)")
+    parser.add_argument("--max-peticiones-azar", type=int,
+                        default=int(os.getenv("WORKER_MAX_PETICIONES_AZAR", 0)))
+    parser.add_argument("--gracia", type=float, default=float(os.getenv("WORKER_GRACIA_SEG", 30)),
+                        help="segundos para terminar lo pendiente al reciclar, recargar o apagar")
+    args = parser.parse_args()
+
+    import metricas
+    metricas.configurar_logging(os.getenv("LOG_NIVEL", "INFO"), os.getenv("LOG_FORMATO", "json"))
+
+    if not hasattr(os, "fork"):
+        sys.exit("servidor_prefork.py necesita fork (Linux/macOS); en Windows usa `python app.py`")
+
+    temporal = None
+    if not os.getenv("ESTADO_COMPARTIDO_DIR"):
+        temporal = tempfile.mkdtemp(prefix="backend_compartido_")
+        os.environ["ESTADO_COMPARTIDO_DIR"] = temporal
+    sock = abrir_socket(args.host, args.puerto, args.backlog)
+    log.info("maestro_iniciado", extra={"workers": args.workers, "puerto": args.puerto,
+                                        "estado_compartido": os.environ["ESTADO_COMPARTIDO_DIR"]})
+    try:
+        codigo = Maestro(sock, args).ejecutar()
+    finally:
+        sock.close()
+        if temporal:
+            shutil.rmtree(temporal, ignore_errors=True)
+    sys.exit(codigo)
@@ -0,0 +1,51 @@
+-- -------------------------------
+-- Paginación por cursor (keyset) para /api/juegos y /api/juegos/filtrar
+-- -------------------------------
+-- En vez de OFFSET se busca a partir de la última fila vista: (rating, id) o (nombre, id).
+-- El costo por página es constante aunque el usuario navegue muy lejos en el catálogo.
+
+CREATE INDEX IF NOT EXISTS idx_juegos_rating_id ON juegos ((COALESCE(rating, -1)), id);
+CREATE INDEX IF NOT EXISTS idx_juegos_nombre_id ON juegos (nombre, id);
+
+-- p_orden: 'rating' (rating desc, id desc) o 'nombre' (nombre asc, id asc)
+-- p_valor / p_id: clave de la última fila de la página anterior (NULL en la primera página)
+CREATE OR REPLACE FUNCTION listar_juegos_cursor(
+    p_orden text,
+    p_genero text,
+    p_plataforma text,
+    p_valor text,
+    p_id integer,
+    p_limite integer
+)
+RETURNS TABLE(id integer, nombre text, fecha_lanzamiento date, rating numeric)
+LANGUAGE plpgsql STABLE AS $$
+BEGIN
+    IF p_orden = 'rating' THEN
+        RETURN QUERY
+        SELECT j.id::integer, j.nombre::text, j.fecha_lanzamiento::date, j.rating::numeric
+        FROM juegos j
+        WHERE (p_id IS NULL OR (COALESCE(j.rating, -1), j.id) < (p_valor::numeric, p_id))
+          AND (p_genero IS NULL OR EXISTS (
+                SELECT 1 FROM juego_genero jg JOIN generos g ON g.id = jg.id_genero
+                WHERE jg.id_juego = j.id AND g.nombre = p_genero))
+          AND (p_plataforma IS NULL OR EXISTS (
+                SELECT 1 FROM juego_plataforma jp JOIN plataformas p ON p.id = jp.id_plataforma
+                WHERE jp.id_juego = j.id AND p.nombre = p_plataforma))
+        ORDER BY COALESCE(j.rating, -1) DESC, j.id DESC
+        LIMIT p_limite;
+    ELSE
+        RETURN QUERY
+        SELECT j.id::integer, j.nombre::text, j.fecha_lanzamiento::date, j.rating::numeric
+        FROM juegos j
+        WHERE (p_id IS NULL OR (j.nombre, j.id) > (p_valor, p_id))
+          AND (p_genero IS NULL OR EXISTS (
+                SELECT 1 FROM juego_genero jg JOIN generos g ON g.id = jg.id_genero
+                WHERE jg.id_juego = j.id AND g.nombre = p_genero))
+          AND (p_plataforma IS NULL OR EXISTS (
+                SELECT 1 FROM juego_plataforma jp JOIN plataformas p ON p.id = jp.id_plataforma
+                WHERE jp.id_juego = j.id AND p.nombre = p_plataforma))
+        ORDER BY j.nombre, j.id
+        LIMIT p_limite;
+    END IF;
+END;
+$$;
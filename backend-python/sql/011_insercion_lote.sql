@@ -0,0 +1,45 @@
+-- -------------------------------
+-- Inserción de juegos con sus relaciones en un solo round trip
+-- -------------------------------
+-- p_juegos: arreglo JSON de objetos
+--   {"nombre": text, "fecha": "YYYY-MM-DD"|null, "rating": number|null,
+--    "generos": [id], "plataformas": [id], "desarrolladores": [id], "etiquetas": [id]}
+-- Devuelve (ord, id): posición (desde 1) en el arreglo y el id del juego insertado.
+-- Reutiliza insertar_juego e insertar_juego_* para conservar sus reglas.
+
+CREATE OR REPLACE FUNCTION insertar_juegos_lote(p_juegos jsonb)
+RETURNS TABLE(ord integer, id integer)
+LANGUAGE plpgsql AS $$
+DECLARE
+    v_ids integer[];
+BEGIN
+    SELECT array_agg(insertar_juego(d.e->>'nombre', (d.e->>'fecha')::date, (d.e->>'rating')::numeric)
+                     ORDER BY d.n)
+    INTO v_ids
+    FROM jsonb_array_elements(p_juegos) WITH ORDINALITY AS d(e, n);
+
+    IF v_ids IS NULL THEN
+        RETURN;
+    END IF;
+
+    PERFORM insertar_juego_genero(v_ids[d.n], x::integer)
+    FROM jsonb_array_elements(p_juegos) WITH ORDINALITY AS d(e, n),
+         jsonb_array_elements_text(COALESCE(d.e->'generos', '[]'::jsonb)) AS x;
+
+    PERFORM insertar_juego_plataforma(v_ids[d.n], x::integer)
+    FROM jsonb_array_elements(p_juegos) WITH ORDINALITY AS d(e, n),
+         jsonb_array_elements_text(COALESCE(d.e->'plataformas', '[]'::jsonb)) AS x;
+
+    PERFORM insertar_juego_desarrollador(v_ids[d.n], x::integer)
+    FROM jsonb_array_elements(p_juegos) WITH ORDINALITY AS d(e, n),
+         jsonb_array_elements_text(COALESCE(d.e->'desarrolladores', '[]'::jsonb)) AS x;
+
+    PERFORM insertar_juego_etiqueta(v_ids[d.n], x::integer)
+    FROM jsonb_array_elements(p_juegos) WITH ORDINALITY AS d(e, n),
+         jsonb_array_elements_text(COALESCE(d.e->'etiquetas', '[]'::jsonb)) AS x;
+
+    RETURN QUERY
+    SELECT s.n::integer, v_ids[s.n]
+    FROM generate_subscripts(v_ids, 1) AS s(n);
+END;
+$$;
@@ -0,0 +1,39 @@
+-- -------------------------------
+-- Estadísticas precalculadas en vistas materializadas
+-- -------------------------------
+-- Cada vista guarda el resultado de la función en vivo. El backend las refresca en segundo
+-- plano (REFRESH ... CONCURRENTLY no bloquea las lecturas) y registra la hora de cada refresco.
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_estadisticas_genero (genero, total) AS
+    SELECT * FROM estadisticas_juegos_por_genero();
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_estadisticas_genero ON mv_estadisticas_genero (genero);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_top3_genero (id, nombre, rating, genero) AS
+    SELECT * FROM top3_juegos_por_genero();
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_top3_genero ON mv_top3_genero (genero, id);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_top3_genero_opt (id, nombre, rating, genero) AS
+    SELECT * FROM top3_juegos_por_genero_optimizado();
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_top3_genero_opt ON mv_top3_genero_opt (genero, id);
+
+CREATE TABLE IF NOT EXISTS estadisticas_frescura (
+    vista text PRIMARY KEY,
+    actualizado_en timestamptz NOT NULL
+);
+
+INSERT INTO estadisticas_frescura (vista, actualizado_en)
+VALUES ('mv_estadisticas_genero', now()), ('mv_top3_genero', now()), ('mv_top3_genero_opt', now())
+ON CONFLICT (vista) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION refrescar_estadisticas()
+RETURNS timestamptz
+LANGUAGE plpgsql AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_estadisticas_genero;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_top3_genero;
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_top3_genero_opt;
+
+    UPDATE estadisticas_frescura SET actualizado_en = now();
+    RETURN now();
+END;
+$$;
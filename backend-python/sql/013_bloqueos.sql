@@ -0,0 +1,26 @@
+-- -------------------------------
+-- Bloqueos de edición en una tabla propia (bloqueos.py, BLOQUEOS_BACKEND=tabla)
+-- -------------------------------
+-- Antes cada bloqueo escribía bloqueado_por/bloqueo_expira en la fila de juegos (la más leída)
+-- y los vencidos no se limpiaban nunca. Cada bloqueo es ahora una concesión con id propio que
+-- se renueva, se libera en lote y, al vencer, la borra el barrido del backend.
+
+CREATE TABLE IF NOT EXISTS bloqueos_juegos (
+    juego_id  integer PRIMARY KEY,
+    concesion uuid NOT NULL UNIQUE,
+    usuario   text NOT NULL,
+    tomado_en timestamptz NOT NULL DEFAULT now(),
+    expira    timestamptz NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_bloqueos_juegos_usuario ON bloqueos_juegos (usuario);
+CREATE INDEX IF NOT EXISTS ix_bloqueos_juegos_expira ON bloqueos_juegos (expira);
+
+-- Los bloqueos vigentes guardados en juegos pasan a la tabla nueva y las columnas se limpian
+INSERT INTO bloqueos_juegos (juego_id, concesion, usuario, expira)
+SELECT id, gen_random_uuid(), bloqueado_por::text, bloqueo_expira
+FROM juegos
+WHERE bloqueado_por IS NOT NULL AND bloqueo_expira > now()
+ON CONFLICT (juego_id) DO NOTHING;
+
+UPDATE juegos SET bloqueado_por = NULL, bloqueo_expira = NULL
+WHERE bloqueado_por IS NOT NULL;
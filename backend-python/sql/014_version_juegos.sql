@@ -0,0 +1,48 @@
+-- -------------------------------
+-- Versión por juego para la concurrencia optimista (PUT /api/juegos/<id> con If-Match)
+-- -------------------------------
+-- La versión sube con cada UPDATE de la fila, venga del backend, del ETL o de otra función.
+-- actualizar_juego_si_version es un compare-and-swap: aplica el cambio solo si la versión
+-- actual es una de las esperadas y, si no, devuelve la fila actual para reintentar.
+
+-- Con DEFAULT constante la columna se agrega sin reescribir la tabla (PostgreSQL 11+)
+ALTER TABLE juegos ADD COLUMN IF NOT EXISTS version bigint NOT NULL DEFAULT 1;
+
+CREATE OR REPLACE FUNCTION subir_version_juego()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS tr_version_juego ON juegos;
+CREATE TRIGGER tr_version_juego
+    BEFORE UPDATE ON juegos
+    FOR EACH ROW EXECUTE FUNCTION subir_version_juego();
+
+-- Sin filas: el juego no existe. actualizado = false: la versión ya no era la esperada
+-- (la fila devuelta es la actual). FOR UPDATE bloquea la fila entre la comprobación y la
+-- escritura; en READ COMMITTED, si otro la estaba actualizando, se espera a su commit y la
+-- versión se vuelve a evaluar, así que de dos escrituras concurrentes solo gana una.
+-- La escritura pasa por actualizar_juego: se aplican las mismas reglas que en un PUT sin If-Match.
+-- Mismos casts que sql/008: el resultado declarado no depende de los tipos exactos de las columnas.
+CREATE OR REPLACE FUNCTION actualizar_juego_si_version(p integer, n text, f date, r numeric, v bigint[])
+RETURNS TABLE(actualizado boolean, id integer, nombre text, fecha_lanzamiento date, rating numeric, version bigint)
+LANGUAGE plpgsql AS $$
+#variable_conflict use_column
+DECLARE
+    vigente boolean;
+BEGIN
+    PERFORM 1 FROM juegos AS j WHERE j.id = p AND j.version = ANY(v) FOR UPDATE;
+    vigente := FOUND;
+    IF vigente THEN
+        PERFORM actualizar_juego(p, n, f, r);
+    END IF;
+    RETURN QUERY
+        SELECT vigente, j.id::integer, j.nombre::text, j.fecha_lanzamiento::date, j.rating::numeric,
+               j.version::bigint
+        FROM juegos AS j WHERE j.id = p;
+END;
+$$;
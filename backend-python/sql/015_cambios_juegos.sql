@@ -0,0 +1,28 @@
+-- -------------------------------
+-- Transacción del último cambio de cada juego (sincronización del índice de facetas)
+-- -------------------------------
+-- La versión de sql/014 es por fila y no sirve para preguntar "qué cambió desde la última vez".
+-- cambio_xid guarda la transacción (xid8, PostgreSQL 13+) que insertó o actualizó la fila, venga
+-- del backend, del ETL o de SQL directo. indice_facetas.py pide las filas con cambio_xid >= el
+-- xmin de la foto anterior: ninguna transacción que esa foto no veía queda afuera, aunque
+-- confirme en otro orden. Las relaciones (juego_genero, ...) cambian en la misma transacción que
+-- la fila del juego (insertar_juego / actualizar_juego), así que también se releen.
+
+-- Sin DEFAULT la columna se agrega sin reescribir la tabla; las filas viejas quedan en NULL y
+-- las toma la reconstrucción completa
+ALTER TABLE juegos ADD COLUMN IF NOT EXISTS cambio_xid xid8;
+CREATE INDEX IF NOT EXISTS idx_juegos_cambio_xid ON juegos (cambio_xid);
+
+CREATE OR REPLACE FUNCTION marcar_cambio_juego()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.cambio_xid := pg_current_xact_id();
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS tr_cambio_juego ON juegos;
+CREATE TRIGGER tr_cambio_juego
+    BEFORE INSERT OR UPDATE ON juegos
+    FOR EACH ROW EXECUTE FUNCTION marcar_cambio_juego();
@@ -0,0 +1,24 @@
+-- -------------------------------
+-- Transacción del último cambio de desarrolladores y etiquetas (índice del autocompletado)
+-- -------------------------------
+-- Mismo problema que sql/015 para las facetas: los hilos de carga del ETL y la inserción por lote
+-- crean desarrolladores y etiquetas en transacciones concurrentes que confirman en otro orden que
+-- sus ids. Buscar solo "id > último visto" salta el id menor que se hace visible después.
+-- indice_busqueda.py pide además las filas con cambio_xid >= el xmin de la foto anterior.
+
+-- Sin DEFAULT la columna se agrega sin reescribir la tabla; las filas viejas ya las trae la carga inicial
+ALTER TABLE desarrolladores ADD COLUMN IF NOT EXISTS cambio_xid xid8;
+ALTER TABLE etiquetas ADD COLUMN IF NOT EXISTS cambio_xid xid8;
+CREATE INDEX IF NOT EXISTS idx_desarrolladores_cambio_xid ON desarrolladores (cambio_xid);
+CREATE INDEX IF NOT EXISTS idx_etiquetas_cambio_xid ON etiquetas (cambio_xid);
+
+-- marcar_cambio_juego (sql/015) solo asigna NEW.cambio_xid: sirve para cualquier tabla con esa columna
+DROP TRIGGER IF EXISTS tr_cambio_desarrollador ON desarrolladores;
+CREATE TRIGGER tr_cambio_desarrollador
+    BEFORE INSERT OR UPDATE ON desarrolladores
+    FOR EACH ROW EXECUTE FUNCTION marcar_cambio_juego();
+
+DROP TRIGGER IF EXISTS tr_cambio_etiqueta ON etiquetas;
+CREATE TRIGGER tr_cambio_etiqueta
+    BEFORE INSERT OR UPDATE ON etiquetas
+    FOR EACH ROW EXECUTE FUNCTION marcar_cambio_juego();
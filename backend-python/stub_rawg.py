@@ -0,0 +1,96 @@
+import argparse
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# -------------------------------
+# Servidor RAWG de juguete para probar el ETL sin red
+# Uso: python stub_rawg.py --juegos 2000 --puerto 8765
+#      RAWG_BASE_URL=http://localhost:8765/api python consumo_api.py
+# -------------------------------
+
+GENEROS = ["Action", "Adventure", "RPG", "Shooter", "Puzzle", "Racing", "Sports", "Strategy", "Indie", "Casual"]
+PLATAFORMAS = ["PC", "PlayStation 5", "PlayStation 4", "Xbox One", "Xbox Series S/X", "Nintendo Switch", "iOS", "Android"]
+
+
+def generar_juego(juego_id, semilla=0):
+    rnd = random.Random(juego_id * 7919 + semilla)
+    return {
+        "id": juego_id,
+        "name": f"Juego {juego_id}",
+        "released": f"{rnd.randint(1990, 2025)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+        "updated": f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T00:00:00",
+        "rating": round(rnd.uniform(0, 5), 2),
+        "genres": [{"name": g} for g in rnd.sample(GENEROS, rnd.randint(1, 3))],
+        "platforms": [{"platform": {"name": p}} for p in rnd.sample(PLATAFORMAS, rnd.randint(1, 4))],
+        "tags": [{"name": f"tag-{rnd.randint(1, 3000)}"} for _ in range(rnd.randint(0, 12))],
+    }
+
+
+def crear_servidor(puerto=8765, total_juegos=2000, tasa_error=0.0, latencia=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _responder(self, codigo, cuerpo):
+            datos = json.dumps(cuerpo).encode()
+            self.send_response(codigo)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_GET(self):
+            if latencia:
+                threading.Event().wait(latencia)
+            if tasa_error and random.random() < tasa_error:
+                return self._responder(random.choice([429, 503]), {"detail": "error simulado"})
+
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            partes = [p for p in url.path.split("/") if p]
+
+            if partes == ["api", "games"]:
+                pagina = int(params.get("page", ["1"])[0])
+                page_size = int(params.get("page_size", ["20"])[0])
+                inicio = (pagina - 1) * page_size + 1
+                if inicio > total_juegos:
+                    return self._responder(404, {"detail": "Invalid page."})
+                fin = min(total_juegos, inicio + page_size - 1)
+                siguiente = f"http://localhost:{puerto}/api/games?page={pagina + 1}" if fin < total_juegos else None
+                return self._responder(200, {
+                    "count": total_juegos,
+                    "next": siguiente,
+                    "results": [generar_juego(i) for i in range(inicio, fin + 1)],
+                })
+
+            if len(partes) == 3 and partes[:2] == ["api", "games"] and partes[2].isdigit():
+                juego_id = int(partes[2])
+                if juego_id > total_juegos:
+                    return self._responder(404, {"detail": "Not found."})
+                rnd = random.Random(juego_id)
+                detalle = generar_juego(juego_id)
+                detalle["developers"] = [{"name": f"Estudio {rnd.randint(1, 500)}"} for _ in range(rnd.randint(1, 2))]
+                return self._responder(200, detalle)
+
+            self._responder(404, {"detail": "Not found."})
+
+    return ThreadingHTTPServer(("127.0.0.1", puerto), Handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor RAWG simulado")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--juegos", type=int, default=2000)
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="fracción de respuestas 429/503")
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos de latencia por petición")
+    args = parser.parse_args()
+
+    servidor = crear_servidor(args.puerto, args.juegos, args.tasa_error, args.latencia)
+    print(f"RAWG simulado en http://127.0.0.1:{args.puerto}/api con {args.juegos} juegos")
+    servidor.serve_forever()
@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from bloqueos import BackendBloqueosMemoria, BloqueoOcupado, GestorBloqueos
+
+
+@pytest.fixture
+def gestor():
+    return GestorBloqueos(BackendBloqueosMemoria(), ttl=60, barrido=0)
+
+
+def test_adquirir_y_conflicto(gestor):
+    concesion = gestor.adquirir(1, 10)
+    assert concesion["juego_id"] == 1 and concesion["usuario"] == "10"
+    with pytest.raises(BloqueoOcupado) as error:
+        gestor.adquirir(1, 20)
+    assert error.value.usuario == "10"
+    # El mismo usuario conserva su concesión
+    assert gestor.adquirir(1, 10)["concesion"] == concesion["concesion"]
+    assert gestor.metricas()["conflictos"] == 1
+
+
+def test_renovar_solo_las_propias(gestor):
+    concesion = gestor.adquirir(1, 10)["concesion"]
+    # Con o sin guiones; las ajenas o mal formadas no se renuevan
+    con_guiones = f"{concesion[:8]}-{concesion[8:12]}-{concesion[12:16]}-{concesion[16:20]}-{concesion[20:]}"
+    assert [c["juego_id"] for c in gestor.renovar([con_guiones, "basura"], 10)] == [1]
+    assert gestor.renovar([concesion], 20) == []
+    assert gestor.metricas()["renovaciones_perdidas"] == 2
+
+
+def test_liberar_por_juego_o_concesion(gestor):
+    a = gestor.adquirir(1, 10)["concesion"]
+    gestor.adquirir(2, 10)
+    gestor.adquirir(3, 20)
+    assert gestor.liberar(20, juegos=[1, 2]) == []
+    assert gestor.liberar(10, juegos=["2"], concesiones=[a]) == [1, 2]
+    assert [c["juego_id"] for c in gestor.de_usuario(20)] == [3]
+    assert gestor.adquirir(1, 20)["usuario"] == "20"
+
+
+def test_vencido_se_puede_tomar_y_se_barre():
+    gestor = GestorBloqueos(BackendBloqueosMemoria(), ttl=-1, barrido=0)
+    vieja = gestor.adquirir(1, 10)["concesion"]
+    # Vencida: otro la toma con una concesión nueva, y el dueño anterior ya no puede renovarla
+    nueva = gestor.adquirir(1, 20)["concesion"]
+    assert nueva != vieja
+    assert gestor.renovar([vieja], 10) == []
+    assert gestor.de_usuario(20) == []
+    assert gestor.barrer() == 1
+
+
+def test_barre_solo_el_lider():
+    class Backend(BackendBloqueosMemoria):
+        barridos = 0
+
+        def barrer(self):
+            Backend.barridos += 1
+            return 0
+
+    class Lider:
+        def __init__(self, es):
+            self.es = es
+
+        def es_lider(self):
+            return self.es
+
+    seguidor = GestorBloqueos(Backend(), barrido=0.01, lider=Lider(False))
+    seguidor.iniciar()
+    time.sleep(0.1)
+    seguidor.detener()
+    assert Backend.barridos == 0
+    lider = GestorBloqueos(Backend(), barrido=0.01, lider=Lider(True))
+    lider.iniciar()
+    time.sleep(0.1)
+    lider.detener()
+    assert Backend.barridos > 0
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import Flask, Response, jsonify, request
+from werkzeug.http import http_date
+
+from cache_respuestas import BackendMemoria, CacheRespuestas
+
+
+@pytest.fixture
+def entorno():
+    app = Flask(__name__)
+    cache = CacheRespuestas(BackendMemoria(), ttl=300)
+    llamadas = []
+
+    @app.route("/juegos")
+    @cache.cachear("catalogo")
+    def juegos():
+        llamadas.append(1)
+        return jsonify([{"id": 1}])
+
+    @app.route("/todos")
+    @cache.cachear("catalogo", omitir=lambda: "ndjson" in request.headers.get("Accept", ""), vary=("Accept",))
+    def todos():
+        llamadas.append(1)
+        if "ndjson" in request.headers.get("Accept", ""):
+            return Response('{"id":1}\n', mimetype="application/x-ndjson")
+        return jsonify([{"id": 1}])
+
+    @app.route("/falla")
+    @cache.cachear("catalogo")
+    def falla():
+        llamadas.append(1)
+        return jsonify({"error": "x"}), 500
+
+    return app.test_client(), cache, llamadas
+
+
+def test_etag_y_last_modified_de_la_version(entorno):
+    cliente, cache, llamadas = entorno
+    r = cliente.get("/juegos")
+    version = cache.version("catalogo")
+    assert r.status_code == 200
+    assert r.headers["ETag"].startswith(f'"catalogo-{version}-')
+    assert r.last_modified == datetime.fromtimestamp(version // 1000, timezone.utc)
+    assert r.headers["Cache-Control"] == "no-cache"
+    # La segunda sale de la cache sin llamar a la vista
+    r2 = cliente.get("/juegos")
+    assert r2.get_data() == r.get_data() and r2.headers["ETag"] == r.headers["ETag"]
+    assert len(llamadas) == 1 and cache.aciertos == 1
+
+
+@pytest.mark.parametrize("etiqueta", ['"{base}"', 'W/"{base}"', '"{base}-gzip"', '"otra", "{base}-br"', "*"])
+def test_if_none_match_vigente_da_304(entorno, etiqueta):
+    cliente, cache, llamadas = entorno
+    base = cliente.get("/juegos").headers["ETag"].strip('"')
+    llamadas.clear()
+    r = cliente.get("/juegos", headers={"If-None-Match": etiqueta.format(base=base)})
+    assert r.status_code == 304 and r.get_data() == b""
+    # Werkzeug quita Last-Modified de los 304 (RFC 9110 solo exige el ETag)
+    assert r.headers["ETag"].strip('"').startswith(base)
+    assert llamadas == [] and cache.respuestas_304 == 1
+
+
+def test_invalidar_cambia_el_etag(entorno):
+    cliente, cache, llamadas = entorno
+    viejo = cliente.get("/juegos").headers["ETag"]
+    cache.invalidar("catalogo")
+    r = cliente.get("/juegos", headers={"If-None-Match": viejo})
+    assert r.status_code == 200
+    assert r.headers["ETag"] != viejo
+    assert len(llamadas) == 2
+
+
+def test_la_version_no_retrocede(entorno):
+    _, cache, _ = entorno
+    versiones = [cache.version("catalogo")]
+    for _ in range(3):
+        cache.invalidar("catalogo")
+        versiones.append(cache.version("catalogo"))
+    assert versiones == sorted(set(versiones))
+
+
+def test_if_modified_since(entorno):
+    cliente, cache, llamadas = entorno
+    modificado = datetime.fromtimestamp(cache.version("catalogo") // 1000, timezone.utc)
+    assert cliente.get("/juegos", headers={"If-Modified-Since": http_date(modificado)}).status_code == 304
+    antes = http_date(modificado - timedelta(seconds=1))
+    assert cliente.get("/juegos", headers={"If-Modified-Since": antes}).status_code == 200
+    assert len(llamadas) == 1
+
+
+def test_if_none_match_manda_sobre_if_modified_since(entorno):
+    cliente, _, _ = entorno
+    futuro = http_date(datetime.now(timezone.utc) + timedelta(days=1))
+    r = cliente.get("/juegos", headers={"If-None-Match": '"catalogo-1"', "If-Modified-Since": futuro})
+    assert r.status_code == 200
+
+
+def test_explain_y_errores_no_se_cachean(entorno):
+    cliente, _, llamadas = entorno
+    cliente.get("/juegos?explain=1")
+    r = cliente.get("/juegos?explain=1")
+    assert r.status_code == 200 and "ETag" not in r.headers
+    cliente.get("/falla")
+    assert cliente.get("/falla").status_code == 500
+    assert len(llamadas) == 4
+
+
+def test_omitir_no_usa_la_cache_ni_responde_304(entorno):
+    cliente, _, llamadas = entorno
+    json_ = cliente.get("/todos")
+    assert json_.headers["Vary"] == "Accept"
+    ndjson = {"Accept": "application/x-ndjson", "If-None-Match": json_.headers["ETag"]}
+    r = cliente.get("/todos", headers=ndjson)
+    assert r.status_code == 200 and r.mimetype == "application/x-ndjson" and "ETag" not in r.headers
+    assert cliente.get("/todos", headers={"If-None-Match": json_.headers["ETag"]}).status_code == 304
+    assert len(llamadas) == 2
+
+
+@pytest.mark.parametrize("otra", ["/juegos?pagina=2", "/todos", "/juegos?formato=columnas"])
+def test_el_etag_es_de_cada_recurso(entorno, otra):
+    cliente, _, _ = entorno
+    etag = cliente.get("/juegos").headers["ETag"]
+    r = cliente.get(otra, headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["ETag"] != etag
+    # Prefijos o sufijos distintos de la codificación no valen
+    base = etag.strip('"')
+    assert cliente.get("/juegos", headers={"If-None-Match": f'"{base}-otra"'}).status_code == 200
+    assert cliente.get("/juegos", headers={"If-None-Match": f'"{base[:-1]}"'}).status_code == 200
+
+
+def test_el_etag_depende_de_vary(entorno):
+    cliente, _, _ = entorno
+    a = cliente.get("/todos", headers={"Accept": "application/json"}).headers["ETag"]
+    b = cliente.get("/todos", headers={"Accept": "*/*"}).headers["ETag"]
+    assert a != b
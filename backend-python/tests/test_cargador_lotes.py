@@ -0,0 +1,111 @@
+import os
+import uuid
+
+import pytest
+
+# CargadorLotes escribe con las funciones SQL del esquema (insertar_juego, insertar_juego_genero...):
+# estas pruebas necesitan una base de pruebas con ese esquema. Nunca la de producción: crean y
+# borran juegos y dimensiones con nombres únicos
+DB_URL_PRUEBAS = os.getenv("DB_URL_PRUEBAS")
+if not DB_URL_PRUEBAS:
+    pytest.skip("Sin DB_URL_PRUEBAS", allow_module_level=True)
+psycopg2 = pytest.importorskip("psycopg2")
+os.environ["DB_URL"] = DB_URL_PRUEBAS   # consumo_api se conecta al importarse
+
+import consumo_api  # noqa: E402
+from consumo_api import CargadorLotes, clasificar_lote, hash_contenido, normalizar_juego  # noqa: E402
+
+TABLAS_DIMENSION = {"generos": "generos", "plataformas": "plataformas",
+                    "desarrolladores": "desarrolladores", "etiquetas": "etiquetas"}
+
+
+@pytest.fixture
+def conn():
+    conexion = psycopg2.connect(DB_URL_PRUEBAS)
+    conexion.autocommit = True
+    yield conexion
+    conexion.close()
+
+
+@pytest.fixture
+def prefijo(conn):
+    prefijo = f"prueba-cargador-{uuid.uuid4().hex[:8]}"
+    yield prefijo
+    with conn.cursor() as cur:
+        cur.execute("SELECT id FROM juegos WHERE nombre LIKE %s;", (prefijo + "%",))
+        ids = [f[0] for f in cur.fetchall()]
+        for _, _, tabla, _ in consumo_api.DIMENSIONES.values():
+            cur.execute(f"DELETE FROM {tabla} WHERE id_juego = ANY(%s);", (ids,))
+        cur.execute("DELETE FROM juegos WHERE id = ANY(%s);", (ids,))
+        for tabla in TABLAS_DIMENSION.values():
+            cur.execute(f"DELETE FROM {tabla} WHERE nombre LIKE %s;", (prefijo + "%",))
+
+
+def registro(prefijo, **dimensiones):
+    base = {"rawg_id": 1, "updated": "2024-01-01T00:00:00", "nombre": f"{prefijo} juego",
+            "fecha": "2020-01-01", "rating": 4.0}
+    base.update({dim: [f"{prefijo} {n}" for n in nombres] if nombres is not None else None
+                 for dim, nombres in dimensiones.items()})
+    return base
+
+
+def relaciones(conn, id_juego, prefijo):
+    resultado = {}
+    with conn.cursor() as cur:
+        for dimension, (_, _, tabla, columna) in consumo_api.DIMENSIONES.items():
+            cur.execute(f"""
+                SELECT d.nombre FROM {tabla} t JOIN {TABLAS_DIMENSION[dimension]} d ON d.id = t.{columna}
+                WHERE t.id_juego = %s ORDER BY d.nombre;
+            """, (id_juego,))
+            resultado[dimension] = [n[len(prefijo) + 1:] for (n,) in cur.fetchall()]
+    return resultado
+
+
+def test_recarga_reemplaza_las_relaciones(conn, prefijo):
+    cargador = CargadorLotes(conn)
+    [id_juego] = cargador.cargar([registro(prefijo, generos=["accion", "rpg"], plataformas=["pc"],
+                                           desarrolladores=["estudio"], etiquetas=["a", "b"])])
+    # RAWG quitó "rpg" y la etiqueta "a", agregó "indie"; lo que sigue no se duplica
+    cargador.cargar([{**registro(prefijo, generos=["accion", "indie"], plataformas=["pc"],
+                                 desarrolladores=["estudio"], etiquetas=["b"]), "id_db": id_juego}])
+    assert relaciones(conn, id_juego, prefijo) == {
+        "generos": ["accion", "indie"], "plataformas": ["pc"],
+        "desarrolladores": ["estudio"], "etiquetas": ["b"],
+    }
+
+
+def test_lista_vacia_borra_pero_none_conserva(conn, prefijo):
+    cargador = CargadorLotes(conn)
+    [id_juego] = cargador.cargar([registro(prefijo, generos=["accion"], plataformas=["pc"],
+                                           desarrolladores=["estudio"], etiquetas=["a"])])
+    # Detalle fallido: desarrolladores=None no toca los que había; etiquetas=[] sí es "ninguna"
+    cargador.cargar([{**registro(prefijo, generos=["accion"], plataformas=["pc"],
+                                 desarrolladores=None, etiquetas=[]), "id_db": id_juego}])
+    assert relaciones(conn, id_juego, prefijo) == {
+        "generos": ["accion"], "plataformas": ["pc"], "desarrolladores": ["estudio"], "etiquetas": [],
+    }
+
+
+def test_normalizar_distingue_detalle_fallido():
+    juego = {"id": 1, "name": "x", "genres": [], "platforms": [], "tags": []}
+    assert normalizar_juego(juego)["desarrolladores"] is None
+    assert normalizar_juego({**juego, "developers": []})["desarrolladores"] == []
+    assert normalizar_juego({**juego, "developers": [{"name": "d"}]})["desarrolladores"] == ["d"]
+
+
+def test_carga_incompleta_no_guarda_updated():
+    class Checkpoint:
+        def __init__(self, previos):
+            self.previos = previos
+
+        def obtener_juegos(self, rawg_ids):
+            return {r: self.previos[r] for r in rawg_ids if r in self.previos}
+
+    completo = registro("p", generos=["g"], plataformas=[], desarrolladores=["d"], etiquetas=[])
+    incompleto = {**completo, "desarrolladores": None}
+    assert hash_contenido(incompleto) != hash_contenido({**completo, "desarrolladores": []})
+    # Mismo "updated" que lo ya cargado, pero sin desarrolladores: se carga y no deja "updated"
+    a_cargar, omitidos = clasificar_lote(Checkpoint({1: (10, completo["updated"], "otro")}), [dict(incompleto)])
+    assert omitidos == 1 and a_cargar == []
+    a_cargar, _ = clasificar_lote(Checkpoint({1: (10, None, "otro")}), [dict(incompleto)])
+    assert a_cargar[0]["id_db"] == 10 and a_cargar[0]["updated"] is None
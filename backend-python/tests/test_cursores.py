@@ -0,0 +1,60 @@
+import base64
+import json
+from decimal import Decimal
+
+import pytest
+
+from cursores import CursorInvalido, codificar_cursor, decodificar_cursor
+
+
+@pytest.mark.parametrize("orden, fila, valor", [
+    ("rating", (7, "Portal 2", None, Decimal("4.50")), "4.50"),
+    ("rating", (8, "Sin rating", None, None), "-1"),
+    ("nombre", (9, "Ñandú: \"edición\" 100%", None, Decimal("3.10")), "Ñandú: \"edición\" 100%"),
+])
+def test_ida_y_vuelta(orden, fila, valor):
+    cursor = codificar_cursor(orden, fila)
+    assert decodificar_cursor(cursor, orden) == (valor, fila[0])
+
+
+def test_cursor_seguro_en_url():
+    # Sin relleno ni caracteres que haya que escapar en la query string
+    cursor = codificar_cursor("nombre", (1, "a?b&c=d/e+f", None, None))
+    assert not set(cursor) & set("=+/?&")
+
+
+def test_sin_cursor():
+    assert decodificar_cursor("", "rating") == (None, None)
+    assert decodificar_cursor(None, "nombre") == (None, None)
+
+
+def test_cursor_de_otro_orden():
+    cursor = codificar_cursor("rating", (1, "x", None, Decimal("1.00")))
+    with pytest.raises(CursorInvalido, match="otro orden"):
+        decodificar_cursor(cursor, "nombre")
+
+
+@pytest.mark.parametrize("cursor", ["no-es-base64!", "e30", "eyJvIjoicmF0aW5nIn0", "W10"])
+def test_cursor_mal_formado(cursor):
+    # e30 = {}, eyJvIjoicmF0aW5nIn0 = {"o":"rating"} (sin id), W10 = []
+    with pytest.raises(CursorInvalido):
+        decodificar_cursor(cursor, "rating")
+
+
+def armar(datos):
+    return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("orden, valor", [
+    ("rating", "abc"), ("rating", "NaN"), ("rating", "Infinity"), ("rating", None), ("rating", 4.5),
+    ("nombre", None), ("nombre", ["x"]),
+])
+def test_valor_invalido(orden, valor):
+    # Llegaría a p_valor::numeric (sql/008) y sería un 500 en lugar de un 400
+    with pytest.raises(CursorInvalido):
+        decodificar_cursor(armar({"o": orden, "v": valor, "id": 3}), orden)
+
+
+def test_id_invalido():
+    with pytest.raises(CursorInvalido):
+        decodificar_cursor(armar({"o": "nombre", "v": "x", "id": "tres"}), "nombre")
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from indice_facetas import BITS_FECHA, EstadoFacetas, posiciones_de
+
+# Índice armado en memoria (sin PostgreSQL) y comparado con un cálculo directo sobre las filas
+
+
+def orden_de_rango(juego):
+    # Rating desc con los nulos al final, luego id desc (el de la paginación por cursor)
+    return (-(juego["rating"] if juego["rating"] is not None else -1), -juego["id"])
+
+
+@pytest.fixture
+def juegos_y_estado():
+    azar = random.Random(7)
+    juegos = {}
+    for id_juego in range(1, 401):
+        juegos[id_juego] = {
+            "id": id_juego,
+            "rating": azar.choice([None, 0, 500, azar.randint(0, 500), azar.randint(300, 450)]),
+            "fecha": azar.choice([None, 0, azar.randint(0, (1 << BITS_FECHA) - 1)]),
+            "generos": set(azar.sample(range(1, 6), azar.randint(0, 2))),
+        }
+    ordenados = sorted(juegos.values(), key=orden_de_rango)
+    relaciones = {"generos": {}}
+    for juego in ordenados:
+        for genero in juego["generos"]:
+            relaciones["generos"].setdefault(genero, []).append(juego["id"])
+    estado = EstadoFacetas([(j["id"], j["rating"], j["fecha"]) for j in ordenados], relaciones, {})
+
+    # Escrituras posteriores a la construcción: juegos nuevos y actualizados van a la cola
+    for id_juego in [*range(401, 431), *azar.sample(range(1, 401), 40)]:
+        juego = {"id": id_juego, "rating": azar.choice([None, azar.randint(0, 500)]),
+                 "fecha": azar.randint(0, 20000), "generos": set(azar.sample(range(1, 6), 1))}
+        juegos[id_juego] = juego
+        estado.agregar(id_juego, juego["rating"], juego["fecha"], {"generos": juego["generos"]})
+    return juegos, estado
+
+
+def ids_de(estado, bitmap):
+    return {estado.ids[p] for p in posiciones_de(bitmap & estado.vivos)}
+
+
+@pytest.mark.parametrize("campo", ["rating", "fecha"])
+def test_filtro_rango(juegos_y_estado, campo):
+    juegos, estado = juegos_y_estado
+    limites = [None, -5, 0, 1, 250, 499, 500, 501, 20000, (1 << BITS_FECHA) - 1, 1 << BITS_FECHA]
+    for minimo in limites:
+        for maximo in limites:
+            esperado = {j["id"] for j in juegos.values() if j[campo] is not None
+                        and (minimo is None or j[campo] >= minimo) and (maximo is None or j[campo] <= maximo)}
+            assert ids_de(estado, estado.filtro_rango(campo, minimo, maximo)) == esperado, (minimo, maximo)
+
+
+def test_filtro_faceta(juegos_y_estado):
+    juegos, estado = juegos_y_estado
+    o = ids_de(estado, estado.filtro_faceta("generos", [1, 2], "or"))
+    y = ids_de(estado, estado.filtro_faceta("generos", [1, 2], "and"))
+    assert o == {j["id"] for j in juegos.values() if j["generos"] & {1, 2}}
+    assert y == {j["id"] for j in juegos.values() if {1, 2} <= j["generos"]}
+
+
+@pytest.mark.parametrize("filtro", ["todos", "rating", "genero"])
+def test_pagina_en_orden_de_rango(juegos_y_estado, filtro):
+    juegos, estado = juegos_y_estado
+    if filtro == "todos":
+        resultado, acepta = estado.vivos, lambda j: True
+    elif filtro == "rating":
+        resultado = estado.filtro_rango("rating", 200, 450) & estado.vivos
+        acepta = lambda j: j["rating"] is not None and 200 <= j["rating"] <= 450  # noqa: E731
+    else:
+        resultado = estado.filtro_faceta("generos", [3], "or") & estado.vivos
+        acepta = lambda j: 3 in j["generos"]  # noqa: E731
+    esperado = [j["id"] for j in sorted(juegos.values(), key=orden_de_rango) if acepta(j)]
+    assert esperado and estado.n > estado.ordenados   # hay cola que mezclar
+    for limit in (1, 7, 50):
+        for offset in [*range(0, 12), len(esperado) - 3, len(esperado), len(esperado) + 5]:
+            assert estado.pagina(resultado, offset, limit) == esperado[offset:offset + limit], (offset, limit)
+
+
+def test_actualizar_mueve_el_juego(juegos_y_estado):
+    _, estado = juegos_y_estado
+    id_juego = estado.ids[0]
+    estado.agregar(id_juego, 500, 1, {"generos": {5}})
+    assert estado.pagina(estado.vivos, 0, 1)[0] == max(
+        (i for i in range(1, len(estado.pos_por_id)) if estado.pos_por_id[i] >= 0 and estado.ratings[estado.pos_por_id[i]] == 500))
+    assert [i for i in ids_de(estado, estado.vivos) if i == id_juego] == [id_juego]
+    assert id_juego in ids_de(estado, estado.filtro_faceta("generos", [5], "or"))
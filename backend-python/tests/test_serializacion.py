@@ -0,0 +1,90 @@
+import json
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+import serializacion
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Sin orjson solo se saltean las comparaciones con orjson; las del motor estándar corren igual
+requiere_orjson = pytest.mark.skipif(orjson is None, reason="orjson no está instalado")
+
+COLUMNAS = ("id", "nombre", "fecha", "rating", "activo", "creado", "concesion")
+FILAS = [
+    (1, "Portal 2", date(2011, 4, 18), Decimal("4.50"), True,
+     datetime(2024, 1, 31, 10, 0, tzinfo=timezone.utc), uuid.UUID(int=1)),
+    (2, "Ñandú \"100%\" \\ \n\t", None, None, False, datetime(2024, 1, 31, 10, 0, 5, 123456), None),
+    (3, "emoji 🎮 y <html>", date(1999, 12, 31), Decimal("0"), None, None, uuid.UUID(int=2**128 - 1)),
+]
+
+
+@pytest.fixture(params=["json", pytest.param("orjson", marks=requiere_orjson)])
+def motor(request, monkeypatch):
+    monkeypatch.setattr(serializacion, "orjson", orjson if request.param == "orjson" else None)
+    return request.param
+
+
+def con_cada_motor(monkeypatch, funcion):
+    salidas = {}
+    for nombre, modulo in (("json", None), ("orjson", orjson)):
+        monkeypatch.setattr(serializacion, "orjson", modulo)
+        salidas[nombre] = funcion()
+    return salidas
+
+
+@requiere_orjson
+@pytest.mark.parametrize("columnar", [False, True])
+def test_filas_iguales_en_ambos_motores(monkeypatch, columnar):
+    salidas = con_cada_motor(
+        monkeypatch, lambda: serializacion.Filas(COLUMNAS, FILAS, columnar=columnar).codificar())
+    assert salidas["json"] == salidas["orjson"]
+
+
+@requiere_orjson
+def test_ndjson_igual_en_ambos_motores(monkeypatch):
+    salidas = con_cada_motor(monkeypatch, lambda: serializacion.Filas(COLUMNAS, FILAS).lineas())
+    assert salidas["json"] == salidas["orjson"]
+    assert salidas["json"].endswith(b"\n") and salidas["json"].count(b"\n") == len(FILAS)
+
+
+@requiere_orjson
+def test_objetos_anidados_iguales_en_ambos_motores(monkeypatch):
+    objeto = {
+        "juegos": serializacion.Filas(("id", "rating"), [(1, Decimal("4.50"))]),
+        "total": 1,
+        "facetas": {1: 3, "generos": [{"id": 1, "nombre": "Acción", "fecha": date(2020, 1, 1)}]},
+    }
+    salidas = con_cada_motor(monkeypatch, lambda: serializacion.codificar(objeto))
+    assert salidas["json"] == salidas["orjson"]
+
+
+def test_formato(motor):
+    datos = json.loads(serializacion.Filas(COLUMNAS, FILAS[:1]).codificar())
+    assert datos == [{
+        "id": 1, "nombre": "Portal 2", "fecha": "2011-04-18", "rating": "4.50", "activo": True,
+        "creado": "2024-01-31T10:00:00+00:00", "concesion": "00000000-0000-0000-0000-000000000001",
+    }]
+    columnar = json.loads(serializacion.Filas(("id", "fecha"), [(1, date(2015, 7, 9))], columnar=True).codificar())
+    assert columnar == {"columns": ["id", "fecha"], "rows": [[1, "2015-07-09"]]}
+
+
+def test_tipo_no_serializable(motor):
+    with pytest.raises(TypeError):
+        serializacion.codificar({"x": object()})
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_igual_que_json_dumps(motor, columnar):
+    # Referencia: json.dumps de los objetos armados a mano, con el mismo formato de valores
+    if columnar:
+        esperado = {"columns": list(COLUMNAS), "rows": [list(f) for f in FILAS]}
+    else:
+        esperado = [dict(zip(COLUMNAS, fila)) for fila in FILAS]
+    referencia = json.dumps(esperado, default=serializacion.por_defecto, ensure_ascii=False, separators=(",", ":"))
+    assert serializacion.Filas(COLUMNAS, FILAS, columnar=columnar).codificar() == referencia.encode()
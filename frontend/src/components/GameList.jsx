@@ -10,6 +10,7 @@ function Gamelist() {
   const [generos, setGeneros] = useState([]);
   const [plataformas, setPlataformas] = useState([]);
   const [plan, setPlan] = useState([]);
+  const [verPlan, setVerPlan] = useState(false);
   const porPagina = 12;
 
   // Cargar géneros y plataformas al iniciar
@@ -26,8 +27,13 @@ function Gamelist() {
   // Cargar juegos
   useEffect(() => {
     let url = `${apiUrl}/api/juegos/filtrar?page=${pagina}&limit=${porPagina}`;
+    // explain=1 solo si se pide el plan: EXPLAIN ANALYZE vuelve a ejecutar la consulta
+    if (verPlan) url += "&explain=1";
     if (genero) url += `&genero=${encodeURIComponent(genero)}`;
     if (plataforma) url += `&plataforma=${encodeURIComponent(plataforma)}`;
+    // Con réplicas de lectura, quien acaba de guardar un juego lo ve en el listado
+    const usuarioId = localStorage.getItem("usuario_simulado_id");
+    if (usuarioId) url += `&usuario=${encodeURIComponent(usuarioId)}`;
 
     console.log("Petición a:", url); // 👈 Agrega esto
 
@@ -44,7 +50,7 @@ function Gamelist() {
         setTotal(0);
         setPlan([]);
       });
-  }, [pagina, genero, plataforma]);
+  }, [pagina, genero, plataforma, verPlan]);
 
   const totalPaginas = Math.ceil(total / porPagina);
 
@@ -123,10 +129,23 @@ function Gamelist() {
 
       {/* EXPLAIN ANALYZE Plan */}
       <div className="bg-white shadow rounded-xl p-4 mt-6">
-        <h2 className="text-xl font-semibold mb-4">EXPLAIN ANALYZE (plan de ejecución del filtro)</h2>
-        <pre className="text-sm text-gray-700 overflow-x-auto whitespace-pre-wrap">
-          {plan.join('\n')}
-        </pre>
+        <label className="cursor-pointer font-medium">
+          <input
+            type="checkbox"
+            checked={verPlan}
+            onChange={(e) => setVerPlan(e.target.checked)}
+            className="mr-2"
+          />
+          Mostrar plan de ejecución
+        </label>
+        {verPlan && (
+          <>
+            <h2 className="text-xl font-semibold my-4">EXPLAIN ANALYZE (plan de ejecución del filtro)</h2>
+            <pre className="text-sm text-gray-700 overflow-x-auto whitespace-pre-wrap">
+              {plan.join('\n')}
+            </pre>
+          </>
+        )}
       </div>
     </div>
   );
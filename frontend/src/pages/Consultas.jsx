@@ -11,6 +11,7 @@ const Consultas = () => {
   const [consultaTipo, setConsultaTipo] = useState("generos"); // "generos", "top3", "top3Opt"
   const [data, setData] = useState([]);
   const [plan, setPlan] = useState([]);
+  const [verPlan, setVerPlan] = useState(false);
   const [tipoGrafico, setTipoGrafico] = useState("circular");
   const [loading, setLoading] = useState(false);
 
@@ -25,14 +26,15 @@ const Consultas = () => {
       endpoint = "/api/estadisticas/top3-genero-funcion-opt";
     }
 
-    fetch(`${apiUrl}${endpoint}`)
+    // explain=1 solo si se pide el plan: sin él la respuesta sale de la cache y la consulta corre una vez
+    fetch(`${apiUrl}${endpoint}${verPlan ? "?explain=1" : ""}`)
       .then(res => res.json())
       .then(res => {
         // Para generos: res.datos y res.plan
         // Para top3: res (array) o res.resultados y res.plan
         if (consultaTipo === "generos") {
           setData(res.datos);
-          setPlan(res.plan);
+          setPlan(res.plan || []);
         } else {
           // Si API devuelve array directo
           if (Array.isArray(res)) {
@@ -49,7 +51,7 @@ const Consultas = () => {
         setPlan([]);
       })
       .finally(() => setLoading(false));
-  }, [consultaTipo]);
+  }, [consultaTipo, verPlan]);
 
   const renderGrafico = () => {
     if (consultaTipo !== "generos") return null;
@@ -222,10 +224,23 @@ const Consultas = () => {
       )}
 
       <div className="bg-white shadow rounded-xl p-4">
-        <h2 className="text-xl font-semibold mb-4">EXPLAIN ANALYZE (plan de ejecución)</h2>
-        <pre className="text-sm text-gray-700 overflow-x-auto whitespace-pre-wrap">
-          {plan.join('\n')}
-        </pre>
+        <label className="cursor-pointer font-medium">
+          <input
+            type="checkbox"
+            checked={verPlan}
+            onChange={e => setVerPlan(e.target.checked)}
+            className="mr-2"
+          />
+          Mostrar plan de ejecución
+        </label>
+        {verPlan && (
+          <>
+            <h2 className="text-xl font-semibold my-4">EXPLAIN ANALYZE (plan de ejecución)</h2>
+            <pre className="text-sm text-gray-700 overflow-x-auto whitespace-pre-wrap">
+              {plan.join('\n')}
+            </pre>
+          </>
+        )}
       </div>
     </div>
   );
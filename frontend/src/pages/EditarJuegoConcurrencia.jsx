@@ -9,6 +9,7 @@ const EditarJuegoConcurrencia = ({ usuario }) => {
   const [nombre, setNombre] = useState("");
   const [fecha, setFecha] = useState("");
   const [rating, setRating] = useState("");
+  const [concesion, setConcesion] = useState(null);
 
   // 🔓 Liberar juego si se desmonta o cambia selección
   const liberarJuego = useCallback(async () => {
@@ -76,12 +77,46 @@ const EditarJuegoConcurrencia = ({ usuario }) => {
     };
   }, [usuario, liberarJuego]);
 
+  // 🔁 Renovar el bloqueo mientras se edita (vence a los `ttl` segundos si no se renueva)
+  useEffect(() => {
+    if (!concesion) return;
+
+    const renovar = () => {
+      axios
+        .post(
+          `${apiUrl}/api/bloqueos/renovar`,
+          { concesion: concesion.id },
+          {
+            headers: {
+              "X-Usuario-Simulado-Id": usuario.id.toString(),
+            },
+          }
+        )
+        .catch((err) => {
+          if (err.response?.status === 410) {
+            alert("⚠️ El bloqueo del juego venció. Vuelve a seleccionarlo para editarlo.");
+            setConcesion(null);
+            setJuegoSeleccionadoId("");
+            setNombre("");
+            setFecha("");
+            setRating("");
+          } else {
+            console.warn("No se pudo renovar el bloqueo:", err);
+          }
+        });
+    };
+
+    const renovarInterval = setInterval(renovar, Math.max(concesion.ttl / 3, 5) * 1000);
+    return () => clearInterval(renovarInterval);
+  }, [concesion, usuario?.id]);
+
   const handleSeleccionJuego = async (e) => {
     const id = e.target.value;
 
     if (juegoSeleccionadoId && juegoSeleccionadoId !== id) {
       await liberarJuego();
     }
+    setConcesion(null);
 
     setJuegoSeleccionadoId(id);
 
@@ -98,6 +133,7 @@ const EditarJuegoConcurrencia = ({ usuario }) => {
         setNombre(juegoBloqueado.nombre);
         setFecha(juegoBloqueado.fecha);
         setRating(juegoBloqueado.rating);
+        setConcesion({ id: juegoBloqueado.concesion, ttl: juegoBloqueado.ttl });
       } catch (err) {
         console.error("Error al bloquear el juego:", err);
 
@@ -142,6 +178,7 @@ const EditarJuegoConcurrencia = ({ usuario }) => {
 
       await liberarJuego();
 
+      setConcesion(null);
       setJuegoSeleccionadoId("");
       setNombre("");
       setFecha("");